@@ -22,16 +22,26 @@ from pelican import signals
 from bs4 import BeautifulSoup
 from PIL import Image
 import pysvg.parser
+try:
+    from content_dom import get_dom, mark_modified
+except ImportError:
+    # Without the content_dom plugin, the content is parsed here
+    get_dom = mark_modified = None
 
 import logging
 logger = logging.getLogger(__name__)
 
 def content_object_init(instance):
 
-    if instance._content is not None:
-        content = instance._content
-        soup = BeautifulSoup(content, 'html.parser')
+    if get_dom is None:
+        soup = None
+        if instance._content is not None:
+            soup = BeautifulSoup(instance._content, 'html.parser')
+    else:
+        soup = get_dom(instance, modify=False)
 
+    if soup is not None:
+        modified = False
         for img in soup(['img', 'object']):
             logger.debug('Better Fig. PATH: %s', instance.settings['PATH'])
             if img.name == 'img':
@@ -93,6 +103,7 @@ def content_object_init(instance):
             if 'RESPONSIVE_IMAGES' in instance.settings and instance.settings['RESPONSIVE_IMAGES']:
                 extra_style += ' max-width: 100%;'
 
+            modified = True
             if img.get('style'):
                 img['style'] += extra_style
             else:
@@ -109,7 +120,11 @@ def content_object_init(instance):
                 else:
                     fig['style'] = extra_style
 
-        instance._content = soup.decode()
+        if modified:
+            if get_dom is None:
+                instance._content = soup.decode()
+            else:
+                mark_modified(instance)
 
 
 def register():
@@ -45,14 +45,27 @@ Usage:
 
 from pelican import signals, contents
 from bs4 import BeautifulSoup
+try:
+    from content_dom import get_dom, mark_modified
+except ImportError:
+    # Without the content_dom plugin, the content is parsed here
+    get_dom = mark_modified = None
 
 def better_tables(content):
     if isinstance(content, contents.Static):
         return
 
-    soup = BeautifulSoup(content._content, 'html.parser')
-
-    for table in soup.findAll('table'):
+    if get_dom is None:
+        if content._content is None:
+            return
+        soup = BeautifulSoup(content._content, 'html.parser')
+    else:
+        soup = get_dom(content, modify=False)
+        if soup is None:
+            return
+
+    tables = soup.findAll('table')
+    for table in tables:
         # table's "border" is so 1996
         del(table['border'])
 
@@ -64,8 +77,12 @@ def better_tables(content):
         for tag in table.findAll(['tbody', 'thead']):
             del(tag['valign'])
 
-    soup.renderContents()
-    content._content = soup.decode()
+    if not tables:
+        return
+    if get_dom is None:
+        content._content = soup.decode()
+    else:
+        mark_modified(content)
 
 def register():
     signals.content_object_init.connect(better_tables)
@@ -6,6 +6,11 @@ This pelican plugin modifies article and page html to use bootstrap's default cl
 
 from pelican import signals, contents
 from bs4 import BeautifulSoup
+try:
+    from content_dom import get_dom
+except ImportError:
+    # Without the content_dom plugin, the content is parsed here
+    get_dom = None
 
 def replace(searchterm, soup, attributes):
     for item in soup.findAll(searchterm):
@@ -37,13 +42,20 @@ def bootstrapify(content):
     if isinstance(content, contents.Static):
         return
 
-    soup = BeautifulSoup(content._content, 'html.parser')
+    if get_dom is None:
+        if content._content is None:
+            return
+        soup = BeautifulSoup(content._content, 'html.parser')
+    else:
+        soup = get_dom(content)
+        if soup is None:
+            return
     replace_tables(soup)
     replace_images(soup)
     replace_svg(soup)
     replace_embed(soup)
-
-    content._content = soup.decode()
+    if get_dom is None:
+        content._content = soup.decode()
 
 def register():
     signals.content_object_init.connect(bootstrapify)
@@ -38,7 +38,7 @@ logger = logging.getLogger(__name__)
 
 patched_subclasses = {}
 def make_patched_subclass(klass):
-    if klass.__name__ not in patched_subclasses:
+    if klass not in patched_subclasses:
         class PatchedContent(klass):
             @property
             def url_format(self):
@@ -51,8 +51,8 @@ def make_patched_subclass(klass):
                 return metadata
         # Code in core uses Content class names as keys for things.
         PatchedContent.__name__ = klass.__name__
-        patched_subclasses[klass.__name__] = PatchedContent
-    return patched_subclasses[klass.__name__]
+        patched_subclasses[klass] = PatchedContent
+    return patched_subclasses[klass]
 
 def patch_urlformat(cont):
     # Test whether this content object needs to be patched.
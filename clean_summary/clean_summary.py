@@ -9,7 +9,14 @@ also adds option to include an image by default if one exists in your article
 from pelican import signals
 from pelican.contents import Content, Article
 from pelican.generators import ArticlesGenerator
-from bs4 import BeautifulSoup
+try:
+    from content_dom import parse_html
+except ImportError:
+    from bs4 import BeautifulSoup
+
+    # Without the content_dom plugin, fragments are parsed here
+    def parse_html(html, settings=None):
+        return BeautifulSoup(html, 'html.parser')
 from six import text_type
 
 def init(pelican):
@@ -20,15 +27,14 @@ def init(pelican):
 
 
 def clean_summary(instance):
-    if type(instance) == Article:
-        summary = instance.summary
-        summary = BeautifulSoup(instance.summary, 'html.parser')
+    if isinstance(instance, Article):
+        summary = parse_html(instance.summary, instance.settings)
         images = summary.findAll('img')
         if (len(images) > maximum_images):
             for image in images[maximum_images:]:
                 image.extract()
         if len(images) < 1 and minimum_one: #try to find one
-            content = BeautifulSoup(instance.content, 'html.parser')
+            content = parse_html(instance.content, instance.settings)
             first_image = content.find('img')
             if first_image:
                 summary.insert(0, first_image)
@@ -0,0 +1,127 @@
+"""
+Benchmark of the HTML parser backends
+-------------------------------------
+Times the plugins parsing content, summaries and titles over the content of
+``test_data``, and over pages joining all of it, with each backend of
+``HTML_PARSER_BACKEND``, in pages per second. Every plugin is run on fresh
+content, so that it parses it; the ``shared`` line runs the
+content_object_init plugins one after the other on the same content, which
+is then parsed once and serialized once.
+
+Run from the root of the repository::
+
+    python -m content_dom.bench_backends
+"""
+import gc
+import os
+import sys
+import time
+
+from pelican.contents import Article
+from pelican.readers import Readers
+from pelican.settings import DEFAULT_CONFIG
+
+import better_tables
+import bootstrapify
+import clean_summary
+import extract_toc
+import glossary
+import interlinks
+import post_stats
+import render_math
+import tipue_search
+
+CONTENT_PATH = os.path.join(os.path.dirname(__file__), os.pardir,
+                            'test_data', 'content')
+BACKENDS = ('html.parser', 'lxml')
+
+
+def load_pages():
+    readers = Readers(dict(DEFAULT_CONFIG))
+    pages = []
+    for root, dirs, files in sorted(os.walk(CONTENT_PATH)):
+        for name in sorted(files):
+            if name.rsplit('.', 1)[-1] in ('rst', 'md'):
+                pages.append(readers.read_file(root, name)._content)
+    return pages
+
+
+def make_article(html, settings):
+    context = {'generated_content': {}, 'static_content': {},
+               'static_links': set(), 'localsiteurl': ''}
+    return Article(html, settings=settings, source_path='article.md',
+                   context=context, metadata={'title': 'Title', 'slug': 'a'})
+
+
+def content_object_init(article):
+    for plugin in (better_tables.better_tables, bootstrapify.bootstrapify,
+                   interlinks.content_object_init, extract_toc.extract_toc,
+                   post_stats.calculate_stats):
+        plugin(article)
+    return article.content
+
+
+def search(article):
+    tipue_search.Tipue_Search_JSON_Generator(
+        {}, article.settings, None, None, None).create_json_node(article)
+
+
+PLUGINS = [
+    ('better_tables', better_tables.better_tables),
+    ('bootstrapify', bootstrapify.bootstrapify),
+    ('interlinks', interlinks.content_object_init),
+    ('extract_toc', extract_toc.extract_toc),
+    ('post_stats', post_stats.calculate_stats),
+    ('glossary', glossary.parse_content),
+    ('clean_summary', clean_summary.clean_summary),
+    ('render_math', render_math.process_summary),
+    ('tipue_search', search),
+    ('shared', content_object_init),
+]
+
+
+def setup():
+    class Generator(object):
+        settings = {'SITEURL': '', 'INTERLINKS': {}}
+    interlinks.getSettings(Generator)
+    clean_module = sys.modules['clean_summary.clean_summary']
+    clean_module.maximum_images = 0
+    clean_module.minimum_one = True
+    render_math.process_summary.mathjax_script = ''
+
+
+def bench(plugin, pages, backend, number):
+    settings = dict(DEFAULT_CONFIG)
+    settings.update({'HTML_PARSER_BACKEND': backend, 'PLUGINS': []})
+    articles = [make_article(html, settings)
+                for _ in range(number) for html in pages]
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.time()
+        for article in articles:
+            plugin(article)
+        return len(articles) / (time.time() - start)
+    finally:
+        gc.enable()
+
+
+def main(number=100):
+    setup()
+    pages = load_pages()
+    # Longer pages, as found in real blogs
+    long_pages = [''.join(pages)] * len(pages)
+    for title, sample, count in (('test_data', pages, number),
+                                 ('long pages', long_pages, number // 20)):
+        print('{0:<16}'.format(title) +
+              ''.join('{0:>14}'.format(backend) for backend in BACKENDS))
+        for name, plugin in PLUGINS:
+            rates = [bench(plugin, sample, backend, count)
+                     for backend in BACKENDS]
+            print('{0:<16}'.format(name) +
+                  ''.join('{0:>12.0f}/s'.format(rate) for rate in rates) +
+                  '   x{0:.1f}'.format(rates[-1] / rates[0]))
+
+
+if __name__ == '__main__':
+    main()
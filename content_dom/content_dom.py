@@ -0,0 +1,181 @@
+"""
+Content DOM
+-----------
+
+A parse-once HTML tree of the content of articles and pages, shared by the
+plugins rewriting it (better_tables, bootstrapify, interlinks, ...).
+
+The first plugin asking for the tree of a content object parses its
+``_content``; the following ones get the same tree and change it in place.
+The tree is serialized back once, when ``_content`` is next read (by Pelican
+rendering ``content``, or by any other plugin), and then released.
+Assigning ``_content`` discards the tree.
+
+Reads of ``_content`` are intercepted by switching the class of the content
+objects to a subclass of the same name, as category_meta does: compare the
+type of content with ``isinstance``, not ``type() ==``.
+"""
+from bs4 import BeautifulSoup, NavigableString
+from six import string_types
+
+# Keys of the tree and of its modified flag in the content objects
+_DOM = '_content_dom'
+_MODIFIED = '_content_dom_modified'
+
+
+# BeautifulSoup parser used unless HTML_PARSER_BACKEND says otherwise
+DEFAULT_BACKEND = 'html.parser'
+
+
+def parse_html(html, settings=None):
+    """Parse a fragment of HTML with the HTML_PARSER_BACKEND of settings.
+
+    Backends other than html.parser (lxml) wrap fragments in html, head and
+    body elements, which are removed, and drop their leading whitespace,
+    which is restored, so that fragments serialize alike.
+    """
+    backend = DEFAULT_BACKEND
+    if settings:
+        backend = settings.get('HTML_PARSER_BACKEND', DEFAULT_BACKEND)
+    soup = BeautifulSoup(html, backend)
+    if backend != 'html.parser':
+        root = soup.find('html', recursive=False)
+        if root is not None:
+            for name in ('head', 'body'):
+                tag = root.find(name, recursive=False)
+                if tag is not None:
+                    _unwrap(tag)
+            _unwrap(root)
+        if isinstance(html, string_types) and html[:1].isspace():
+            first = next(iter(soup.contents), None)
+            leading = html[:len(html) - len(html.lstrip())]
+            if type(first) is NavigableString and not first[:1].isspace():
+                first.replace_with(NavigableString(leading + first))
+            elif type(first) is not NavigableString:
+                # collapsed as BeautifulSoup collapses blank strings
+                soup.insert(0, NavigableString(
+                    '\n' if '\n' in leading else ' '))
+    return soup
+
+
+def _unwrap(tag):
+    # Replace tag with its children, like Tag.unwrap does one child at a
+    # time, in quadratic time
+    parent = tag.parent
+    children = tag.contents
+    index = parent.contents.index(tag)
+    if tag.previous_element is not None:
+        tag.previous_element.next_element = tag.next_element
+    if tag.next_element is not None:
+        tag.next_element.previous_element = tag.previous_element
+    before, after = tag.previous_sibling, tag.next_sibling
+    if children:
+        for child in children:
+            child.parent = parent
+        children[0].previous_sibling = before
+        children[-1].next_sibling = after
+        first, last = children[0], children[-1]
+    else:
+        first, last = after, before
+    if before is not None:
+        before.next_sibling = first
+    if after is not None:
+        after.previous_sibling = last
+    parent.contents[index:index + 1] = children
+    tag.contents = []
+    tag.parent = tag.previous_element = tag.next_element = None
+    tag.previous_sibling = tag.next_sibling = None
+
+
+class DomContent(object):
+    """Mixin writing the shared tree back when ``_content`` is read."""
+
+    @property
+    def _content(self):
+        flush_dom(self)
+        return self.__dict__.get('_content')
+
+    @_content.setter
+    def _content(self, value):
+        self.__dict__.pop(_DOM, None)
+        self.__dict__.pop(_MODIFIED, None)
+        self.__dict__['_content'] = value
+
+    def __reduce_ex__(self, protocol):
+        # Pickled by the content cache, and copied, as the plain class
+        flush_dom(self)
+        return (_restore, (self.__class__.__bases__[-1], self.__dict__.copy()))
+
+
+def _restore(klass, state):
+    content = klass.__new__(klass)
+    content.__dict__.update(state)
+    return content
+
+
+_classes = {}
+
+
+def _dom_class(klass):
+    if issubclass(klass, DomContent):
+        return klass
+    if klass not in _classes:
+        # Code in core uses the class names of content as keys for settings
+        _classes[klass] = type(klass.__name__, (DomContent, klass),
+                               {'__module__': klass.__module__})
+    return _classes[klass]
+
+
+def get_dom(content, modify=True):
+    """Return the tree of the HTML of content, parsing it on first use.
+
+    Unless modify is False, the tree is serialized back to ``_content``
+    when it is next read; read-only users pass False, and may call
+    mark_modified once they change the tree after all. Returns None for
+    content without HTML.
+    """
+    state = content.__dict__
+    dom = state.get(_DOM)
+    if dom is None:
+        html = state.get('_content')
+        if html is None:
+            return None
+        dom = parse_html(html, getattr(content, 'settings', None))
+        content.__class__ = _dom_class(content.__class__)
+        state[_DOM] = dom
+    if modify:
+        state[_MODIFIED] = True
+    return dom
+
+
+def find_dom(content):
+    """Return the tree of content if it was parsed already, else None."""
+    return content.__dict__.get(_DOM)
+
+
+def source_html(content):
+    """Return the HTML the tree of content is parsed from, or would be.
+
+    Unlike reading ``_content``, this neither serializes nor releases the
+    tree, so the changes made to it are not included.
+    """
+    return content.__dict__.get('_content')
+
+
+def mark_modified(content):
+    """Have the tree of content serialized back when it is next read."""
+    if _DOM in content.__dict__:
+        content.__dict__[_MODIFIED] = True
+
+
+def flush_dom(content):
+    """Write the changes to the tree of content back, and release it."""
+    state = content.__dict__
+    dom = state.pop(_DOM, None)
+    if state.pop(_MODIFIED, False) and dom is not None:
+        state['_content'] = dom.decode()
+
+
+def register():
+    """Nothing to connect: the plugins using the trees import this module"""
+    pass
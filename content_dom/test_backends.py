@@ -0,0 +1,156 @@
+import io
+import os
+import sys
+import unittest
+
+from six.moves import reload_module
+from pelican.contents import Article
+from pelican.readers import Readers
+from pelican.settings import DEFAULT_CONFIG
+
+import better_tables
+import bootstrapify
+import clean_summary
+import extract_toc
+import glossary
+import interlinks
+import post_stats
+import render_math
+import share_post
+import tipue_search
+import content_dom
+from content_dom import parse_html
+
+try:
+    import lxml
+except ImportError:
+    lxml = None
+
+HERE = os.path.dirname(__file__)
+
+# Modules of the plugins run by run_plugins
+PLUGIN_MODULES = [
+    'better_tables.better_tables', 'bootstrapify.bootstrapify',
+    'interlinks.interlinks', 'extract_toc.extract_toc',
+    'post_stats.post_stats', 'glossary.glossary',
+    'clean_summary.clean_summary', 'render_math.math',
+    'share_post.share_post', 'tipue_search.tipue_search',
+]
+CONTENT_PATH = os.path.join(HERE, os.pardir, 'test_data', 'content')
+
+
+def load_fixtures():
+    """HTML of the content of test_data, and of a page using every plugin"""
+    readers = Readers(dict(DEFAULT_CONFIG))
+    fixtures = []
+    for root, dirs, files in sorted(os.walk(CONTENT_PATH)):
+        for name in sorted(files):
+            if name.rsplit('.', 1)[-1] in ('rst', 'md'):
+                page = readers.read_file(root, name)
+                fixtures.append((name, page._content))
+    with io.open(os.path.join(HERE, 'test_data', 'plugins.html'),
+                 encoding='utf-8') as f:
+        fixtures.append(('plugins.html', f.read()))
+    return fixtures
+
+
+def run_plugins(html, backend):
+    """Return what the plugins make of html, parsed with backend"""
+    settings = dict(DEFAULT_CONFIG)
+    settings.update({'HTML_PARSER_BACKEND': backend,
+                     'SUMMARY_MAX_LENGTH': 20,
+                     'PLUGINS': []})
+    context = {'generated_content': {}, 'static_content': {},
+               'static_links': set(), 'localsiteurl': ''}
+    article = Article(html, settings=settings, source_path='article.md',
+                      context=context,
+                      metadata={'title': 'A <em>title</em>', 'slug': 'a'})
+
+    class Generator(object):
+        pass
+    Generator.settings = {'SITEURL': 'http://example.com',
+                          'INTERLINKS': {'wiki': 'http://wiki/'}}
+    interlinks.getSettings(Generator)
+    clean_module = sys.modules['clean_summary.clean_summary']
+    clean_module.maximum_images = 0
+    clean_module.minimum_one = True
+    render_math.process_summary.mathjax_script = 'mathjax()'
+
+    for plugin in (better_tables.better_tables, bootstrapify.bootstrapify,
+                   interlinks.content_object_init, extract_toc.extract_toc,
+                   post_stats.calculate_stats, glossary.parse_content,
+                   clean_summary.clean_summary, render_math.process_summary,
+                   share_post.share_post):
+        plugin(article)
+
+    search = tipue_search.Tipue_Search_JSON_Generator(
+        {}, settings, None, None, None)
+    search.create_json_node(article)
+    return {'content': article.content,
+            'toc': getattr(article, 'toc', None),
+            'stats': article.stats,
+            'summary': article.summary,
+            'share': article.share_post,
+            'search': search.json_nodes}
+
+
+@unittest.skipIf(lxml is None, 'needs lxml')
+class TestBackends(unittest.TestCase):
+
+    def test_fragments_serialized_alike(self):
+        for name, html in load_fixtures():
+            for variant in (html, '\n\n' + html, '  text ' + html):
+                expected = parse_html(variant)
+                soup = parse_html(variant, {'HTML_PARSER_BACKEND': 'lxml'})
+                self.assertEqual(soup.decode(), expected.decode(), name)
+                self.assertEqual([tag.name for tag in soup.find_all(True)],
+                                 [tag.name for tag in expected.find_all(True)])
+
+    def test_plugins_output_identical(self):
+        for name, html in load_fixtures():
+            glossary.Definitions.definitions = []
+            expected = run_plugins(html, 'html.parser')
+            self.assertEqual(run_plugins(html, 'lxml'), expected, name)
+
+    def test_plugins_fixture(self):
+        output = run_plugins(load_fixtures()[-1][1], 'lxml')
+        self.assertIn('<a href="http://wiki/Table">', output['content'])
+        self.assertIn('<table border="0" class="table">', output['content'])
+        self.assertNotIn('colgroup', output['content'])
+        self.assertIn('<a name="parser"></a>', output['content'])
+        self.assertTrue(output['toc'].startswith('<div class="toc">'))
+
+
+class TestWithoutContentDom(unittest.TestCase):
+    """Plugins loaded without content_dom parse the content on their own"""
+
+    def reload_plugins(self):
+        for name in PLUGIN_MODULES:
+            reload_module(sys.modules[name])
+
+    def run_plugins(self, html):
+        glossary.Definitions.definitions = []
+        output = run_plugins(html, 'html.parser')
+        # Parsed again by each plugin, blank strings are collapsed
+        for key in ('content', 'summary'):
+            output[key] = parse_html(output[key]).decode()
+        return output
+
+    def test_plugins_output_identical(self):
+        fixtures = load_fixtures()
+        expected = [self.run_plugins(html) for name, html in fixtures]
+
+        sys.modules['content_dom'] = None
+        try:
+            self.reload_plugins()
+            self.assertIsNone(
+                sys.modules['better_tables.better_tables'].get_dom)
+            for (name, html), output in zip(fixtures, expected):
+                self.assertEqual(self.run_plugins(html), output, name)
+        finally:
+            sys.modules['content_dom'] = content_dom
+            self.reload_plugins()
+
+
+if __name__ == '__main__':
+    unittest.main()
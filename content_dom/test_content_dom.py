@@ -0,0 +1,76 @@
+import pickle
+import unittest
+
+from pelican.contents import Article
+
+from content_dom import flush_dom, get_dom, mark_modified
+
+TEST_CONTENT = '<p class=intro>Intro</p><table border="1"><tr><td>1</td></tr></table>'
+
+
+def make_article(content=TEST_CONTENT):
+    return Article(content, metadata={'title': 'Test'})
+
+
+class TestContentDom(unittest.TestCase):
+
+    def test_parsed_once(self):
+        article = make_article()
+        self.assertIs(get_dom(article), get_dom(article, modify=False))
+
+    def test_serialized_when_read(self):
+        article = make_article()
+        get_dom(article).table['class'] = 'table'
+        get_dom(article).p.string = 'Changed'
+        self.assertEqual(
+            article._content,
+            '<p class="intro">Changed</p>'
+            '<table border="1" class="table"><tr><td>1</td></tr></table>')
+        self.assertNotIn('_content_dom', article.__dict__)
+        self.assertIn('class="table"', article.content)
+
+    def test_read_only(self):
+        article = make_article()
+        self.assertEqual(get_dom(article, modify=False).p.text, 'Intro')
+        self.assertEqual(article._content, TEST_CONTENT)
+
+        get_dom(article, modify=False).p['id'] = 'intro'
+        mark_modified(article)
+        self.assertIn('id="intro"', article._content)
+
+    def test_assignment_discards_tree(self):
+        article = make_article()
+        get_dom(article).p.string = 'Changed'
+        article._content = '<p>New</p>'
+        self.assertEqual(article._content, '<p>New</p>')
+        self.assertEqual(get_dom(article).p.string, 'New')
+
+    def test_no_content(self):
+        article = make_article()
+        article._content = None
+        self.assertIsNone(get_dom(article))
+
+    def test_content_class(self):
+        article = make_article()
+        get_dom(article)
+        self.assertIsInstance(article, Article)
+        self.assertIsNot(type(article), Article)
+        self.assertEqual(type(article).__name__, 'Article')
+
+    def test_pickled_as_plain_content(self):
+        article = make_article()
+        get_dom(article).p.string = 'Changed'
+        restored = pickle.loads(pickle.dumps(article))
+        self.assertIs(type(restored), Article)
+        self.assertIn('Changed', restored._content)
+        self.assertNotIn('_content_dom', restored.__dict__)
+
+    def test_flush(self):
+        article = make_article()
+        get_dom(article).p.string = 'Changed'
+        flush_dom(article)
+        self.assertIn('Changed', article.__dict__['_content'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,6 +11,11 @@ from os import path
 from bs4 import BeautifulSoup
 from pelican import signals, readers, contents
 import logging
+try:
+    from content_dom import get_dom, mark_modified
+except ImportError:
+    # Without the content_dom plugin, the content is parsed here
+    get_dom = mark_modified = None
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +24,14 @@ def extract_toc(content):
     if isinstance(content, contents.Static):
         return
 
-    soup = BeautifulSoup(content._content, 'html.parser')
+    if get_dom is None:
+        if content._content is None:
+            return
+        soup = BeautifulSoup(content._content, 'html.parser')
+    else:
+        soup = get_dom(content, modify=False)
+        if soup is None:
+            return
     filename = content.source_path
     extension = path.splitext(filename)[1][1:]
     toc = None
@@ -54,7 +66,10 @@ def extract_toc(content):
 
     if toc:
         toc.extract()
-        content._content = soup.decode()
+        if get_dom is None:
+            content._content = soup.decode()
+        else:
+            mark_modified(content)
         content.toc = toc.decode()
         if content.toc.startswith('<html>'):
             content.toc = content.toc[12:-14]
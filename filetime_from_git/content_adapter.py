@@ -3,19 +3,34 @@
 Wraps a content object to provide some git information
 """
 import logging
+import os
 from pelican.utils import memoized
 from .git_wrapper import git_wrapper
+from .utils import datetime_from_timestamp
 
 DEV_LOGGER = logging.getLogger(__name__)
 
 
+def history_cache_file(content):
+    '''
+    File keeping the history index between builds, if enabled
+    '''
+    if not content.settings.get('GIT_HISTORY_CACHE', False):
+        return None
+    return os.path.join(content.settings['CACHE_PATH'], 'filetime_from_git.json')
+
+
 class GitContentAdapter(object):
     """
     Wraps a content object to provide some git information
+
+    Answers come from the history index shared by all content objects, so
+    that no git command is run for each content.
     """
     def __init__(self, content):
         self.content = content
         self.git = git_wrapper('.')
+        self.index = self.git.get_history_index(history_cache_file(content))
         self.tz_name = content.settings.get('TIMEZONE', None)
         self.follow = content.settings['GIT_HISTORY_FOLLOWS_RENAME']
 
@@ -24,31 +39,23 @@ class GitContentAdapter(object):
         '''
         Is committed
         '''
-        return len(self.get_commits()) > 0
+        if not self.is_managed_by_git():
+            return False
+        return self.index.is_committed(self.content.source_path, self.follow)
 
     @memoized
     def is_modified(self):
         '''
         Has content been modified since last commit
         '''
-        return self.git.is_file_modified(self.content.source_path)
+        return self.index.is_modified(self.content.source_path)
 
     @memoized
     def is_managed_by_git(self):
         '''
         Is content stored in a file managed by git
         '''
-        return self.git.is_file_managed_by_git(self.content.source_path)
-
-    @memoized
-    def get_commits(self):
-        '''
-        Get all commits involving this filename
-        :returns: List of commits newest to oldest
-        '''
-        if not self.is_managed_by_git():
-            return []
-        return self.git.get_commits(self.content.source_path, self.follow)
+        return self.index.is_managed(self.content.source_path)
 
     @memoized
     def get_oldest_commit(self):
@@ -57,26 +64,24 @@ class GitContentAdapter(object):
 
         :returns: Oldest commit
         '''
-        return self.git.get_commits(self.content.source_path, self.follow)[-1]
+        return self.index.get_oldest_commit(
+            self.content.source_path, self.follow)
 
     @memoized
     def get_newest_commit(self):
         '''
-        Get oldest commit involving this file
+        Get newest commit involving this file
 
         :returns: Newest commit
         '''
-        return self.git.get_commits(self.content.source_path, follow=False)[0]
+        return self.index.get_newest_commit(self.content.source_path)
 
     @memoized
     def get_oldest_filename(self):
         '''
         Get the original filename of this content. Implies follow
         '''
-        commit_and_name_iter = self.git.get_commits_and_names_iter(
-            self.content.source_path)
-        _commit, name = commit_and_name_iter.next()
-        return name
+        return self.index.get_oldest_filename(self.content.source_path)
 
     @memoized
     def get_oldest_commit_date(self):
@@ -86,7 +91,8 @@ class GitContentAdapter(object):
         :returns: Datetime of oldest commit
         '''
         oldest_commit = self.get_oldest_commit()
-        return self.git.get_commit_date(oldest_commit, self.tz_name)
+        return datetime_from_timestamp(
+            oldest_commit.committed_date, self.content)
 
     @memoized
     def get_newest_commit_date(self):
@@ -96,4 +102,5 @@ class GitContentAdapter(object):
         :returns: Datetime of newest commit
         '''
         newest_commit = self.get_newest_commit()
-        return self.git.get_commit_date(newest_commit, self.tz_name)
+        return datetime_from_timestamp(
+            newest_commit.committed_date, self.content)
@@ -12,6 +12,7 @@ from time import mktime
 from datetime import datetime
 from pelican.utils import set_date_tzinfo
 from git import Git, Repo
+from .history_index import GitHistoryIndex
 
 DEV_LOGGER = logging.getLogger(__name__)
 
@@ -32,6 +33,32 @@ class _GitWrapperCommon(object):
     def __init__(self, repo_path):
         self.git = Git()
         self.repo = Repo(os.path.abspath('.'))
+        self._history_index = None
+        self._history_index_stale = True
+
+    def get_history_index(self, cache_file=None):
+        '''
+        Get the index of the whole history, built or updated on first use
+        in each build
+
+        :param cache_file: File keeping the index between builds, if any
+        :returns: GitHistoryIndex
+        '''
+        if self._history_index is None:
+            self._history_index = GitHistoryIndex(self.repo)
+            if cache_file:
+                self._history_index.load(cache_file)
+        if self._history_index_stale:
+            if self._history_index.build() and cache_file:
+                self._history_index.save(cache_file)
+            self._history_index_stale = False
+        return self._history_index
+
+    def reset_history_index(self):
+        '''
+        Have the next build read the new commits and the local status again
+        '''
+        self._history_index_stale = True
 
     def is_file_managed_by_git(self, path):
         '''
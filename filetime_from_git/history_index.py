@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+Repository wide index of the git history, built once per build from a single
+``git log`` and a single ``git status``, and updated with only the new
+commits afterwards
+"""
+import json
+import logging
+import os
+from collections import namedtuple
+
+DEV_LOGGER = logging.getLogger(__name__)
+
+# Marks the commit lines in the ``git log -z`` output
+COMMIT_MARK = '\x01'
+
+
+class IndexedCommit(namedtuple('IndexedCommit', ['hexsha', 'committed_date'])):
+    '''
+    Commit as recorded by the index: its sha and its committer timestamp.
+    Like git.Commit, str() gives the sha.
+    '''
+    __slots__ = ()
+
+    def __str__(self):
+        return self.hexsha
+
+
+def parse_log(output):
+    '''
+    Parse the output of ``git log -z --name-status``
+
+    :returns: Iterator of (commit, changes) tuples, newest to oldest.
+        changes is a list of (status, paths) tuples, paths holding the old
+        and new name of renamed files, and the name of other files.
+    '''
+    commit = None
+    changes = []
+    tokens = iter(output.split('\0'))
+    for token in tokens:
+        token = token.lstrip('\n')
+        if not token:
+            continue
+        if token.startswith(COMMIT_MARK):
+            if commit is not None:
+                yield commit, changes
+            hexsha, timestamp = token[len(COMMIT_MARK):].split()
+            commit = IndexedCommit(hexsha, int(timestamp))
+            changes = []
+        elif token[0] in 'RC':
+            changes.append((token[0], (next(tokens), next(tokens))))
+        else:
+            changes.append((token[0], (next(tokens),)))
+    if commit is not None:
+        yield commit, changes
+
+
+def parse_status(output):
+    '''
+    Parse the output of ``git status --porcelain -z``
+
+    :returns: Dict of path to two letters status
+    '''
+    status = {}
+    tokens = iter(output.split('\0'))
+    for token in tokens:
+        if not token:
+            continue
+        status[token[3:]] = token[:2]
+        if token[0] in 'RC':
+            # The original name of a staged rename or copy follows
+            next(tokens)
+    return status
+
+
+class GitHistoryIndex(object):
+    '''
+    Maps of every path of the repository to its newest and oldest commits,
+    with and without following renames, and to its local status.
+    '''
+    def __init__(self, repo):
+        self.repo = repo
+        self.root = os.path.realpath(repo.working_tree_dir)
+        # Commit indexed last, None if nothing was indexed
+        self.head = None
+        self._clear()
+        self.status = {}
+
+    def _clear(self):
+        # Commits involving each path, as named at the time of the commit
+        self.newest = {}
+        self.oldest = {}
+        # Oldest commit and name of each path following renames
+        self.oldest_following = {}
+        self.oldest_name = {}
+
+    def build(self):
+        '''
+        Read the history and the local status of the repository. Only the
+        commits made since the last indexed one are read, unless history
+        was rewritten.
+
+        :returns: True if new commits were indexed
+        '''
+        head = self._get_head()
+        updated = head != self.head
+        if updated:
+            if self.head is not None and head is not None and \
+                    self._is_ancestor(self.head, head):
+                DEV_LOGGER.debug('Indexing git history of %s from %s to %s',
+                                 self.root, self.head, head)
+                newer = GitHistoryIndex(self.repo)
+                aliases = newer.add_commits(self._read_log(
+                    '{}..{}'.format(self.head, head)))
+                self._merge_newer(newer, aliases)
+            else:
+                DEV_LOGGER.debug('Indexing git history of %s', self.root)
+                self._clear()
+                if head is not None:
+                    self.add_commits(self._read_log(head))
+            self.head = head
+        self.status = parse_status(self.repo.git.execute(
+            ['git', 'status', '--porcelain', '-z']))
+        return updated
+
+    def _get_head(self):
+        status, stdout, _stderr = self.repo.git.execute(
+            ['git', 'rev-parse', '--verify', '-q', 'HEAD'],
+            with_extended_output=True,
+            with_exceptions=False)
+        return stdout.strip() if status == 0 else None
+
+    def _is_ancestor(self, ancestor, commit):
+        status, _stdout, _stderr = self.repo.git.execute(
+            ['git', 'merge-base', '--is-ancestor', ancestor, commit],
+            with_extended_output=True,
+            with_exceptions=False)
+        return status == 0
+
+    def _read_log(self, revisions):
+        return parse_log(self.repo.git.execute(
+            ['git', 'log', '-z', '-M', '--name-status',
+             '--format=' + COMMIT_MARK + '%H %ct', revisions]))
+
+    def _merge_newer(self, newer, aliases):
+        '''
+        Merge the index of the commits following the indexed ones
+
+        :param newer: GitHistoryIndex of the new commits
+        :param aliases: Names of paths before the new commits, as returned
+            by add_commits
+        '''
+        self.newest.update(newer.newest)
+        for path, commit in newer.oldest.items():
+            self.oldest.setdefault(path, commit)
+
+        # Renamed paths are now known under their new name
+        older_following = dict(self.oldest_following)
+        older_name = dict(self.oldest_name)
+        for name in aliases:
+            self.oldest_following.pop(name, None)
+            self.oldest_name.pop(name, None)
+        previous_names = dict(
+            (final, name) for name, final in aliases.items() if final)
+        for path, commit in newer.oldest_following.items():
+            previous = previous_names.get(
+                path, path if path not in aliases else None)
+            if previous in older_following:
+                self.oldest_following[path] = older_following[previous]
+                self.oldest_name[path] = older_name[previous]
+            else:
+                self.oldest_following[path] = commit
+                self.oldest_name[path] = newer.oldest_name[path]
+
+    def load(self, filename):
+        '''
+        Load the index saved by a previous build, if any
+        '''
+        try:
+            with open(filename) as cache_file:
+                data = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return
+        if data.get('root') != self.root:
+            return
+
+        commits = dict(
+            (hexsha, IndexedCommit(hexsha, timestamp))
+            for hexsha, timestamp in data['commits'].items())
+        self.head = data['head']
+        for name in ('newest', 'oldest', 'oldest_following'):
+            setattr(self, name, dict(
+                (path, commits[hexsha])
+                for path, hexsha in data[name].items()))
+        self.oldest_name = data['oldest_name']
+
+    def save(self, filename):
+        '''
+        Save the index, without the local status, for the next builds
+        '''
+        commits = {}
+        data = {
+            'root': self.root,
+            'head': self.head,
+            'commits': commits,
+            'oldest_name': self.oldest_name,
+        }
+        for name in ('newest', 'oldest', 'oldest_following'):
+            data[name] = {}
+            for path, commit in getattr(self, name).items():
+                commits[commit.hexsha] = commit.committed_date
+                data[name][path] = commit.hexsha
+
+        directory = os.path.dirname(filename)
+        try:
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(filename, 'w') as cache_file:
+                json.dump(data, cache_file)
+        except (IOError, OSError) as e:
+            DEV_LOGGER.warning('Could not save git history cache: %s', e)
+
+    def add_commits(self, commits):
+        '''
+        Record commits, given newest to oldest
+
+        :returns: Dict of the names before the oldest commit of the paths
+            they were renamed to, None for names whose history ended
+        '''
+        aliases = {}
+        for commit, changes in commits:
+            renames = []
+            for status, paths in changes:
+                for path in paths:
+                    self.newest.setdefault(path, commit)
+                    self.oldest[path] = commit
+                if status == 'R':
+                    old, new = paths
+                    renames.append((old, new, aliases.get(new, new)))
+                else:
+                    path = paths[-1]
+                    final = aliases.get(path, path)
+                    if final is not None:
+                        self.oldest_following[final] = commit
+                        self.oldest_name[final] = path
+
+            # Going back in time, renamed files are now known by their old
+            # name, and their new name belongs to another file if any
+            for old, new, final in renames:
+                if final is not None:
+                    self.oldest_following[final] = commit
+                    self.oldest_name[final] = new
+                aliases[new] = None
+            for old, new, final in renames:
+                aliases[old] = final
+        return aliases
+
+    def relative_path(self, path):
+        '''
+        :returns: path relative to the root of the repository, as git
+            prints it
+        '''
+        path = os.path.relpath(os.path.realpath(path), self.root)
+        return path.replace(os.sep, '/')
+
+    def is_managed(self, path):
+        '''
+        :returns: True if path is tracked or staged
+        '''
+        path = self.relative_path(path)
+        status = self.status.get(path)
+        if status == '??':
+            return False
+        return path in self.newest or status is not None
+
+    def is_modified(self, path):
+        '''
+        :returns: True if path has changes not yet committed
+        '''
+        status = self.status.get(self.relative_path(path))
+        return status is not None and status != '??'
+
+    def is_committed(self, path, follow=False):
+        '''
+        :returns: True if at least one commit involves path
+        '''
+        path = self.relative_path(path)
+        return path in (self.oldest_following if follow else self.newest)
+
+    def get_newest_commit(self, path):
+        '''
+        :returns: Newest commit involving path
+        '''
+        return self.newest[self.relative_path(path)]
+
+    def get_oldest_commit(self, path, follow=False):
+        '''
+        :returns: Oldest commit involving path, following renames if asked
+        '''
+        path = self.relative_path(path)
+        return (self.oldest_following if follow else self.oldest)[path]
+
+    def get_oldest_filename(self, path):
+        '''
+        :returns: Name of path in its oldest commit, following renames
+        '''
+        return self.oldest_name[self.relative_path(path)]
@@ -5,6 +5,7 @@ Handle registration and setup for plugin
 import logging
 from blinker import signal
 from .content_adapter import GitContentAdapter
+from .git_wrapper import git_wrapper
 from pelican import signals
 
 DEV_LOGGER = logging.getLogger(__name__)
@@ -20,11 +21,20 @@ def setup_option_defaults(pelican_inst):
     pelican_inst.settings.setdefault('GIT_HISTORY_FOLLOWS_RENAME', True)
     pelican_inst.settings.setdefault('GIT_SHA_METADATA', True)
     pelican_inst.settings.setdefault('GIT_GENERATE_PERMALINK', False)
+    pelican_inst.settings.setdefault('GIT_HISTORY_CACHE', False)
+
+
+def reset_history_index(pelican_inst):
+    '''
+    Read the git history again for the next build (e.g. with autoreload)
+    '''
+    git_wrapper('.').reset_history_index()
 
 
 def register():
     signals.content_object_init.connect(send_content_git_object_init)
     signals.initialized.connect(setup_option_defaults)
+    signals.finalized.connect(reset_history_index)
 
     # Import actions
     from . import actions
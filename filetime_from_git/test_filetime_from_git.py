@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import unittest
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from git import Repo
+
+from filetime_from_git.history_index import (
+    COMMIT_MARK, GitHistoryIndex, parse_log, parse_status)
+
+
+def git(repo_path, *args):
+    subprocess.check_call(
+        ('git', '-c', 'user.name=Test', '-c', 'user.email=test@example.com')
+        + args, cwd=repo_path, stdout=subprocess.DEVNULL)
+
+
+def write(repo_path, name, text):
+    with open(os.path.join(repo_path, name), 'a') as f:
+        f.write(text)
+
+
+class TestParsing(unittest.TestCase):
+
+    def test_parse_log(self):
+        output = '\0'.join((
+            COMMIT_MARK + 'bbb 200', '\nM', 'b c.md', 'R100', 'a.md', 'd.md',
+            COMMIT_MARK + 'aaa 100', '\nA', 'a.md', 'A', 'b c.md', ''))
+        commits = list(parse_log(output))
+        self.assertEqual(['bbb', 'aaa'], [str(c) for c, _ in commits])
+        self.assertEqual(200, commits[0][0].committed_date)
+        self.assertEqual([('M', ('b c.md',)), ('R', ('a.md', 'd.md'))],
+                         commits[0][1])
+        self.assertEqual([('A', ('a.md',)), ('A', ('b c.md',))],
+                         commits[1][1])
+
+    def test_parse_status(self):
+        output = ' M d.md\0R  e.md\0d.md\0?? new.md\0'
+        self.assertEqual({'d.md': ' M', 'e.md': 'R ', 'new.md': '??'},
+                         parse_status(output))
+
+
+class TestGitHistoryIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.repo_path = os.path.realpath(mkdtemp(prefix='pelicantests.'))
+        git(self.repo_path, 'init', '-q')
+        write(self.repo_path, 'a.md', 'a')
+        write(self.repo_path, 'b.md', 'b')
+        git(self.repo_path, 'add', '.')
+        git(self.repo_path, 'commit', '-q', '-m', 'first')
+        git(self.repo_path, 'mv', 'a.md', 'c.md')
+        git(self.repo_path, 'commit', '-q', '-m', 'rename')
+        write(self.repo_path, 'b.md', 'more')
+        git(self.repo_path, 'commit', '-q', '-a', '-m', 'change')
+        write(self.repo_path, 'b.md', 'local')
+        write(self.repo_path, 'untracked.md', 'untracked')
+        self.repo = Repo(self.repo_path)
+        self.index = GitHistoryIndex(self.repo)
+        self.index.build()
+        self.commits = [c.hexsha for c in self.repo.iter_commits()]
+
+    def tearDown(self):
+        rmtree(self.repo_path)
+
+    def path(self, name):
+        return os.path.join(self.repo_path, name)
+
+    def test_status(self):
+        self.assertTrue(self.index.is_managed(self.path('b.md')))
+        self.assertTrue(self.index.is_modified(self.path('b.md')))
+        self.assertFalse(self.index.is_modified(self.path('c.md')))
+        self.assertFalse(self.index.is_managed(self.path('untracked.md')))
+        self.assertFalse(self.index.is_committed(self.path('untracked.md')))
+
+    def test_commits(self):
+        newest, renamed, first = self.commits
+        b = self.path('b.md')
+        self.assertEqual(newest, str(self.index.get_newest_commit(b)))
+        self.assertEqual(first, str(self.index.get_oldest_commit(b)))
+
+    def test_follows_renames(self):
+        newest, renamed, first = self.commits
+        c = self.path('c.md')
+        self.assertEqual(renamed, str(self.index.get_newest_commit(c)))
+        self.assertEqual(renamed, str(self.index.get_oldest_commit(c)))
+        self.assertEqual(first, str(self.index.get_oldest_commit(c, True)))
+        self.assertEqual('a.md', self.index.get_oldest_filename(c))
+
+    def maps(self, index):
+        return (index.newest, index.oldest, index.oldest_following,
+                index.oldest_name)
+
+    def test_incremental_build(self):
+        self.assertFalse(self.index.build())
+        git(self.repo_path, 'mv', 'c.md', 'd.md')
+        write(self.repo_path, 'e.md', 'e')
+        git(self.repo_path, 'add', 'e.md')
+        git(self.repo_path, 'commit', '-q', '-a', '-m', 'later')
+        self.assertTrue(self.index.build())
+
+        full = GitHistoryIndex(self.repo)
+        full.build()
+        self.assertEqual(full.head, self.index.head)
+        self.assertEqual(self.maps(full), self.maps(self.index))
+        self.assertEqual('a.md',
+                         self.index.get_oldest_filename(self.path('d.md')))
+        self.assertFalse(self.index.is_committed(self.path('c.md'), True))
+
+    def test_save_and_load(self):
+        filename = os.path.join(self.repo_path, 'cache', 'index.json')
+        self.index.save(filename)
+        loaded = GitHistoryIndex(self.repo)
+        loaded.load(filename)
+        self.assertEqual(self.index.head, loaded.head)
+        self.assertEqual(self.maps(self.index), self.maps(loaded))
+        self.assertFalse(loaded.build())
+        self.assertTrue(loaded.is_modified(self.path('b.md')))
+
+
+if __name__ == '__main__':
+    unittest.main()
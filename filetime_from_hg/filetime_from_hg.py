@@ -8,6 +8,8 @@ Copyright (c) David Douard <david.douard@sdfa3.org>
 Compute Date and Modified metadata from Mercurial revisions.
 """
 
+import json
+import logging
 import os
 from pelican import signals, contents
 from pelican.utils import strftime, set_date_tzinfo
@@ -15,6 +17,26 @@ from datetime import datetime
 
 import hglib
 
+logger = logging.getLogger(__name__)
+
+# Separators of the ``hg log`` template: commits, fields and list items
+COMMIT_SEP = '\x1e'
+FIELD_SEP = '\x1f'
+ITEM_SEP = '\x1d'
+
+LOG_TEMPLATE = FIELD_SEP.join((
+    '{node}',
+    '{date|hgdate}',
+    "{files % '{file}" + ITEM_SEP + "'}",
+    "{file_adds % '{file}" + ITEM_SEP + "'}",
+    "{file_copies % '{name}" + ITEM_SEP + "{source}" + ITEM_SEP + "'}",
+)) + COMMIT_SEP
+
+# Shared by every content object of a build
+_client = None
+_index = None
+
+
 def datetime_from_timestamp(timestamp, content):
     """
     Helper function to add timezone information to datetime,
@@ -26,15 +48,257 @@ def datetime_from_timestamp(timestamp, content):
         tz_name=content.settings.get('TIMEZONE', None))
 
 
+def _encode(value):
+    if isinstance(value, bytes):
+        return value
+    return value.encode('utf-8')
+
+
+def _decode(value):
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    return value
+
+
+def _split(field):
+    return [item for item in field.split(ITEM_SEP) if item]
+
+
+def parse_log(output):
+    """
+    Parse the output of ``hg log`` using LOG_TEMPLATE
+
+    :returns: Iterator of (node, timestamp, files, adds, copies) tuples,
+        newest to oldest. copies is a list of (name, source) tuples.
+    """
+    for record in output.split(COMMIT_SEP):
+        record = record.strip('\n')
+        if not record:
+            continue
+        node, date, files, adds, copies = record.split(FIELD_SEP)
+        copies = _split(copies)
+        yield (node, int(date.split()[0]), _split(files), _split(adds),
+               list(zip(copies[::2], copies[1::2])))
+
+
+class HgHistoryIndex(object):
+    """
+    Maps of every path of the repository to the timestamps of its newest
+    and oldest changesets, with and without following copies and renames,
+    and set of the paths modified in the working directory
+    """
+    def __init__(self, client):
+        self.client = client
+        self.root = os.path.realpath(_decode(client.root()))
+        # Working directory parent the maps were built at
+        self.node = None
+        self.newest = {}
+        self.oldest = {}
+        self.oldest_following = {}
+        self.modified = set()
+
+    def build(self):
+        """
+        Read the history up to the working directory parent, unless it was
+        already read, and the modified files. Only the changesets following
+        the last indexed one are read when it is still in the repository.
+
+        :returns: True if the history was read
+        """
+        rev, node = _decode(self._command(
+            'log', '-r', '.', '--template', '{rev} {node}')).split()
+        rev = int(rev)
+        updated = node != self.node
+        if updated:
+            indexed_rev = self._get_rev(self.node) if self.node else None
+            if indexed_rev is not None and 0 <= indexed_rev < rev:
+                logger.debug('Indexing mercurial history of %s from %s to %s',
+                             self.root, self.node, node)
+                newer = HgHistoryIndex(self.client)
+                aliases = newer.add_changesets(self._read_log(
+                    '{0}:{1}'.format(rev, indexed_rev + 1)))
+                self._merge_newer(newer, aliases)
+            else:
+                logger.debug('Indexing mercurial history of %s', self.root)
+                self.newest = {}
+                self.oldest = {}
+                self.oldest_following = {}
+                if rev >= 0:
+                    self.add_changesets(self._read_log('.:0'))
+            self.node = node
+        self.modified = set(
+            _decode(path) for _flag, path in self.client.status(modified=True))
+        return updated
+
+    def _command(self, *args):
+        return self.client.rawcommand([_encode(arg) for arg in args])
+
+    def _get_rev(self, node):
+        """
+        :returns: Revision number of node, None if it is not in the
+            repository anymore
+        """
+        try:
+            return int(self._command('log', '-r', node, '--template', '{rev}'))
+        except hglib.error.CommandError:
+            return None
+
+    def _read_log(self, revisions):
+        return parse_log(_decode(self._command(
+            'log', '-r', revisions, '--template', LOG_TEMPLATE)))
+
+    def _merge_newer(self, newer, aliases):
+        """
+        Merge the index of the changesets following the indexed ones
+
+        :param newer: HgHistoryIndex of the new changesets
+        :param aliases: Paths each name before the new changesets stands
+            for, as returned by add_changesets
+        """
+        self.newest.update(newer.newest)
+        for path, timestamp in newer.oldest.items():
+            self.oldest.setdefault(path, timestamp)
+
+        # The history of each path goes on with the names it had before the
+        # new changesets, whose oldest changesets are already known
+        following = {}
+        for name, timestamp in self.oldest_following.items():
+            for final in aliases.get(name, (name,)):
+                following[final] = min(timestamp,
+                                       following.get(final, timestamp))
+        self.oldest_following = dict(newer.oldest_following)
+        self.oldest_following.update(following)
+
+    def add_changesets(self, changesets):
+        """
+        Record changesets, given newest to oldest
+
+        :returns: Dict of the names before the oldest changeset to the
+            paths they stand for, for the names copied, renamed or added
+        """
+        # Paths each name stands for earlier in history, following copies
+        aliases = {}
+        for node, timestamp, files, adds, copies in changesets:
+            for path in files:
+                self.newest.setdefault(path, timestamp)
+                self.oldest[path] = timestamp
+                for final in aliases.get(path, (path,)):
+                    self.oldest_following[final] = timestamp
+
+            # Going back in time, the history of added files ends, unless
+            # they were copied, in which case it goes on with their source
+            sources = {}
+            for name, source in copies:
+                sources.setdefault(source, set()).update(
+                    aliases.get(name, (name,)))
+            for path in adds:
+                aliases[path] = ()
+            for source, finals in sources.items():
+                aliases[source] = tuple(
+                    finals.union(aliases.get(source, (source,))))
+        return aliases
+
+    def relative_path(self, path):
+        """
+        :returns: path relative to the root of the repository, as mercurial
+            prints it
+        """
+        path = os.path.relpath(os.path.realpath(path), self.root)
+        return path.replace(os.sep, '/')
+
+    def get_times(self, path, follow=False):
+        """
+        :returns: Timestamps of the oldest and newest changesets involving
+            path, following renames if asked; None if path was never
+            committed.
+        """
+        path = self.relative_path(path)
+        oldest = (self.oldest_following if follow else self.oldest).get(path)
+        if oldest is None or path not in self.newest:
+            return None
+        return oldest, self.newest[path]
+
+    def is_modified(self, path):
+        """
+        :returns: True if path has changes not yet committed
+        """
+        return self.relative_path(path) in self.modified
+
+    def load(self, filename):
+        """
+        Load the maps saved by a previous build, if any
+        """
+        try:
+            with open(filename) as cache_file:
+                data = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return
+        if data.get('root') != self.root:
+            return
+        self.node = data['node']
+        self.newest = data['newest']
+        self.oldest = data['oldest']
+        self.oldest_following = data['oldest_following']
+
+    def save(self, filename):
+        """
+        Save the maps, without the working directory status, for the next
+        builds
+        """
+        data = {
+            'root': self.root,
+            'node': self.node,
+            'newest': self.newest,
+            'oldest': self.oldest,
+            'oldest_following': self.oldest_following,
+        }
+        directory = os.path.dirname(filename)
+        try:
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(filename, 'w') as cache_file:
+                json.dump(data, cache_file)
+        except (IOError, OSError) as e:
+            logger.warning('Could not save mercurial history cache: %s', e)
+
+
+def get_history_index(settings):
+    """
+    Get the history index of the current build, opening the shared
+    command server client and reading the history on first use
+    """
+    global _client, _index
+    if _index is None:
+        _client = hglib.open('.')
+        _index = HgHistoryIndex(_client)
+        cache_file = None
+        if settings.get('HG_FILETIME_CACHE', False):
+            cache_file = os.path.join(settings.get('CACHE_PATH', 'cache'),
+                                      'filetime_from_hg.json')
+            _index.load(cache_file)
+        if _index.build() and cache_file:
+            _index.save(cache_file)
+    return _index
+
+
+def reset_history_index(pelican):
+    """
+    Close the client at the end of a build, so that the next build,
+    autoreload ones included, reads the new changesets and status
+    """
+    global _client, _index
+    if _client is not None:
+        _client.close()
+    _client = None
+    _index = None
+
+
 def filetime_from_hg(content):
     if isinstance(content, contents.Static):
         return
     if 'date' in content.metadata:
         # if user did explicitely set a date, do not overwrite it
         return
-    repo = hglib.open('.')
-    tz_name = content.settings.get('TIMEZONE', None)
-
     hgtime = content.metadata.get('hgtime', 'yes').lower()
     if hgtime in ('no', 'off', 'false', '0'):
         return
@@ -48,20 +312,21 @@ def filetime_from_hg(content):
     # 4. file is managed, but dirty
     #    date: first commit time, update: fs time
     path = content.source_path
-    root = repo.root()
-    filelog = repo.log(revrange='.:0', files=[path,],
-                       follow=content.settings.get('HG_FILETIME_FOLLOW', False))
-    if filelog:
+    index = get_history_index(content.settings)
+    times = index.get_times(
+        path, follow=content.settings.get('HG_FILETIME_FOLLOW', False))
+    if times:
         # has commited
-        content.date = set_date_tzinfo(filelog[-1][6], tz_name)
-        if path in [os.path.join(root, mfile) for flag, mfile in repo.status(modified=True)]:
+        oldest, newest = times
+        content.date = datetime_from_timestamp(oldest, content)
+        if index.is_modified(path):
             # file is modified in the wd
             content.modified = datetime_from_timestamp(
                 os.stat(path).st_ctime, content)
         else:
             # file is not changed
-            if len(filelog) > 1:
-                content.modified = set_date_tzinfo(filelog[0][6], tz_name)
+            if newest != oldest:
+                content.modified = datetime_from_timestamp(newest, content)
     else:
         # file is not managed by hg
         content.date = datetime_from_timestamp(os.stat(path).st_ctime, content)
@@ -79,3 +344,4 @@ def filetime_from_hg(content):
 
 def register():
     signals.content_object_init.connect(filetime_from_hg)
+    signals.finalized.connect(reset_history_index)
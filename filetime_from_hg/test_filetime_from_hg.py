@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+import os
+import unittest
+from shutil import rmtree
+from tempfile import mkdtemp
+
+import hglib
+
+from filetime_from_hg.filetime_from_hg import (
+    COMMIT_SEP, FIELD_SEP, ITEM_SEP, HgHistoryIndex, parse_log)
+
+NULL_NODE = '0' * 40
+
+
+def template_output(changesets):
+    """Format changesets, newest first, as ``hg log`` with LOG_TEMPLATE"""
+    records = []
+    for node, timestamp, files, adds, copies in changesets:
+        records.append(FIELD_SEP.join((
+            node,
+            '{0} 0'.format(timestamp),
+            ''.join(path + ITEM_SEP for path in files),
+            ''.join(path + ITEM_SEP for path in adds),
+            ''.join(name + ITEM_SEP + source + ITEM_SEP
+                    for name, source in copies),
+        )) + COMMIT_SEP)
+    return '\n'.join(records)
+
+
+class FakeClient(object):
+    """Answers the commands of HgHistoryIndex from a list of changesets,
+    the oldest first, the working directory parent being the last one"""
+
+    def __init__(self, root):
+        self._root = root
+        self.changesets = []
+        self.modified = []
+        self.logs = []
+
+    def commit(self, timestamp, files, adds=(), copies=()):
+        node = '{0:040x}'.format(len(self.changesets) + 1)
+        self.changesets.append((node, timestamp, list(files), list(adds),
+                                list(copies)))
+
+    def root(self):
+        return self._root.encode('utf-8')
+
+    def status(self, modified=False):
+        return [(b'M', path.encode('utf-8')) for path in self.modified]
+
+    def rawcommand(self, args):
+        args = [arg.decode('utf-8') for arg in args]
+        self.assert_log(args)
+        revisions, template = args[2], args[4]
+        tip = len(self.changesets) - 1
+        if revisions == '.':
+            node = self.changesets[-1][0] if self.changesets else NULL_NODE
+            return '{0} {1}'.format(tip, node).encode('utf-8')
+        if template == '{rev}':
+            for rev, changeset in enumerate(self.changesets):
+                if changeset[0] == revisions:
+                    return str(rev).encode('utf-8')
+            raise hglib.error.CommandError(args, 255, b'', b'unknown revision')
+        self.logs.append(revisions)
+        first, last = revisions.replace('.', str(tip)).split(':')
+        changesets = self.changesets[int(last):int(first) + 1]
+        return template_output(reversed(changesets)).encode('utf-8')
+
+    @staticmethod
+    def assert_log(args):
+        assert args[0] == 'log' and args[1] == '-r' and args[3] == '--template'
+
+
+class TestParsing(unittest.TestCase):
+
+    def test_parse_log(self):
+        output = template_output([
+            ('bbb', 200, ['b c.md', 'a.md', 'd.md'], ['d.md'],
+             [('d.md', 'a.md')]),
+            ('aaa', 100, ['a.md', 'b c.md'], ['a.md', 'b c.md'], []),
+        ])
+        self.assertEqual([
+            ('bbb', 200, ['b c.md', 'a.md', 'd.md'], ['d.md'],
+             [('d.md', 'a.md')]),
+            ('aaa', 100, ['a.md', 'b c.md'], ['a.md', 'b c.md'], []),
+        ], list(parse_log(output)))
+
+
+class TestHgHistoryIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.repo_path = os.path.realpath(mkdtemp(prefix='pelicantests.'))
+        self.client = FakeClient(self.repo_path)
+        self.client.commit(100, ['a.md', 'b.md'], adds=['a.md', 'b.md'])
+        # hg mv a.md c.md
+        self.client.commit(200, ['a.md', 'c.md'], adds=['c.md'],
+                           copies=[('c.md', 'a.md')])
+        self.client.commit(300, ['b.md'])
+        # hg cp b.md copy.md
+        self.client.commit(400, ['copy.md'], adds=['copy.md'],
+                           copies=[('copy.md', 'b.md')])
+        self.client.modified = ['b.md']
+        self.index = HgHistoryIndex(self.client)
+        self.index.build()
+
+    def tearDown(self):
+        rmtree(self.repo_path)
+
+    def path(self, name):
+        return os.path.join(self.repo_path, name)
+
+    def maps(self, index):
+        return index.newest, index.oldest, index.oldest_following
+
+    def test_adds(self):
+        self.assertEqual((100, 300), self.index.get_times(self.path('b.md')))
+        self.assertEqual((100, 300),
+                         self.index.get_times(self.path('b.md'), True))
+        self.assertIsNone(self.index.get_times(self.path('untracked.md')))
+
+    def test_symlinked_root(self):
+        link = self.repo_path + '.link'
+        os.symlink(self.repo_path, link)
+        try:
+            index = HgHistoryIndex(FakeClient(link))
+            self.assertEqual(self.repo_path, index.root)
+            self.assertEqual('b.md', index.relative_path(self.path('b.md')))
+        finally:
+            os.remove(link)
+
+    def test_status(self):
+        self.assertTrue(self.index.is_modified(self.path('b.md')))
+        self.assertFalse(self.index.is_modified(self.path('c.md')))
+
+    def test_renames(self):
+        c = self.path('c.md')
+        self.assertEqual((200, 200), self.index.get_times(c))
+        self.assertEqual((100, 200), self.index.get_times(c, follow=True))
+
+    def test_copies(self):
+        copy = self.path('copy.md')
+        self.assertEqual((400, 400), self.index.get_times(copy))
+        self.assertEqual((100, 400), self.index.get_times(copy, follow=True))
+        # The source keeps its own history
+        self.assertEqual((100, 300),
+                         self.index.get_times(self.path('b.md'), True))
+
+    def test_readded_path(self):
+        # hg rm c.md, then a new c.md
+        self.client.commit(500, ['c.md'])
+        self.client.commit(600, ['c.md'], adds=['c.md'])
+        self.index.build()
+        c = self.path('c.md')
+        self.assertEqual((200, 600), self.index.get_times(c))
+        self.assertEqual((600, 600), self.index.get_times(c, follow=True))
+
+    def test_incremental_build(self):
+        self.assertFalse(self.index.build())
+        # hg mv c.md d.md, hg cp copy.md e.md, hg add f.md
+        self.client.commit(500, ['c.md', 'd.md'], adds=['d.md'],
+                           copies=[('d.md', 'c.md')])
+        self.client.commit(600, ['copy.md', 'e.md', 'f.md'],
+                           adds=['e.md', 'f.md'],
+                           copies=[('e.md', 'copy.md')])
+        self.client.commit(700, ['b.md', 'd.md'])
+        self.client.logs = []
+        self.assertTrue(self.index.build())
+        self.assertEqual(['6:4'], self.client.logs)
+
+        full = HgHistoryIndex(self.client)
+        full.build()
+        self.assertEqual(full.node, self.index.node)
+        self.assertEqual(self.maps(full), self.maps(self.index))
+        self.assertEqual((100, 700),
+                         self.index.get_times(self.path('d.md'), True))
+        self.assertEqual((100, 600),
+                         self.index.get_times(self.path('e.md'), True))
+        self.assertEqual((600, 600),
+                         self.index.get_times(self.path('f.md'), True))
+
+    def test_rewritten_history(self):
+        # The indexed changeset was stripped and replaced
+        self.client.changesets[-1] = ('f' * 40, 450, ['b.md'], [], [])
+        self.client.logs = []
+        self.assertTrue(self.index.build())
+        self.assertEqual(['.:0'], self.client.logs)
+        self.assertIsNone(self.index.get_times(self.path('copy.md')))
+        self.assertEqual((100, 450), self.index.get_times(self.path('b.md')))
+
+    def test_save_and_load(self):
+        filename = os.path.join(self.repo_path, 'cache', 'index.json')
+        self.index.save(filename)
+        loaded = HgHistoryIndex(self.client)
+        loaded.load(filename)
+        self.assertEqual(self.index.node, loaded.node)
+        self.assertEqual(self.maps(self.index), self.maps(loaded))
+        self.client.logs = []
+        self.assertFalse(loaded.build())
+        self.assertEqual([], self.client.logs)
+        self.assertTrue(loaded.is_modified(self.path('b.md')))
+        self.assertEqual((100, 400),
+                         loaded.get_times(self.path('copy.md'), True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,6 +6,11 @@ and pages, and adds a `definitions` variable visible to all page templates.
 
 import bs4
 from pelican import signals
+try:
+    from content_dom import get_dom, mark_modified
+except ImportError:
+    # Without the content_dom plugin, the content is parsed here
+    get_dom = mark_modified = None
 
 
 class Definitions():
@@ -34,7 +39,16 @@ def get_excludes(pelican):
 
 
 def parse_content(content):
-    soup = bs4.BeautifulSoup(content._content, 'html.parser')
+    if get_dom is None:
+        if content._content is None:
+            return
+        soup = bs4.BeautifulSoup(content._content, 'html.parser')
+    else:
+        soup = get_dom(content, modify=False)
+        if soup is None:
+            return
+
+    modified = False
 
     for def_list in soup.find_all('dl'):
         defns = []
@@ -44,6 +58,7 @@ def parse_content(content):
                 anchor_tag = bs4.Tag(name="a", attrs={'name': anchor_name})
                 index = def_list.parent.index(def_list)-1
                 def_list.parent.insert(index, anchor_tag)
+                modified = True
 
                 defns.append(
                     {'title': make_title(def_title),
@@ -56,7 +71,11 @@ def parse_content(content):
 
         Definitions.definitions += defns
 
-    content._content = str(soup)
+    if modified:
+        if get_dom is None:
+            content._content = soup.decode()
+        else:
+            mark_modified(content)
 
 
 def parse_articles(generator):
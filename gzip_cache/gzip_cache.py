@@ -4,34 +4,60 @@ Copyright (c) 2012 Matt Layman
 Gzip cache
 ----------
 
-A plugin to create .gz cache files for optimization.
+A plugin to create .gz (and optionally .br and .zst) cache files for
+optimization.
 '''
 
+import hashlib
+import json
 import logging
+import math
+import multiprocessing
 import os
 import zlib
 
+from collections import Counter
+
 from pelican import signals
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 logger = logging.getLogger(__name__)
 
 # A list of file types to exclude from possible compression
 EXCLUDE_TYPES = [
     # Compressed types
+    '.7z',
+    '.br',
     '.bz2',
     '.gz',
+    '.xz',
+    '.zip',
+    '.zst',
 
     # Audio types
     '.aac',
     '.flac',
     '.mp3',
+    '.ogg',
+    '.opus',
     '.wma',
 
     # Image types
+    '.avif',
     '.gif',
     '.jpg',
     '.jpeg',
     '.png',
+    '.webp',
 
     # Video types
     '.avi',
@@ -56,6 +82,78 @@ will be set to 255 (unknown)'
 """
 WBITS = zlib.MAX_WBITS | 16
 
+BROTLI_QUALITY = 11 # Best Compression
+
+ZSTD_LEVEL = 19 # Best Compression without the memory hungry --ultra levels
+
+# Name of the manifest file kept in CACHE_PATH
+MANIFEST_NAME = 'gzip_cache.json'
+
+# Bump whenever the format of the manifest or of the compressed output changes
+MANIFEST_VERSION = 2
+
+# Leading bytes of formats that are already compressed, whatever their file
+# name. Each entry is (offset, magic bytes).
+COMPRESSED_SIGNATURES = [
+    (0, b'\x1f\x8b'),                 # gzip
+    (0, b'BZh'),                      # bzip2
+    (0, b'\xfd7zXZ\x00'),             # xz
+    (0, b'\x28\xb5\x2f\xfd'),         # zstd
+    (0, b'7z\xbc\xaf\x27\x1c'),        # 7-Zip
+    (0, b'PK\x03\x04'),               # zip, and formats based on it
+    (0, b'\x89PNG\r\n\x1a\n'),        # PNG
+    (0, b'\xff\xd8\xff'),             # JPEG
+    (0, b'GIF8'),                     # GIF
+    (0, b'OggS'),                     # Ogg
+    (0, b'fLaC'),                     # FLAC
+    (0, b'ID3'),                      # MP3
+    (0, b'wOFF'),                     # WOFF
+    (0, b'wOF2'),                     # WOFF2
+    (4, b'ftyp'),                     # MP4, MOV, AVIF, HEIC
+    (8, b'WEBP'),                     # WebP (RIFF container)
+    (0, b'\x1a\x45\xdf\xa3'),         # Matroska, WebM
+]
+
+# Number of leading bytes sampled to decide if a file is worth compressing
+SAMPLE_SIZE = 4096
+
+# Samples with a higher Shannon entropy (in bits per byte, 8 at most) are
+# considered random-looking, i.e. already compressed or encrypted
+MAX_ENTROPY = 7.5
+
+# Files are read and compressed in chunks of this size, so that large files
+# (search indexes, sitemaps...) are never held in memory
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def gzip_compressobj():
+    return zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, WBITS)
+
+
+class BrotliCompressObj(object):
+    '''Wrap brotli.Compressor in the zlib compressobj interface.'''
+
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+def zstd_compressobj():
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+
+# Supported formats: name -> (suffix, compressobj factory, available)
+CODECS = {
+    'gzip': ('.gz', gzip_compressobj, True),
+    'brotli': ('.br', BrotliCompressObj, brotli is not None),
+    'zstd': ('.zst', zstd_compressobj, zstandard is not None),
+}
+
 
 def create_gzip_cache(pelican):
     '''Create a gzip cache file for every file that a webserver would
@@ -63,11 +161,300 @@ def create_gzip_cache(pelican):
 
     :param pelican: The Pelican instance
     '''
-    for dirpath, _, filenames in os.walk(pelican.settings['OUTPUT_PATH']):
+    settings = pelican.settings
+    output_path = settings['OUTPUT_PATH']
+    overwrite = should_overwrite(settings)
+    formats = get_formats(settings)
+    if not formats:
+        return
+    use_manifest = should_use_manifest(settings)
+    manifest = load_manifest(settings, formats) if use_manifest else {}
+    sniff = should_sniff(settings)
+    seen = set()
+    tasks = []
+
+    for dirpath, _, filenames in os.walk(output_path):
         for name in filenames:
             if should_compress(name):
                 filepath = os.path.join(dirpath, name)
-                create_gzip_file(filepath, should_overwrite(pelican.settings))
+                relpath = os.path.relpath(filepath, output_path)
+                seen.add(relpath)
+                tasks.append((filepath, relpath, manifest.get(relpath),
+                              formats, overwrite, use_manifest, sniff))
+
+    jobs = get_jobs(settings)
+    if jobs > 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(jobs)
+        try:
+            results = list(pool.imap_unordered(process_file, tasks,
+                                               chunksize=16))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [process_file(task) for task in tasks]
+
+    if use_manifest:
+        manifest.update(results)
+        remove_stale_files(output_path, manifest, seen)
+        save_manifest(settings, formats, manifest)
+
+
+def process_file(task):
+    '''Compress a single file unless the manifest says it is up to date.
+    Runs in the worker processes when GZIP_CACHE_JOBS is greater than 1.
+
+    :param task: A (filepath, relpath, entry, formats, overwrite,
+        use_manifest, sniff) tuple
+    :return: A (relpath, entry) tuple for the manifest
+    '''
+    filepath, relpath, entry, formats, overwrite, use_manifest, sniff = task
+    if entry is not None and is_up_to_date(filepath, entry, formats,
+                                           overwrite):
+        logger.debug('Unchanged: %s' % filepath)
+        return relpath, entry
+    if sniff and not is_compressible(filepath):
+        logger.debug('Incompressible: %s' % filepath)
+    else:
+        for codec in formats:
+            create_compressed_file(filepath, codec, overwrite)
+    if use_manifest:
+        entry = manifest_entry(filepath, formats, overwrite)
+    return relpath, entry
+
+
+def get_formats(settings):
+    '''Return the names of the enabled and available compression formats.
+    Unknown formats and formats whose library is not installed are skipped
+    with a warning. With GZIP_CACHE_OVERWRITE only the first one is used,
+    since the original file is replaced.
+
+    :param settings: The pelican instance settings
+    '''
+    formats = []
+    for name in settings.get('GZIP_CACHE_FORMATS', ['gzip']):
+        if name not in CODECS:
+            logger.warning('gzip_cache: unknown format %s' % name)
+        elif not CODECS[name][2]:
+            logger.warning('gzip_cache: %s is not installed, skipping %s '
+                           'compression' % (name, name))
+        elif name not in formats:
+            formats.append(name)
+
+    if should_overwrite(settings) and len(formats) > 1:
+        logger.warning('gzip_cache: GZIP_CACHE_OVERWRITE only uses the first '
+                       'format, %s' % formats[0])
+        formats = formats[:1]
+    return formats
+
+
+def get_jobs(settings):
+    '''Return the number of processes used to compress files. 0 means one
+    per CPU core.
+
+    :param settings: The pelican instance settings
+    '''
+    jobs = settings.get('GZIP_CACHE_JOBS', 1)
+    if not jobs:
+        jobs = multiprocessing.cpu_count()
+    return jobs
+
+
+def should_use_manifest(settings):
+    '''Check if the manifest of already compressed files should be used.
+
+    :param settings: The pelican instance settings
+    '''
+    return settings.get('GZIP_CACHE_MANIFEST', False)
+
+
+def get_manifest_path(settings):
+    '''Return the path of the manifest file inside CACHE_PATH.
+
+    :param settings: The pelican instance settings
+    '''
+    return os.path.join(settings.get('CACHE_PATH', 'cache'), MANIFEST_NAME)
+
+
+def load_manifest(settings, formats):
+    '''Load the manifest of the previous run, or an empty one if it is
+    missing, unreadable or was written for other settings. The compressed
+    files of the formats that are not enabled anymore are removed.
+
+    :param settings: The pelican instance settings
+    :param formats: The enabled compression formats
+    '''
+    try:
+        with open(get_manifest_path(settings)) as fh:
+            data = json.load(fh)
+    except (IOError, OSError, ValueError):
+        return {}
+
+    if (data.get('version') != MANIFEST_VERSION or
+            data.get('output_path') != settings['OUTPUT_PATH']):
+        logger.debug('Discarding outdated gzip cache manifest')
+        return {}
+    if (data.get('overwrite') != should_overwrite(settings) or
+            data.get('formats') != formats):
+        dropped = [codec for codec in data.get('formats', [])
+                   if codec not in formats]
+        remove_dropped_files(settings['OUTPUT_PATH'], data.get('files', {}),
+                             dropped)
+        logger.debug('Discarding gzip cache manifest of other formats')
+        return {}
+    return data.get('files', {})
+
+
+def save_manifest(settings, formats, manifest):
+    '''Write the manifest to CACHE_PATH.
+
+    :param settings: The pelican instance settings
+    :param formats: The enabled compression formats
+    :param manifest: A dict mapping output relative paths to entries
+    '''
+    manifest_path = get_manifest_path(settings)
+    manifest_dir = os.path.dirname(manifest_path)
+    if manifest_dir and not os.path.isdir(manifest_dir):
+        os.makedirs(manifest_dir)
+
+    data = {
+        'version': MANIFEST_VERSION,
+        'output_path': settings['OUTPUT_PATH'],
+        'overwrite': should_overwrite(settings),
+        'formats': formats,
+        'files': manifest,
+    }
+    try:
+        with open(manifest_path, 'w') as fh:
+            json.dump(data, fh, sort_keys=True)
+    except (IOError, OSError) as ex:
+        logger.warning('Could not write gzip cache manifest: %s' % ex)
+
+
+def file_digest(filepath):
+    '''Return the SHA-1 hex digest of a file, read in chunks.
+
+    :param filepath: A file to hash
+    '''
+    digest = hashlib.sha1()
+    with open(filepath, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(READ_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_state(filepath):
+    '''Return the size, mtime and digest of a file, or None if it does not
+    exist.
+
+    :param filepath: A file to describe
+    '''
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return {
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'digest': file_digest(filepath),
+    }
+
+
+def manifest_entry(filepath, formats, overwrite):
+    '''Build the manifest entry of a file that was just processed.
+
+    With overwrite, the original is the compressed file and there is no
+    sibling, so only the file itself is recorded.
+
+    :param filepath: The processed file
+    :param formats: The enabled compression formats
+    :param overwrite: Whether the original file was overwritten
+    '''
+    entry = file_state(filepath)
+    entry['compressed'] = {}
+    if not overwrite:
+        for codec in formats:
+            suffix = CODECS[codec][0]
+            entry['compressed'][suffix] = file_state(filepath + suffix)
+    return entry
+
+
+def same_file(filepath, state):
+    '''Check if a file still matches a recorded state. The size is checked
+    first, then the mtime, and the digest only when the mtime moved (Pelican
+    rewrites every output file on each build).
+
+    :param filepath: The file to check
+    :param state: A dict as returned by file_state, or None
+    '''
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return state is None
+    if state is None or stat.st_size != state['size']:
+        return False
+    if stat.st_mtime == state['mtime']:
+        return True
+    return file_digest(filepath) == state['digest']
+
+
+def is_up_to_date(filepath, entry, formats, overwrite):
+    '''Check if a file and its compressed siblings are unchanged since they
+    were recorded in the manifest.
+
+    :param filepath: The file to check
+    :param entry: Its manifest entry
+    :param formats: The enabled compression formats
+    :param overwrite: Whether the original files are overwritten
+    '''
+    if not same_file(filepath, entry):
+        return False
+    if overwrite:
+        return True
+    compressed = entry.get('compressed', {})
+    for codec in formats:
+        suffix = CODECS[codec][0]
+        if not same_file(filepath + suffix, compressed.get(suffix)):
+            return False
+    return True
+
+
+def remove_stale_files(output_path, manifest, seen):
+    '''Remove the compressed files whose originals have disappeared, and drop
+    them from the manifest. Only files recorded in the manifest are touched.
+
+    :param output_path: The Pelican output path
+    :param manifest: A dict mapping output relative paths to entries
+    :param seen: The relative paths found in the output during this run
+    '''
+    for relpath in list(manifest):
+        if relpath in seen:
+            continue
+        entry = manifest.pop(relpath)
+        for suffix, state in entry.get('compressed', {}).items():
+            compressed_path = os.path.join(output_path, relpath + suffix)
+            if state is not None and os.path.exists(compressed_path):
+                logger.debug('Removing stale: %s' % compressed_path)
+                os.remove(compressed_path)
+
+
+def remove_dropped_files(output_path, manifest, dropped):
+    '''Remove the compressed files of formats that were turned off. Only
+    files recorded in the manifest are touched.
+
+    :param output_path: The Pelican output path
+    :param manifest: A dict mapping output relative paths to entries
+    :param dropped: The names of the formats that were turned off
+    '''
+    suffixes = [CODECS[codec][0] for codec in dropped if codec in CODECS]
+    for relpath, entry in manifest.items():
+        compressed = entry.get('compressed', {})
+        for suffix in suffixes:
+            compressed_path = os.path.join(output_path, relpath + suffix)
+            if (compressed.get(suffix) is not None and
+                    os.path.exists(compressed_path)):
+                logger.debug('Removing dropped format: %s' % compressed_path)
+                os.remove(compressed_path)
 
 
 def should_compress(filename):
@@ -81,6 +468,45 @@ def should_compress(filename):
 
     return True
 
+
+def should_sniff(settings):
+    '''Check if the content of files should be sampled to skip the ones that
+    are not worth compressing.
+
+    :param settings: The pelican instance settings
+    '''
+    return settings.get('GZIP_CACHE_SNIFF', True)
+
+
+def is_compressible(filepath):
+    '''Check if a file is worth compressing by sampling its first bytes:
+    files starting with the signature of a compressed format, or whose sample
+    looks random, are not.
+
+    :param filepath: A file to check
+    '''
+    with open(filepath, 'rb') as fh:
+        sample = fh.read(SAMPLE_SIZE)
+
+    for offset, magic in COMPRESSED_SIGNATURES:
+        if sample[offset:offset + len(magic)] == magic:
+            return False
+
+    return entropy(sample) <= MAX_ENTROPY
+
+
+def entropy(data):
+    '''Return the Shannon entropy of data, in bits per byte.
+
+    :param data: A bytes sample
+    '''
+    if not data:
+        return 0.0
+    length = float(len(data))
+    return -sum(count / length * math.log(count / length, 2)
+                for count in Counter(bytearray(data)).values())
+
+
 def should_overwrite(settings):
     '''Check if the gzipped files should overwrite the originals.
 
@@ -88,37 +514,63 @@ def should_overwrite(settings):
     '''
     return settings.get('GZIP_CACHE_OVERWRITE', False)
 
+
 def create_gzip_file(filepath, overwrite):
     '''Create a gzipped file in the same directory with a filepath.gz name.
 
     :param filepath: A file to compress
     :param overwrite: Whether the original file should be overwritten
     '''
-    compressed_path = filepath + '.gz'
+    create_compressed_file(filepath, 'gzip', overwrite)
+
+
+def create_compressed_file(filepath, codec, overwrite):
+    '''Create a compressed file in the same directory, named after filepath
+    with the suffix of the codec (e.g. filepath.br for brotli).
+
+    :param filepath: A file to compress
+    :param codec: The name of the compression format, a key of CODECS
+    :param overwrite: Whether the original file should be overwritten
+    '''
+    suffix, compressobj, _ = CODECS[codec]
+    compressed_path = filepath + suffix
+    temporary_path = compressed_path + '.tmp'
+    uncompressed_size = 0
+    compressed_size = 0
 
-    with open(filepath, 'rb') as uncompressed:
-        gzip_compress_obj = zlib.compressobj(COMPRESSION_LEVEL,
-                                                zlib.DEFLATED, WBITS)
+    compress_obj = compressobj()
+    try:
+        with open(filepath, 'rb') as uncompressed, \
+                open(temporary_path, 'wb') as compressed:
+            for chunk in iter(lambda: uncompressed.read(READ_CHUNK_SIZE), b''):
+                uncompressed_size += len(chunk)
+                compressed_chunk = compress_obj.compress(chunk)
+                compressed_size += len(compressed_chunk)
+                compressed.write(compressed_chunk)
+            compressed_chunk = compress_obj.flush()
+            compressed_size += len(compressed_chunk)
+            compressed.write(compressed_chunk)
+    except Exception as ex:
+        logger.critical('%s compression failed: %s' % (codec, ex))
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        return
 
-        uncompressed_data = uncompressed.read()
-        gzipped_data = gzip_compress_obj.compress(uncompressed_data)
-        gzipped_data += gzip_compress_obj.flush()
+    if compressed_size >= uncompressed_size:
+        logger.debug('No improvement: %s (%s)' % (filepath, codec))
+        os.remove(temporary_path)
+        return
 
-        if len(gzipped_data) >= len(uncompressed_data):
-            logger.debug('No improvement: %s' % filepath)
-            return
+    logger.debug('Compressing: %s (%s)' % (filepath, codec))
+    if os.path.exists(compressed_path):
+        os.remove(compressed_path)
+    os.rename(temporary_path, compressed_path)
 
-        with open(compressed_path, 'wb') as compressed:
-            logger.debug('Compressing: %s' % filepath)
-            try:
-                compressed.write(gzipped_data)
-            except Exception as ex:
-                logger.critical('Gzip compression failed: %s' % ex)
+    if overwrite:
+        logger.debug('Overwriting: %s with %s' % (filepath, compressed_path))
+        os.remove(filepath)
+        os.rename(compressed_path, filepath)
 
-        if overwrite:
-            logger.debug('Overwriting: %s with %s' % (filepath, compressed_path))
-            os.remove(filepath)
-            os.rename(compressed_path, filepath)
 
 def register():
     signals.finalized.connect(create_gzip_cache)
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 '''Core plugins unit tests'''
 
+import gzip
+import multiprocessing
 import os
 import tempfile
 import unittest
@@ -39,6 +41,8 @@ class TestGzipCache(unittest.TestCase):
         self.assertTrue(gzip_cache.should_compress('foo.txt'))
 
         self.assertFalse(gzip_cache.should_compress('foo.gz'))
+        self.assertFalse(gzip_cache.should_compress('foo.br'))
+        self.assertFalse(gzip_cache.should_compress('foo.zst'))
         self.assertFalse(gzip_cache.should_compress('bar.png'))
         self.assertFalse(gzip_cache.should_compress('baz.mp3'))
         self.assertFalse(gzip_cache.should_compress('foo.mov'))
@@ -89,6 +93,211 @@ class TestGzipCache(unittest.TestCase):
             gzip_cache.create_gzip_file(a_html_filename, True)
             self.assertFalse(os.path.exists(a_html_filename + '.gz'))
 
+    def test_manifest_skips_unchanged_files(self):
+        # A file recorded in the manifest is not compressed again.
+        with temporary_folder() as tempdir:
+            pelican = make_pelican(tempdir)
+            a_html_filename = make_html(pelican, 'a.html')
+            gzip_cache.create_gzip_cache(pelican)
+            a_gz_filename = a_html_filename + '.gz'
+            self.assertTrue(os.path.exists(a_gz_filename))
+            self.assertTrue(os.path.exists(
+                gzip_cache.get_manifest_path(pelican.settings)))
+
+            os.remove(a_gz_filename)
+            with open(a_gz_filename, 'wb') as fh:
+                fh.write(b'marker')
+            manifest = gzip_cache.load_manifest(pelican.settings, ['gzip'])
+            manifest['a.html']['compressed']['.gz'] = \
+                gzip_cache.file_state(a_gz_filename)
+            gzip_cache.save_manifest(pelican.settings, ['gzip'], manifest)
+
+            # Rewriting the same content only changes the mtime
+            make_html(pelican, 'a.html')
+            gzip_cache.create_gzip_cache(pelican)
+            with open(a_gz_filename, 'rb') as fh:
+                self.assertEqual(fh.read(), b'marker')
+
+    def test_manifest_recompresses_changed_files(self):
+        with temporary_folder() as tempdir:
+            pelican = make_pelican(tempdir)
+            a_html_filename = make_html(pelican, 'a.html')
+            gzip_cache.create_gzip_cache(pelican)
+            gzip_hash = get_md5(a_html_filename + '.gz')
+
+            make_html(pelican, 'a.html', 'other content')
+            gzip_cache.create_gzip_cache(pelican)
+            self.assertNotEqual(gzip_hash, get_md5(a_html_filename + '.gz'))
+
+    def test_manifest_removes_stale_gzip_files(self):
+        with temporary_folder() as tempdir:
+            pelican = make_pelican(tempdir)
+            a_html_filename = make_html(pelican, 'a.html')
+            b_gz_filename = os.path.join(tempdir, 'output', 'b.gz')
+            with open(b_gz_filename, 'wb') as fh:
+                fh.write(b'not ours')
+            gzip_cache.create_gzip_cache(pelican)
+
+            os.remove(a_html_filename)
+            gzip_cache.create_gzip_cache(pelican)
+            self.assertFalse(os.path.exists(a_html_filename + '.gz'))
+            self.assertTrue(os.path.exists(b_gz_filename))
+            self.assertNotIn('a.html',
+                             gzip_cache.load_manifest(pelican.settings,
+                                                      ['gzip']))
+
+    def test_is_compressible(self):
+        with temporary_folder() as tempdir:
+            pelican = make_pelican(tempdir)
+            a_html_filename = make_html(pelican, 'a.html')
+            self.assertTrue(gzip_cache.is_compressible(a_html_filename))
+
+            blob_filename = os.path.join(tempdir, 'blob')
+            with open(blob_filename, 'wb') as fh:
+                fh.write(os.urandom(8192))
+            self.assertFalse(gzip_cache.is_compressible(blob_filename))
+
+            webp_filename = os.path.join(tempdir, 'image')
+            with open(webp_filename, 'wb') as fh:
+                fh.write(b'RIFF\x00\x00\x00\x00WEBPVP8 ' + b'\x00' * 100)
+            self.assertFalse(gzip_cache.is_compressible(webp_filename))
+
+    def test_sniffing_skips_incompressible_files(self):
+        with temporary_folder() as tempdir:
+            pelican = make_pelican(tempdir)
+            blob_filename = os.path.join(tempdir, 'output', 'blob')
+            with open(blob_filename, 'wb') as fh:
+                fh.write(b'\x1f\x8b' + b'\x00' * 8192)
+            gzip_cache.create_gzip_cache(pelican)
+            self.assertFalse(os.path.exists(blob_filename + '.gz'))
+
+            pelican.settings['GZIP_CACHE_SNIFF'] = False
+            pelican.settings['GZIP_CACHE_MANIFEST'] = False
+            gzip_cache.create_gzip_cache(pelican)
+            self.assertTrue(os.path.exists(blob_filename + '.gz'))
+
+    def test_get_jobs(self):
+        self.assertEqual(gzip_cache.get_jobs({}), 1)
+        self.assertEqual(gzip_cache.get_jobs({'GZIP_CACHE_JOBS': 4}), 4)
+        self.assertEqual(gzip_cache.get_jobs({'GZIP_CACHE_JOBS': 0}),
+                         multiprocessing.cpu_count())
+
+    def test_parallel_compression(self):
+        # The process pool produces the same files as the serial mode.
+        with temporary_folder() as tempdir:
+            pelican = make_pelican(tempdir, GZIP_CACHE_JOBS=2)
+            filenames = [make_html(pelican, '%d.html' % i, 'content %d' % i)
+                         for i in range(5)]
+            gzip_cache.create_gzip_cache(pelican)
+            manifest = gzip_cache.load_manifest(pelican.settings, ['gzip'])
+            for filename in filenames:
+                with gzip.open(filename + '.gz') as fh:
+                    with open(filename, 'rb') as original:
+                        self.assertEqual(fh.read(), original.read())
+                self.assertIsNotNone(
+                    manifest[os.path.basename(filename)]['compressed']['.gz'])
+                self.assertFalse(os.path.exists(filename + '.gz.tmp'))
+
+    def test_get_formats(self):
+        self.assertEqual(gzip_cache.get_formats({}), ['gzip'])
+        settings = {'GZIP_CACHE_FORMATS': ['gzip', 'unknown', 'gzip']}
+        self.assertEqual(gzip_cache.get_formats(settings), ['gzip'])
+        settings = {'GZIP_CACHE_FORMATS': ['zstd', 'gzip'],
+                    'GZIP_CACHE_OVERWRITE': True}
+        expected = ['zstd'] if gzip_cache.zstandard else ['gzip']
+        self.assertEqual(gzip_cache.get_formats(settings), expected)
+
+    @unittest.skipIf(gzip_cache.brotli is None, 'brotli is not installed')
+    def test_creates_brotli_file(self):
+        with temporary_folder() as tempdir:
+            pelican = make_pelican(tempdir)
+            a_html_filename = make_html(pelican, 'a.html')
+            gzip_cache.create_compressed_file(a_html_filename, 'brotli', False)
+            with open(a_html_filename + '.br', 'rb') as fh:
+                with open(a_html_filename, 'rb') as original:
+                    self.assertEqual(gzip_cache.brotli.decompress(fh.read()),
+                                     original.read())
+
+    @unittest.skipIf(gzip_cache.zstandard is None,
+                     'zstandard is not installed')
+    def test_creates_zstd_file(self):
+        with temporary_folder() as tempdir:
+            pelican = make_pelican(tempdir)
+            a_html_filename = make_html(pelican, 'a.html')
+            gzip_cache.create_compressed_file(a_html_filename, 'zstd', False)
+            decompressor = gzip_cache.zstandard.ZstdDecompressor()
+            with open(a_html_filename + '.zst', 'rb') as fh:
+                with open(a_html_filename, 'rb') as original:
+                    self.assertEqual(
+                        decompressor.decompressobj().decompress(fh.read()),
+                        original.read())
+
+    def test_all_formats_share_manifest(self):
+        # Every available format gets its sibling, recorded in the manifest.
+        with temporary_folder() as tempdir:
+            formats = ['gzip', 'brotli', 'zstd']
+            pelican = make_pelican(tempdir, GZIP_CACHE_FORMATS=formats)
+            a_html_filename = make_html(pelican, 'a.html')
+            gzip_cache.create_gzip_cache(pelican)
+            enabled = gzip_cache.get_formats(pelican.settings)
+            manifest = gzip_cache.load_manifest(pelican.settings, enabled)
+            for codec in enabled:
+                suffix = gzip_cache.CODECS[codec][0]
+                self.assertTrue(os.path.exists(a_html_filename + suffix))
+                self.assertIsNotNone(manifest['a.html']['compressed'][suffix])
+
+            os.remove(a_html_filename)
+            gzip_cache.create_gzip_cache(pelican)
+            for codec in enabled:
+                suffix = gzip_cache.CODECS[codec][0]
+                self.assertFalse(os.path.exists(a_html_filename + suffix))
+
+    def test_manifest_removes_files_of_dropped_formats(self):
+        with temporary_folder() as tempdir:
+            pelican = make_pelican(tempdir)
+            a_html_filename = make_html(pelican, 'a.html')
+            gzip_cache.create_gzip_cache(pelican)
+
+            # As left by a previous run with brotli enabled
+            a_br_filename = a_html_filename + '.br'
+            with open(a_br_filename, 'wb') as fh:
+                fh.write(b'brotli')
+            b_br_filename = os.path.join(tempdir, 'output', 'b.html.br')
+            with open(b_br_filename, 'wb') as fh:
+                fh.write(b'not ours')
+            manifest = gzip_cache.load_manifest(pelican.settings, ['gzip'])
+            manifest['a.html']['compressed']['.br'] = \
+                gzip_cache.file_state(a_br_filename)
+            gzip_cache.save_manifest(pelican.settings, ['gzip', 'brotli'],
+                                     manifest)
+
+            gzip_cache.create_gzip_cache(pelican)
+            self.assertFalse(os.path.exists(a_br_filename))
+            self.assertTrue(os.path.exists(b_br_filename))
+            self.assertTrue(os.path.exists(a_html_filename + '.gz'))
+
+
+class FakePelican(object):
+
+    def __init__(self, settings):
+        self.settings = settings
+
+
+def make_pelican(tempdir, **settings):
+    output_path = os.path.join(tempdir, 'output')
+    os.mkdir(output_path)
+    settings.setdefault('OUTPUT_PATH', output_path)
+    settings.setdefault('CACHE_PATH', os.path.join(tempdir, 'cache'))
+    settings.setdefault('GZIP_CACHE_MANIFEST', True)
+    return FakePelican(settings)
+
+
+def make_html(pelican, name, content='content'):
+    filepath = os.path.join(pelican.settings['OUTPUT_PATH'], name)
+    with open(filepath, 'w') as fh:
+        fh.write('<html><body>%s</body></html>\n' % (content * 100))
+    return filepath
+
 def get_md5(filepath):
     with open(filepath, 'rb') as fh:
         return md5(fh.read()).hexdigest()
@@ -11,6 +11,11 @@ This plugin allows you to include "interwiki" or shortcuts links into the blog,
 from bs4 import BeautifulSoup
 from pelican import signals
 import re
+try:
+	from content_dom import get_dom, mark_modified
+except ImportError:
+	# Without the content_dom plugin, the content is parsed here
+	get_dom = mark_modified = None
 
 interlinks = {}
 
@@ -25,29 +30,38 @@ def getSettings (generator):
 
 def content_object_init(instance):
 
-	if instance._content is not None:
-		content = instance._content
-		# use Python's built-in parser so no duplicated html & body tags appear, or use tag.unwrap()
-		text = BeautifulSoup(content, "html.parser")
-		
-		if 'a' in content:
-			for link in text.find_all(href=re.compile("(.+?)>")):
-				url = link.get('href')
-				m = re.search(r"(.+?)>", url).groups()
-				name = m[0]
-				if name in interlinks:
-					hi = url.replace(name+">",interlinks[name])
-					link['href'] = hi
-		if 'img' in content:
-			for img in text.find_all('img', src=re.compile("(.+?)>")):
-				url = img.get('src')
-				m = re.search(r"(.+?)>", url).groups()
-				name = m[0]
-				if name in interlinks:
-					hi = url.replace(name+">",interlinks[name])
-					img['src'] = hi
-
-		instance._content = text.decode()
+	if get_dom is None:
+		text = None
+		if instance._content is not None:
+			text = BeautifulSoup(instance._content, "html.parser")
+	else:
+		# the tree shared with the other plugins, parsed with Python's built-in parser
+		text = get_dom(instance, modify=False)
+
+	if text is not None:
+		modified = False
+		for link in text.find_all(href=re.compile("(.+?)>")):
+			url = link.get('href')
+			m = re.search(r"(.+?)>", url).groups()
+			name = m[0]
+			if name in interlinks:
+				hi = url.replace(name+">",interlinks[name])
+				link['href'] = hi
+				modified = True
+		for img in text.find_all('img', src=re.compile("(.+?)>")):
+			url = img.get('src')
+			m = re.search(r"(.+?)>", url).groups()
+			name = m[0]
+			if name in interlinks:
+				hi = url.replace(name+">",interlinks[name])
+				img['src'] = hi
+				modified = True
+
+		if modified:
+			if get_dom is None:
+				instance._content = text.decode()
+			else:
+				mark_modified(instance)
 
 def register():
 	signals.generator_init.connect(getSettings)
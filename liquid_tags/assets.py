@@ -0,0 +1,78 @@
+"""
+Assets
+------
+Images rendered by tags (graphviz, blockdiag, pygal, b64img) are inlined as
+``data:`` URIs by default. When ``LIQUID_TAGS_ASSET_DIR`` names a directory
+of the output, each image is instead written once to a path named after the
+digest of its content, and referenced by URL: identical images of several
+pages share one file, which browsers cache.
+
+Images are kept in memory while pages are read, and written when the build
+is finalized, since the output directory may be cleaned in between.
+They are then forgotten, so that the images of edited or deleted tags do
+not pile up over autoreload builds.
+"""
+import base64
+import hashlib
+import logging
+import os
+import posixpath
+
+logger = logging.getLogger(__name__)
+
+# Output paths of the images of the builds, with their content
+_assets = {}
+
+
+def register_asset(path, data):
+    """Record an image to write to path, relative to the output."""
+    _assets[path] = data
+
+
+def image_src(preprocessor, data, extension, mime=''):
+    """Return the src attribute of an image, a URL or a data URI.
+
+    :param data: Content of the image, bytes or text
+    :param extension: Extension of the file holding the image
+    :param mime: Type given in data URIs
+    """
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+    directory = preprocessor.configs.getConfig('LIQUID_TAGS_ASSET_DIR')
+    if not directory:
+        return 'data:{0};base64,{1}'.format(
+            mime, base64.b64encode(data).decode('ascii'))
+
+    name = hashlib.sha1(data).hexdigest()[:20] + extension
+    path = posixpath.join(directory.strip('/'), name)
+    register_asset(path, data)
+    # The render cache records the images along with the renderings
+    recorded = getattr(preprocessor, 'assets', None)
+    if recorded is not None:
+        recorded.append(path)
+    siteurl = preprocessor.configs.getConfig('SITEURL') or ''
+    return '{0}/{1}'.format(siteurl.rstrip('/'), path)
+
+
+def get_asset(path):
+    """Return the content of a registered image."""
+    return _assets[path]
+
+
+def write_assets(pelican):
+    """Write the images to the output, unless they are already there, and
+    forget them: the next builds register their images again."""
+    output_path = pelican.settings['OUTPUT_PATH']
+    for path, data in _assets.items():
+        filename = os.path.join(output_path, *path.split('/'))
+        if os.path.exists(filename):
+            continue
+        try:
+            if not os.path.isdir(os.path.dirname(filename)):
+                os.makedirs(os.path.dirname(filename))
+            with open(filename, 'wb') as f:
+                f.write(data)
+        except (IOError, OSError) as e:
+            logger.error('Could not write liquid tag image %s: %s',
+                         filename, e)
+    _assets.clear()
@@ -22,9 +22,10 @@ Output
 
 [1] https://github.com/imathis/octopress/blob/master/plugins/image_tag.rb
 """
+import os
 import re
-import base64
-import urllib2
+from .assets import image_src
+from .fetch import fetch
 from .mdx_liquid_tags import LiquidTags
 import six
 
@@ -37,12 +38,15 @@ ReImg = re.compile("""(?P<class>\S.*\s+)?(?P<src>(?:https?:\/\/|\/|\S+\/)\S+)(?:
 ReTitleAlt = re.compile("""(?:"|')(?P<title>[^"']+)?(?:"|')\s+(?:"|')(?P<alt>[^"']+)?(?:"|')""")
 
 
-def _get_file(src):
+def _is_remote(src):
+    return '://' in src or src[0:2] == '//'
+
+
+def _get_file(src, configs=None):
     """ Return content from local or remote file. """
     try:
-        if '://' in src or src[0:2] == '//':  # Most likely this is remote file
-            response = urllib2.urlopen(src)
-            return response.read()
+        if _is_remote(src):  # Most likely this is remote file
+            return fetch(src, configs).body
         else:
             with open(src, 'rb') as fh:
                 return fh.read()
@@ -50,12 +54,28 @@ def _get_file(src):
         raise RuntimeError('Error generating base64image: {}'.format(e))
 
 
-def base64image(src):
-    """ Generate base64 encoded image from srouce file. """
-    return base64.b64encode(_get_file(src))
+def _local_files(preprocessor, markup):
+    """ Return the local file read by the tag, for the render cache. """
+    match = ReImg.search(markup)
+    if not match:
+        return []
+    src = match.group('src')
+    if _is_remote(src):
+        return []
+    return [src]
+
+
+def _remote_files(preprocessor, markup):
+    """ Return the remote file read by the tag, to be prefetched. """
+    match = ReImg.search(markup)
+    if not match or not _is_remote(match.group('src')):
+        return []
+    return [(match.group('src'), False)]
 
 
-@LiquidTags.register('b64img')
+@LiquidTags.register('b64img', cached=True, files=_local_files,
+                     urls=_remote_files,
+                     settings=('LIQUID_TAGS_ASSET_DIR', 'SITEURL'))
 def b64img(preprocessor, tag, markup):
     attrs = None
 
@@ -76,7 +96,11 @@ def b64img(preprocessor, tag, markup):
         if not attrs.get('alt'):
             attrs['alt'] = attrs['title']
 
-    attrs['src'] = 'data:;base64,{}'.format(base64image(attrs['src']))
+    # The extension of the file, without the query of remote ones
+    extension = os.path.splitext(attrs['src'].split('?')[0])[1]
+    attrs['src'] = image_src(
+        preprocessor, _get_file(attrs['src'], preprocessor.configs),
+        extension)
 
     # Return the formatted text
     return "<img {0}>".format(' '.join('{0}="{1}"'.format(key, val)
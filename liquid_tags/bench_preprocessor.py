@@ -0,0 +1,97 @@
+"""
+Micro-benchmark of the liquid tags preprocessor
+-----------------------------------------------
+Times the substitution of tags over the markdown pages of ``test_data``,
+with the tags replaced by a trivial one so that only the scanning and the
+rebuilding of the pages are measured, against the previous implementation
+(findall, split and rejoin of every page). Pages without tags are measured
+separately, from the same pages stripped of their tags.
+
+Run from the root of the repository::
+
+    python -m liquid_tags.bench_preprocessor
+"""
+import glob
+import io
+import itertools
+import os
+import timeit
+
+from .mdx_liquid_tags import (EXTRACT_TAG, LIQUID_TAG,
+                              _LiquidTagsPreprocessor)
+
+CONTENT_DIR = os.path.join(os.path.dirname(__file__), 'test_data', 'content')
+
+
+def echo(preprocessor, tag, markup):
+    return markup
+
+
+class BenchPreprocessor(_LiquidTagsPreprocessor):
+    _tags = {'notebook': echo}
+    _urls = {}
+    _jobs = {}
+
+    def schedule(self, calls):
+        pass
+
+    def prefetch(self, calls):
+        pass
+
+
+def legacy_run(preprocessor, lines):
+    # The implementation replaced by the single pass scanner
+    page = '\n'.join(lines)
+    liquid_tags = LIQUID_TAG.findall(page)
+
+    for i, markup in enumerate(liquid_tags):
+        markup = markup[2:-2]
+        tag = EXTRACT_TAG.match(markup).groups()[0]
+        markup = EXTRACT_TAG.sub('', markup, 1)
+        if tag in preprocessor._tags:
+            liquid_tags[i] = preprocessor._tags[tag](preprocessor, tag,
+                                                     markup.strip())
+    liquid_tags.append('')
+    page = ''.join(itertools.chain(*zip(LIQUID_TAG.split(page),
+                                        liquid_tags)))
+    return page.split("\n")
+
+
+def load_pages():
+    pages = []
+    for path in sorted(glob.glob(os.path.join(CONTENT_DIR, '*.md'))):
+        with io.open(path, encoding='utf-8') as f:
+            pages.append(f.read().split('\n'))
+    return pages
+
+
+def bench(name, pages, number=2000):
+    preprocessor = BenchPreprocessor(None)
+    for run in (legacy_run, BenchPreprocessor.run):
+        assert run(preprocessor, pages[0]) == legacy_run(preprocessor,
+                                                         pages[0])
+    legacy = timeit.timeit(
+        lambda: [legacy_run(preprocessor, page) for page in pages],
+        number=number)
+    current = timeit.timeit(
+        lambda: [preprocessor.run(page) for page in pages], number=number)
+    print('{0:<16} legacy {1:8.2f} us/page   single pass {2:8.2f} us/page'
+          '   x{3:.1f}'.format(name, legacy / number / len(pages) * 1e6,
+                               current / number / len(pages) * 1e6,
+                               legacy / current))
+
+
+def main():
+    pages = load_pages()
+    plain = [[line for line in page if '{%' not in line] for page in pages]
+    # Longer pages, as found in real blogs
+    long_pages = [page * 20 for page in pages]
+    bench('with tags', pages)
+    bench('without tags', plain)
+    bench('long with tags', long_pages, number=200)
+    bench('long without', [[line for line in page if '{%' not in line]
+                           for page in long_pages], number=200)
+
+
+if __name__ == '__main__':
+    main()
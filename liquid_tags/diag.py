@@ -59,102 +59,88 @@ Output
 ------
 <span class="blockdiag" style="align: center;"><img src="data:image/png;base64,_BASE64_IMAGE DATA_/></span>
 
-"""
+Set ``LIQUID_TAGS_ASSET_DIR`` to write images to the output instead of
+inlining them.
+
+Diagrams are rendered in memory with the Python API of blockdiag and its
+siblings, and kept by digest of their source for the rest of the build. Set
+``_draw_mode`` to ``'SVG'`` to inline SVG images instead of PNG ones.
 
-import io
-import os
-import sys
+"""
 
-import base64
+import hashlib
+import importlib
 import re
+from collections import OrderedDict
+from .assets import image_src
 from .mdx_liquid_tags import LiquidTags
+from .parallel import call
 
 
 SYNTAX = '{% blockdiag [diagram type] [code] %}'
 DOT_BLOCK_RE = re.compile(r'^\s*(?P<diagram>\w+).*$', re.MULTILINE | re.DOTALL)
 
 _draw_mode = 'PNG'
-_publish_mode = 'PNG'
-
-
-def get_diag(code, command):
-    """ Generate diagramm and return data """
-    import tempfile
-    import shutil
-    code = code + u'\n'
-
-    try:
-        tmpdir = tempfile.mkdtemp()
-        fd, diag_name = tempfile.mkstemp(dir=tmpdir)
-
-        f = os.fdopen(fd, "w")
-        f.write(code.encode('utf-8'))
-        f.close()
-
-        format = _draw_mode.lower()
-        draw_name = diag_name + '.' + format
-
-        saved_argv = sys.argv
-        argv = [diag_name, '-T', format, '-o', draw_name]
-
-        if _draw_mode == 'SVG':
-            argv += ['--ignore-pil']
-
-        # Run command
-        command.main(argv)
 
-        # Read image data from file
-        file_name = diag_name + '.' + _publish_mode.lower()
+# Package implementing each diagram type
+DIAG_PACKAGES = {
+    'blockdiag': 'blockdiag',
+    'diagram': 'blockdiag',
+    'seqdiag': 'seqdiag',
+    'actdiag': 'actdiag',
+    'nwdiag': 'nwdiag',
+    'packetdiag': 'packetdiag',
+    'rackdiag': 'rackdiag',
+}
 
-        with io.open(file_name, 'rb') as f:
-            data = f.read()
-            f.close()
+# Rendered diagrams by digest of their type, format and source, least
+# recently used first
+DIAG_CACHE_SIZE = 128
+_diagrams = OrderedDict()
 
-    finally:
-        for file in os.listdir(tmpdir):
-            os.unlink(tmpdir + "/" + file)
 
-        # os.rmdir will fail -> use shutil
-        shutil.rmtree(tmpdir)
+def render_diag(code, package, format):
+    """ Render a diagram in memory, returning PNG bytes or SVG text """
+    parser = importlib.import_module(package + '.parser')
+    builder = importlib.import_module(package + '.builder')
+    drawer = importlib.import_module(package + '.drawer')
 
-    return data
+    tree = parser.parse_string(code)
+    diagram = builder.ScreenNodeBuilder.build(tree)
+    draw = drawer.DiagramDraw(format, diagram)
+    draw.draw()
+    return draw.save()
 
 
 def diag(code, command):
-    if command == "blockdiag":                      # blockdiag
-        import blockdiag.command
-        return get_diag(code, blockdiag.command)
-
-    elif command == "diagram":                      # diagram
-        import blockdiag.command
-        return get_diag(code, blockdiag.command)
-
-    elif command == "seqdiag":                      # seqdiag
-        import seqdiag.command
-        return get_diag(code, seqdiag.command)
-
-    elif command == "actdiag":                      # actdiag
-        import actdiag.command
-        return get_diag(code, actdiag.command)
-
-    elif command == "nwdiag":                       # nwdiag
-        import nwdiag.command
-        return get_diag(code, nwdiag.command)
+    """ Return the image of a diagram, rendering it if it is not known """
+    package = DIAG_PACKAGES.get(command)
+    if package is None:                             # not found
+        print("No such command %s" % command)
+        return None
 
-    elif command == "packetdiag":                   # packetdiag
-        import packetdiag.command
-        return get_diag(code, packetdiag.command)
+    key = hashlib.sha1(u'\0'.join(
+        (command, _draw_mode, code)).encode('utf-8')).hexdigest()
+    if key in _diagrams:
+        data = _diagrams.pop(key)
+    else:
+        data = render_diag(code, package, _draw_mode)
+        if len(_diagrams) >= DIAG_CACHE_SIZE:
+            _diagrams.popitem(last=False)
+    _diagrams[key] = data
+    return data
 
-    elif command == "rackdiag":                     # racketdiag
-        import rackdiag.command
-        return get_diag(code, rackdiag.command)
 
-    else:                                           # not found
-        print("No such command %s" % command)
-        return None
+def _jobs(preprocessor, markup):
+    """ Renderings of the tag, run ahead on the process pool """
+    m = DOT_BLOCK_RE.search(markup)
+    if not m:
+        return []
+    return [(diag, (markup, m.group('diagram').strip()))]
 
 
-@LiquidTags.register("blockdiag")
+@LiquidTags.register("blockdiag", cached=True, jobs=_jobs,
+                     settings=('LIQUID_TAGS_ASSET_DIR', 'SITEURL'))
 def blockdiag_parser(preprocessor, tag, markup):
     """ Blockdiag parser """
     m = DOT_BLOCK_RE.search(markup)
@@ -164,11 +150,19 @@ def blockdiag_parser(preprocessor, tag, markup):
         code = markup
 
         # Run command
-        output = diag(code, diagram)
+        output = call(diag, code, diagram)
 
-        if output:
-            # Return Base64 encoded image
-            return '<span class="blockdiag" style="align: center;"><img src="data:image/png;base64,%s"></span>' % base64.b64encode(output)
+        if not output:
+            return None
+        if _draw_mode == 'SVG':
+            if not preprocessor.configs.getConfig('LIQUID_TAGS_ASSET_DIR'):
+                # Return inline SVG, without its XML prolog
+                return '<span class="blockdiag" style="align: center;">%s</span>' % output[output.index('<svg'):]
+            src = image_src(preprocessor, output, '.svg', 'image/svg+xml')
+        else:
+            src = image_src(preprocessor, output, '.png', 'image/png')
+        # Return the image, Base64 encoded or written to the output
+        return '<span class="blockdiag" style="align: center;"><img src="%s"></span>' % src
     else:
         raise ValueError('Error processing input. '
                          'Expected syntax: {0}'.format(SYNTAX))
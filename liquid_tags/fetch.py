@@ -0,0 +1,229 @@
+"""
+Fetch
+-----
+The HTTP layer shared by the tags which query web APIs (flickr, giphy, gram,
+soundcloud and b64img), so that builds do not depend on the network more
+than they need to.
+
+Responses can be kept in the ``liquid_tags_http`` subdirectory of
+``CACHE_PATH`` for ``LIQUID_TAGS_FETCH_TTL`` seconds, after which they are
+revalidated with their ETag or Last-Modified date. With
+``LIQUID_TAGS_OFFLINE``, only cached responses are used, however old and
+whatever the TTL, and missing ones are errors. ``LIQUID_TAGS_FETCH_FIXTURES`` names a directory
+laid out like the cache, whose responses are used before anything else: a
+copy of the cache of a previous build makes a fixture directory.
+
+The preprocessor prefetches the URLs of all the tags of a page concurrently
+before substituting them.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+try:
+    from urllib.request import urlopen, Request
+    from urllib.error import HTTPError, URLError
+except ImportError:
+    from urllib2 import urlopen, Request, HTTPError, URLError
+
+logger = logging.getLogger(__name__)
+
+# Attempts of a request failing on network errors, and delay between them
+FETCH_ATTEMPTS = 3
+RETRY_DELAY = 1.0
+
+# Concurrent requests when prefetching the URLs of a page
+PREFETCH_JOBS = 8
+
+Response = namedtuple('Response', ['url', 'body'])
+
+# Fetchers by configuration, shared by all pages
+_fetchers = {}
+
+
+def fetch_key(url, head=False):
+    """Return the name of the cache entry of url."""
+    return hashlib.sha1(
+        (('HEAD ' if head else '') + url).encode('utf-8')).hexdigest()
+
+
+def fetch(url, configs=None, head=False):
+    """Fetch url, through the cache set up by configs if any.
+
+    :param head: Only get the final URL, after redirects, not the body
+    :returns: Response
+    """
+    return get_fetcher(configs).fetch(url, head)
+
+
+def get_fetcher(configs=None):
+    """Return the fetcher set up by the configs of the preprocessor."""
+    if configs is None:
+        options = (None, -1, False, None, 10)
+    else:
+        ttl = configs.getConfig('LIQUID_TAGS_FETCH_TTL')
+        offline = configs.getConfig('LIQUID_TAGS_OFFLINE')
+        # Offline builds read the cache, whatever the TTL
+        options = (
+            os.path.join(configs.getConfig('CACHE_PATH'), 'liquid_tags_http')
+            if ttl >= 0 or offline else None,
+            ttl,
+            offline,
+            configs.getConfig('LIQUID_TAGS_FETCH_FIXTURES') or None,
+            configs.getConfig('LIQUID_TAGS_FETCH_TIMEOUT'))
+    fetcher = _fetchers.get(options)
+    if fetcher is None:
+        fetcher = _fetchers[options] = Fetcher(*options)
+    return fetcher
+
+
+class Fetcher(object):
+    """Fetch URLs with an on-disk cache, offline mode and fixtures."""
+
+    def __init__(self, cache_dir=None, ttl=-1, offline=False, fixtures=None,
+                 timeout=10):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.offline = offline
+        self.fixtures = fixtures
+        self.timeout = timeout
+        # Responses or errors of prefetched URLs, used once
+        self._prefetched = {}
+
+    def _read(self, directory, key):
+        # Return the metadata and body of an entry, or (None, None)
+        path = os.path.join(directory, key[:2], key)
+        try:
+            with open(path, 'rb') as f:
+                body = f.read()
+        except (IOError, OSError):
+            return None, None
+        try:
+            with open(path + '.json') as f:
+                meta = json.load(f)
+        except (IOError, OSError, ValueError):
+            meta = {}
+        return meta, body
+
+    def _write(self, key, meta, body):
+        path = os.path.join(self.cache_dir, key[:2], key)
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            if body is not None:
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(body)
+                os.rename(path + '.tmp', path)
+            with open(path + '.json', 'w') as f:
+                json.dump(meta, f)
+        except (IOError, OSError) as e:
+            logger.warning('Could not cache %s: %s', meta['url'], e)
+
+    def fetch(self, url, head=False):
+        """Fetch url, from the fixtures, the cache or the network.
+
+        :returns: Response
+        """
+        prefetched = self._prefetched.pop((url, head), None)
+        if prefetched is not None:
+            response, error = prefetched
+            if error is not None:
+                raise error
+            return response
+
+        key = fetch_key(url, head)
+        if self.fixtures:
+            meta, body = self._read(self.fixtures, key)
+            if body is not None:
+                return Response(meta.get('final_url', url), body)
+
+        meta = cached = None
+        if self.cache_dir:
+            meta, body = self._read(self.cache_dir, key)
+            if body is not None:
+                cached = Response(meta.get('final_url', url), body)
+        if cached is not None:
+            if self.offline or \
+                    time.time() - meta.get('fetched', 0) < self.ttl:
+                return cached
+        elif self.offline:
+            raise RuntimeError('{0} is not cached, and liquid tags are in '
+                               'offline mode'.format(url))
+
+        try:
+            response, headers = self._request(url, head, meta if cached
+                                              else None)
+        except (HTTPError, URLError, IOError) as e:
+            if cached is None:
+                raise
+            logger.warning('Could not revalidate %s, using the cached '
+                           'response: %s', url, e)
+            return cached
+
+        if response is None:
+            # Not modified
+            response = cached
+        if self.cache_dir:
+            # Responses to revalidations may omit the validators
+            previous = meta or {}
+            meta = {
+                'url': url,
+                'final_url': response.url,
+                'fetched': time.time(),
+                'etag': headers.get('ETag') or previous.get('etag'),
+                'last_modified': headers.get('Last-Modified') or
+                previous.get('last_modified'),
+            }
+            self._write(key, meta, response.body if response is not cached
+                        else None)
+        return response
+
+    def _request(self, url, head, meta):
+        # Return the response, None if it was not modified, and its headers
+        request = Request(url)
+        if head:
+            request.get_method = lambda: 'HEAD'
+        if meta:
+            if meta.get('etag'):
+                request.add_header('If-None-Match', meta['etag'])
+            if meta.get('last_modified'):
+                request.add_header('If-Modified-Since', meta['last_modified'])
+
+        for attempt in range(FETCH_ATTEMPTS):
+            try:
+                r = urlopen(request, timeout=self.timeout)
+                body = b'' if head else r.read()
+                return Response(r.geturl(), body), r.info()
+            except HTTPError as e:
+                if e.code == 304:
+                    return None, e.info()
+                if e.code < 500 or attempt + 1 == FETCH_ATTEMPTS:
+                    raise
+            except (URLError, IOError):
+                if attempt + 1 == FETCH_ATTEMPTS:
+                    raise
+            time.sleep(RETRY_DELAY * (attempt + 1))
+
+    def prefetch(self, requests):
+        """Fetch (url, head) tuples concurrently, keeping the responses for
+        the next calls of fetch."""
+        requests = [request for request in set(requests)
+                    if request not in self._prefetched]
+        if len(requests) < 2:
+            # Nothing to gain, the tag fetches it itself
+            return
+
+        def run(request):
+            try:
+                return request, (self.fetch(*request), None)
+            except Exception as e:
+                return request, (None, e)
+
+        pool = ThreadPool(min(len(requests), PREFETCH_JOBS))
+        try:
+            self._prefetched.update(pool.map(run, requests))
+        finally:
+            pool.close()
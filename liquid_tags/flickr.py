@@ -22,10 +22,10 @@ Output
 import json
 import re
 try:
-    from urllib.request import urlopen
     from urllib.parse import urlencode
 except ImportError:
-    from urllib import urlopen, urlencode
+    from urllib import urlencode
+from .fetch import fetch
 from .mdx_liquid_tags import LiquidTags
 
 
@@ -35,18 +35,23 @@ PARSE_SYNTAX = re.compile(('''(?P<photo_id>\S+)'''
                            '''(?:\s+(['"]{0,1})(?P<alt>.+)(\\3))?'''))
 
 
-def get_info(photo_id, api_key):
-    ''' Get photo informations from flickr api. '''
-    query = urlencode({
+def info_url(photo_id, api_key):
+    ''' Url of the photo informations in the flickr api. '''
+    query = urlencode(sorted({
         'method': 'flickr.photos.getInfo',
         'api_key': api_key,
         'photo_id': photo_id,
         'format': 'json',
         'nojsoncallback': '1'
-    })
+    }.items()))
+
+    return 'https://api.flickr.com/services/rest/?' + query
 
-    r = urlopen('https://api.flickr.com/services/rest/?' + query)
-    info = json.loads(r.read().decode('utf-8'))
+
+def get_info(photo_id, api_key, configs=None):
+    ''' Get photo informations from flickr api. '''
+    r = fetch(info_url(photo_id, api_key), configs)
+    info = json.loads(r.body.decode('utf-8'))
 
     if info['stat'] == 'fail':
         raise ValueError(info['message'])
@@ -67,10 +72,10 @@ def source_url(farm, server, id, secret, size):
         farm, server, id, secret, img_size)
 
 
-def generate_html(attrs, api_key):
+def generate_html(attrs, api_key, configs=None):
     ''' Returns html code. '''
     # getting flickr api data
-    flickr_data = get_info(attrs['photo_id'], api_key)
+    flickr_data = get_info(attrs['photo_id'], api_key, configs)
 
     # if size is not defined it will use large as image size
     if 'size' not in attrs.keys():
@@ -91,7 +96,17 @@ def generate_html(attrs, api_key):
         attrs['alt'])
 
 
-@LiquidTags.register('flickr')
+def _urls(preprocessor, markup):
+    ''' Requests made by the tag, to be prefetched. '''
+    match = PARSE_SYNTAX.search(markup)
+    if not match:
+        return []
+    api_key = preprocessor.configs.getConfig('FLICKR_API_KEY')
+    return [(info_url(match.group('photo_id'), api_key), False)]
+
+
+@LiquidTags.register('flickr', cached=True, settings=('FLICKR_API_KEY',),
+                     urls=_urls)
 def flickr(preprocessor, tag, markup):
     # getting flickr api key out of config
     api_key = preprocessor.configs.getConfig('FLICKR_API_KEY')
@@ -108,7 +123,7 @@ def flickr(preprocessor, tag, markup):
         raise ValueError('Error processing input. '
                          'Expected syntax: {}'.format(SYNTAX))
 
-    return generate_html(attrs, api_key)
+    return generate_html(attrs, api_key, preprocessor.configs)
 
 
 # ---------------------------------------------------
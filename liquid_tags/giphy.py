@@ -21,10 +21,7 @@ Output
 """
 import json
 import re
-try:
-    from urllib.request import urlopen
-except ImportError:
-    from urllib import urlopen
+from .fetch import fetch
 from .mdx_liquid_tags import LiquidTags
 
 
@@ -32,17 +29,21 @@ SYNTAX = '''{% giphy gif_id ["alt text"|'alt text'] %}'''
 GIPHY = re.compile('''(?P<gif_id>[\S+]+)(?:\s+(['"]{0,1})(?P<alt>.+)(\\2))?''')
 
 
-def get_gif(api_key, gif_id):
+def gif_url(api_key, gif_id):
+    '''Returns the url of the gif informations in the API.'''
+    return 'http://api.giphy.com/v1/gifs/{}?api_key={}'.format(gif_id, api_key)
+
+
+def get_gif(api_key, gif_id, configs=None):
     '''Returns dict with gif informations from the API.'''
-    url = 'http://api.giphy.com/v1/gifs/{}?api_key={}'.format(gif_id, api_key)
-    r = urlopen(url)
+    r = fetch(gif_url(api_key, gif_id), configs)
 
-    return json.loads(r.read().decode('utf-8'))
+    return json.loads(r.body.decode('utf-8'))
 
 
-def create_html(api_key, attrs):
+def create_html(api_key, attrs, configs=None):
     '''Returns complete html tag string.'''
-    gif = get_gif(api_key, attrs['gif_id'])
+    gif = get_gif(api_key, attrs['gif_id'], configs)
 
     if 'alt' not in attrs.keys():
         attrs['alt'] = 'source: {}'.format(gif['data']['source'])
@@ -56,7 +57,7 @@ def create_html(api_key, attrs):
     return html_out
 
 
-def main(api_key, markup):
+def main(api_key, markup, configs=None):
     '''Doing the regex parsing and running the create_html function.'''
     match = GIPHY.search(markup)
 
@@ -71,17 +72,27 @@ def main(api_key, markup):
         raise ValueError('Error processing input. '
                          'Expected syntax: {}'.format(SYNTAX))
 
-    return create_html(api_key, attrs)
+    return create_html(api_key, attrs, configs)
+
+
+def _urls(preprocessor, markup):
+    '''Requests made by the tag, to be prefetched.'''
+    api_key = preprocessor.configs.getConfig('GIPHY_API_KEY')
+    match = GIPHY.search(markup)
+    if api_key is None or not match:
+        return []
+    return [(gif_url(api_key, match.group('gif_id')), False)]
 
 
-@LiquidTags.register('giphy')
+@LiquidTags.register('giphy', cached=True, settings=('GIPHY_API_KEY',),
+                     urls=_urls)
 def giphy(preprocessor, tag, markup):
     api_key = preprocessor.configs.getConfig('GIPHY_API_KEY')
 
     if api_key is None:
         raise ValueError('Please set GIPHY_API_KEY.')
 
-    return main(api_key, markup)
+    return main(api_key, markup, preprocessor.configs)
 
 
 # ---------------------------------------------------
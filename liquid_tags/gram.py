@@ -38,10 +38,7 @@ Output
     <img src="http://photos-c.ak.instagram.com/hphotos-ak-xaf1/t51.2885-15/917172_604907902963826_254280879_n.jpg" width="450" title="warehouse window title" alt="alt text" class="test_class instagram">
 """
 import re
-try:
-    from urllib.request import urlopen
-except ImportError:
-    from urllib import urlopen
+from .fetch import fetch
 from .mdx_liquid_tags import LiquidTags
 
 SYNTAX = '{% gram shortcode [size] [width] [class name(s)] [title text | "title text" ["alt text"]] %}'
@@ -53,7 +50,22 @@ ReGram = re.compile("""(?P<shortcode>\S+)(?:\s+(?P<size>[tml]?))?(?:\s+(?P<width
 # Regular expression to split the title and alt text
 ReTitleAlt = re.compile("""(?:"|')(?P<title>[^"']+)?(?:"|')\s+(?:"|')(?P<alt>[^"']+)?(?:"|')""")
 
-@LiquidTags.register('gram')
+def media_url(shortcode, size=None):
+    url = 'http://instagr.am/p/'+shortcode+'/media/'
+    if size:
+        url = url+'?size={0}'.format(size)
+    return url
+
+
+def _urls(preprocessor, markup):
+    match = ReGram.search(markup)
+    if not match:
+        return []
+    return [(media_url(match.group('shortcode'),
+                       (match.group('size') or '').strip()), True)]
+
+
+@LiquidTags.register('gram', cached=True, urls=_urls)
 def gram(preprocessor, tag, markup):
 
     attrs = None
@@ -69,22 +81,14 @@ def gram(preprocessor, tag, markup):
 
     # Construct URI
     #print(attrs)
-    shortcode = attrs['shortcode']
-    url = 'http://instagr.am/p/'+shortcode+'/media/'
-    del attrs['shortcode']
-
-    if 'size' in attrs:
-        size = '?size={0}'.format(attrs['size'])
-        url = url+size
-        del attrs['size']
+    shortcode = attrs.pop('shortcode')
+    url = media_url(shortcode, attrs.pop('size', None))
 
-    r = urlopen(url)
-
-    if(r.getcode()==404):
+    try:
+        gram_url = fetch(url, preprocessor.configs, head=True).url
+    except IOError:
         raise ValueError('%s isnt a photo.'%shortcode)
 
-    gram_url = r.geturl()
-
     # Check if alt text is present -- if so, split it from title
     if 'title' in attrs:
         match = ReTitleAlt.search(attrs['title'])
@@ -49,9 +49,10 @@ Output
 
 """
 
-import base64
 import re
+from .assets import image_src
 from .mdx_liquid_tags import LiquidTags
+from .parallel import call
 
 SYNTAX = '{% dot graphviz [program] [dot code] %}'
 DOT_BLOCK_RE = re.compile(r'^\s*(?P<program>\w+)\s*\{\s*(?P<code>.*\})\s*\}$', re.MULTILINE | re.DOTALL)
@@ -101,7 +102,16 @@ def run_graphviz(program, code, options=[], format='png'):
     return stdout
 
 
-@LiquidTags.register('graphviz')
+def _jobs(preprocessor, markup):
+    """ Renderings of the tag, run ahead on the process pool """
+    m = DOT_BLOCK_RE.search(markup)
+    if not m:
+        return []
+    return [(run_graphviz, (m.group('program').strip(), m.group('code')))]
+
+
+@LiquidTags.register('graphviz', cached=True, jobs=_jobs,
+                     settings=('LIQUID_TAGS_ASSET_DIR', 'SITEURL'))
 def graphviz_parser(preprocessor, tag, markup):
     """ Simple Graphviz parser """
 
@@ -113,10 +123,11 @@ def graphviz_parser(preprocessor, tag, markup):
         program = m.group('program').strip()
 
         # Run specified program with our markup
-        output = run_graphviz(program, code)
+        output = call(run_graphviz, program, code)
 
-        # Return Base64 encoded image
-        return '<span class="graphviz" style="text-align: center;"><img src="data:image/png;base64,%s"></span>' % base64.b64encode(output).decode('utf-8')
+        # Return the image, Base64 encoded or written to the output
+        src = image_src(preprocessor, output, '.png', 'image/png')
+        return '<span class="graphviz" style="text-align: center;"><img src="%s"></span>' % src
     else:
         raise ValueError('Error processing input. '
                          'Expected syntax: {0}'.format(SYNTAX))
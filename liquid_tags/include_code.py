@@ -60,7 +60,17 @@ FORMAT = re.compile(r"""
 """, re.VERBOSE)
 
 
-@LiquidTags.register('include_code')
+def _code_files(preprocessor, markup):
+    """Return the file read by the tag, for the render cache"""
+    match = FORMAT.search(markup)
+    if not match or not match.group('src'):
+        return []
+    return [os.path.join('content', preprocessor.configs.getConfig('CODE_DIR'),
+                         match.group('src'))]
+
+
+@LiquidTags.register('include_code', cached=True, files=_code_files,
+                     settings=('CODE_DIR',))
 def include_code(preprocessor, tag, markup):
 
     title = None
@@ -1,5 +1,18 @@
+import os
+
 from pelican import signals
-from .mdx_liquid_tags import LiquidTags, LT_CONFIG
+from .assets import write_assets
+from .mdx_liquid_tags import LiquidTags, LT_CONFIG, _LiquidTagsPreprocessor
+from .parallel import MARKDOWN_EXTENSIONS, get_processes, reset, scan_sources
+
+
+class SettingsConfigs(object):
+    """Configs of the extension, read from the pelican settings"""
+    def __init__(self, settings):
+        self.settings = settings
+
+    def getConfig(self, key):
+        return self.settings.get(key, LT_CONFIG.get(key))
 
 
 def addLiquidTags(gen):
@@ -21,5 +34,31 @@ def addLiquidTags(gen):
         )
 
 
+def prerenderTags(gen, kind):
+    """Dispatch the expensive renderings of the tags of all the markdown
+    sources of a generator, before they are read"""
+    preprocessor = _LiquidTagsPreprocessor(SettingsConfigs(gen.settings))
+    if get_processes(preprocessor.configs) <= 1:
+        return
+
+    paths = gen.get_files(gen.settings[kind + '_PATHS'],
+                          exclude=gen.settings[kind + '_EXCLUDES'],
+                          extensions=MARKDOWN_EXTENSIONS)
+    for page in scan_sources(os.path.join(gen.path, path) for path in paths):
+        preprocessor.schedule(preprocessor.find_tags(page))
+
+
+def prerenderArticles(gen):
+    prerenderTags(gen, 'ARTICLE')
+
+
+def prerenderPages(gen):
+    prerenderTags(gen, 'PAGE')
+
+
 def register():
     signals.initialized.connect(addLiquidTags)
+    signals.article_generator_init.connect(prerenderArticles)
+    signals.page_generator_init.connect(prerenderPages)
+    signals.finalized.connect(reset)
+    signals.finalized.connect(write_assets)
@@ -11,51 +11,119 @@ either markdown or html.
 """
 import warnings
 import markdown
-import itertools
 import re
 import os
 from functools import wraps
 
+from .fetch import get_fetcher
+from .parallel import get_processes, schedule
+from .render_cache import cached_tag
+
 # Define some regular expressions
 LIQUID_TAG = re.compile(r'\{%.*?%\}', re.MULTILINE | re.DOTALL)
 EXTRACT_TAG = re.compile(r'(?:\s*)(\S+)(?:\s*)')
 LT_CONFIG = { 'CODE_DIR': 'code',
               'NOTEBOOK_DIR': 'notebooks',
               'FLICKR_API_KEY': 'flickr',
-              'GIPHY_API_KEY': 'giphy'
+              'GIPHY_API_KEY': 'giphy',
+              'CACHE_PATH': 'cache',
+              'LIQUID_TAGS_CACHE': False,
+              'LIQUID_TAGS_CACHE_SIZE': 64 * 1024 * 1024,
+              'LIQUID_TAGS_FETCH_TTL': -1,
+              'LIQUID_TAGS_FETCH_TIMEOUT': 10,
+              'LIQUID_TAGS_FETCH_FIXTURES': '',
+              'LIQUID_TAGS_OFFLINE': False,
+              'LIQUID_TAGS_JOBS': 1,
+              'LIQUID_TAGS_ASSET_DIR': '',
+              'SITEURL': ''
 }
 LT_HELP = { 'CODE_DIR' : 'Code directory for include_code subplugin',
             'NOTEBOOK_DIR' : 'Notebook directory for notebook subplugin',
             'FLICKR_API_KEY': 'Flickr key for accessing the API',
-            'GIPHY_API_KEY': 'Giphy key for accessing the API'
+            'GIPHY_API_KEY': 'Giphy key for accessing the API',
+            'CACHE_PATH': 'Directory of the render cache',
+            'LIQUID_TAGS_CACHE': 'Cache the output of expensive tags',
+            'LIQUID_TAGS_CACHE_SIZE': 'Maximum size of the render cache',
+            'LIQUID_TAGS_FETCH_TTL': 'Seconds web responses are cached for',
+            'LIQUID_TAGS_FETCH_TIMEOUT': 'Timeout of web requests',
+            'LIQUID_TAGS_FETCH_FIXTURES': 'Directory of web responses to use',
+            'LIQUID_TAGS_OFFLINE': 'Only use cached web responses',
+            'LIQUID_TAGS_JOBS': 'Processes rendering expensive tags',
+            'LIQUID_TAGS_ASSET_DIR': 'Output directory of rendered images',
+            'SITEURL': 'URL of the site, prefixing the images'
 }
 
 class _LiquidTagsPreprocessor(markdown.preprocessors.Preprocessor):
     _tags = {}
+    _urls = {}
+    _jobs = {}
     def __init__(self, configs):
         self.configs = configs
 
-    def run(self, lines):
-        page = '\n'.join(lines)
-        liquid_tags = LIQUID_TAG.findall(page)
-
-        for i, markup in enumerate(liquid_tags):
+    def find_tags(self, page):
+        """Return the (start, end, tag, markup) of the registered tags of a
+        page, in a single pass"""
+        calls = []
+        if '{%' not in page:
+            return calls
+        for match in LIQUID_TAG.finditer(page):
             # remove {% %}
-            markup = markup[2:-2]
-            tag = EXTRACT_TAG.match(markup).groups()[0]
-            markup = EXTRACT_TAG.sub('', markup, 1)
+            markup = match.group()[2:-2]
+            extract = EXTRACT_TAG.match(markup)
+            tag = extract.group(1)
             if tag in self._tags:
-                liquid_tags[i] = self._tags[tag](self, tag, markup.strip())
+                calls.append((match.start(), match.end(), tag,
+                              markup[extract.end():].strip()))
+        return calls
 
-        # add an empty string to liquid_tags so that chaining works
-        liquid_tags.append('')
+    def _collect(self, registry, calls):
+        # Gather what the tags ask for in registry, unless their rendering
+        # is cached
+        items = []
+        for _, _, tag, markup in calls:
+            if tag not in registry:
+                continue
+            is_cached = getattr(self._tags[tag], 'is_cached', None)
+            if is_cached and is_cached(self, tag, markup):
+                continue
+            try:
+                items.extend(registry[tag](self, markup))
+            except ValueError:
+                # Invalid markup, reported by the tag itself
+                pass
+        return items
 
-        # reconstruct string
-        page = ''.join(itertools.chain(*zip(LIQUID_TAG.split(page),
-                                            liquid_tags)))
+    def prefetch(self, calls):
+        """Fetch the URLs needed by the tags of a page concurrently"""
+        get_fetcher(self.configs).prefetch(self._collect(self._urls, calls))
+
+    def schedule(self, calls):
+        """Dispatch the expensive renderings of tags to the process pool"""
+        processes = get_processes(self.configs)
+        if processes > 1:
+            schedule(self._collect(self._jobs, calls), processes)
+
+    def run(self, lines):
+        page = '\n'.join(lines)
+        # find_tags returns at once for the many pages without tags
+        calls = self.find_tags(page)
+        if not calls:
+            return lines
+
+        self.schedule(calls)
+        self.prefetch(calls)
+
+        # reconstruct string, substituting the tags
+        parts = []
+        position = 0
+        for start, end, tag, markup in calls:
+            parts.append(page[position:start])
+            parts.append(self._tags[tag](self, tag, markup))
+            position = end
+        parts.append(page[position:])
 
         # resplit the lines
-        return page.split("\n")
+        return ''.join(parts).split("\n")
 
 
 class LiquidTags(markdown.Extension):
@@ -73,12 +141,35 @@ class LiquidTags(markdown.Extension):
             super(LiquidTags,self).__init__(config)
 
     @classmethod
-    def register(cls, tag):
-        """Decorator to register a new include tag"""
+    def register(cls, tag, cached=False, files=None, settings=(),
+                 urls=None, jobs=None):
+        """Decorator to register a new include tag
+
+        Tags registered with cached=True go through the render cache when
+        LIQUID_TAGS_CACHE is set. files is a function of (preprocessor,
+        markup) giving the paths read by the tag, and settings the names of
+        the configs it uses, which are part of the cache key.
+
+        urls is a function of (preprocessor, markup) giving the (url, head)
+        requests the tag makes through fetch, prefetched for all the tags of
+        a page at once.
+
+        jobs is a function of (preprocessor, markup) giving the (renderer,
+        arguments) the tag calls through parallel.call, dispatched to a
+        process pool ahead of the substitution when LIQUID_TAGS_JOBS is set.
+        """
         def dec(func):
             if tag in _LiquidTagsPreprocessor._tags:
                 warnings.warn("Enhanced Markdown: overriding tag '%s'" % tag)
-            _LiquidTagsPreprocessor._tags[tag] = func
+            if cached:
+                _LiquidTagsPreprocessor._tags[tag] = cached_tag(
+                    func, files, settings)
+            else:
+                _LiquidTagsPreprocessor._tags[tag] = func
+            if urls:
+                _LiquidTagsPreprocessor._urls[tag] = urls
+            if jobs:
+                _LiquidTagsPreprocessor._jobs[tag] = jobs
             return func
         return dec
 
@@ -54,6 +54,7 @@ from functools import partial
 from io import open
 
 from .mdx_liquid_tags import LiquidTags
+from .parallel import call
 
 import IPython
 IPYTHON_VERSION = IPython.version_info[0]
@@ -234,13 +235,16 @@ class SubCell(Preprocessor):
                      help="last cell of notebook to be converted")
 
     def preprocess(self, nb, resources):
+        # The slice of each conversion comes with its resources, so that
+        # exporters can be shared by all the tags
+        start, end = resources.get('subcell', (self.start, self.end))
         nbc = deepcopy(nb)
         if IPYTHON_VERSION < 3:
             for worksheet in nbc.worksheets:
                 cells = worksheet.cells[:]
-                worksheet.cells = cells[self.start:self.end]
+                worksheet.cells = cells[start:end]
         else:
-            nbc.cells = nbc.cells[self.start:self.end]
+            nbc.cells = nbc.cells[start:end]
 
         return nbc, resources
 
@@ -251,11 +255,13 @@ class SubCell(Preprocessor):
 #----------------------------------------------------------------------
 # Custom highlighter:
 #  instead of using class='highlight', use class='highlight-ipynb'
+FORMATTER = HtmlFormatter(cssclass='highlight-ipynb')
+
+
 def custom_highlighter(source, language='ipython', metadata=None):
-    formatter = HtmlFormatter(cssclass='highlight-ipynb')
     if not language:
         language = 'ipython'
-    output = _pygments_highlight(source, formatter, language)
+    output = _pygments_highlight(source, FORMATTER, language)
     return output.replace('<pre>', '<pre class="ipynb">')
 
 
@@ -266,8 +272,91 @@ SYNTAX = "{% notebook /path/to/notebook.ipynb [ cells[start:end] ] [ language[la
 FORMAT = re.compile(r"""^(\s+)?(?P<src>\S+)(\s+)?((cells\[)(?P<start>-?[0-9]*):(?P<end>-?[0-9]*)(\]))?(\s+)?((language\[)(?P<language>-?[a-z0-9\+\-]*)(\]))?(\s+)?$""")
 
 
-@LiquidTags.register('notebook')
-def notebook(preprocessor, tag, markup):
+def _notebook_files(preprocessor, markup):
+    """Return the notebook read by the tag, for the render cache.
+
+    Renderings are not cached until the header file exists, since it is
+    only written when a notebook is converted."""
+    if not notebook.header_saved and not os.path.exists('_nb_header.html'):
+        return None
+    match = FORMAT.search(markup)
+    if not match:
+        return []
+    nb_dir = preprocessor.configs.getConfig('NOTEBOOK_DIR')
+    return [os.path.join('content', nb_dir, match.group('src')),
+            'pelicanhtml_1.tpl', 'pelicanhtml_2.tpl', 'pelicanhtml_3.tpl']
+
+
+# Exporters by template and language, shared by all the tags
+_exporters = {}
+
+# Parsed notebooks by path, with their modification time
+_notebooks = {}
+
+
+def get_template_file():
+    """Return the template of the notebooks, the pelican one if it exists"""
+    template_file = 'basic'
+    if IPYTHON_VERSION >= 3:
+        if os.path.exists('pelicanhtml_3.tpl'):
+            template_file = 'pelicanhtml_3'
+    elif IPYTHON_VERSION == 2:
+        if os.path.exists('pelicanhtml_2.tpl'):
+            template_file = 'pelicanhtml_2'
+    else:
+        if os.path.exists('pelicanhtml_1.tpl'):
+            template_file = 'pelicanhtml_1'
+    return template_file
+
+
+def get_exporter(template_file, language):
+    """Return the exporter converting notebooks with the given template
+    and highlighting language, creating it on first use"""
+    key = (template_file, language)
+    if key not in _exporters:
+        c = Config({'CSSHTMLHeaderTransformer':
+                        {'enabled':True, 'highlight_class':'.highlight-ipynb'},
+                    'SubCell':
+                        {'enabled':True}})
+
+        if IPYTHON_VERSION >= 2:
+            subcell_kwarg = dict(preprocessors=[SubCell])
+        else:
+            subcell_kwarg = dict(transformers=[SubCell])
+
+        language_applied_highlighter = partial(custom_highlighter,
+                                               language=language)
+        _exporters[key] = HTMLExporter(
+            config=c,
+            template_file=template_file,
+            filters={'highlight2html': language_applied_highlighter},
+            **subcell_kwarg)
+    return _exporters[key]
+
+
+def read_notebook(nb_path):
+    """Return the parsed notebook, reading it again only if it changed"""
+    mtime = os.path.getmtime(nb_path)
+    cached = _notebooks.get(nb_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(nb_path, encoding='utf-8') as f:
+        nb_text = f.read()
+        if IPYTHON_VERSION < 3:
+            nb_json = IPython.nbformat.current.reads_json(nb_text)
+        else:
+            try:
+                nb_json = nbformat.reads(nb_text, as_version=4)
+            except:
+                nb_json = IPython.nbformat.reads(nb_text, as_version=4)
+    # Exporters convert a copy of the notebook, so it can be shared
+    _notebooks[nb_path] = (mtime, nb_json)
+    return nb_json
+
+
+def parse_markup(preprocessor, markup):
+    """Return the path, cell range and language of a notebook tag"""
     match = FORMAT.search(markup)
     if match:
         argdict = match.groupdict()
@@ -289,53 +378,40 @@ def notebook(preprocessor, tag, markup):
     else:
         end = None
 
-    language_applied_highlighter = partial(custom_highlighter, language=language)
-
     nb_dir =  preprocessor.configs.getConfig('NOTEBOOK_DIR')
     nb_path = os.path.join('content', nb_dir, src)
 
     if not os.path.exists(nb_path):
         raise ValueError("File {0} could not be found".format(nb_path))
 
-    # Create the custom notebook converter
-    c = Config({'CSSHTMLHeaderTransformer':
-                    {'enabled':True, 'highlight_class':'.highlight-ipynb'},
-                'SubCell':
-                    {'enabled':True, 'start':start, 'end':end}})
+    return nb_path, start, end, language
 
-    template_file = 'basic'
-    if IPYTHON_VERSION >= 3:
-        if os.path.exists('pelicanhtml_3.tpl'):
-            template_file = 'pelicanhtml_3'
-    elif IPYTHON_VERSION == 2:
-        if os.path.exists('pelicanhtml_2.tpl'):
-            template_file = 'pelicanhtml_2'
-    else:
-        if os.path.exists('pelicanhtml_1.tpl'):
-            template_file = 'pelicanhtml_1'
 
-    if IPYTHON_VERSION >= 2:
-        subcell_kwarg = dict(preprocessors=[SubCell])
-    else:
-        subcell_kwarg = dict(transformers=[SubCell])
+def convert_notebook(nb_path, start, end, language, template_file):
+    """Return the HTML of a range of cells of a notebook, and its CSS"""
+    # Get the shared notebook converter and the parsed notebook
+    exporter = get_exporter(template_file, language)
+    nb_json = read_notebook(nb_path)
 
-    exporter = HTMLExporter(config=c,
-                            template_file=template_file,
-                            filters={'highlight2html': language_applied_highlighter},
-                            **subcell_kwarg)
+    (body, resources) = exporter.from_notebook_node(
+        nb_json, resources={'subcell': (start, end)})
+    return body, list(resources['inlining']['css'])
 
-    # read and parse the notebook
-    with open(nb_path, encoding='utf-8') as f:
-        nb_text = f.read()
-        if IPYTHON_VERSION < 3:
-            nb_json = IPython.nbformat.current.reads_json(nb_text)
-        else:
-            try:
-                nb_json = nbformat.reads(nb_text, as_version=4)
-            except:
-                nb_json = IPython.nbformat.reads(nb_text, as_version=4)
 
-    (body, resources) = exporter.from_notebook_node(nb_json)
+def _jobs(preprocessor, markup):
+    """Conversions of the tag, run ahead on the process pool"""
+    nb_path, start, end, language = parse_markup(preprocessor, markup)
+    return [(convert_notebook,
+             (nb_path, start, end, language, get_template_file()))]
+
+
+@LiquidTags.register('notebook', cached=True, files=_notebook_files,
+                     settings=('NOTEBOOK_DIR',), jobs=_jobs)
+def notebook(preprocessor, tag, markup):
+    nb_path, start, end, language = parse_markup(preprocessor, markup)
+
+    body, css = call(convert_notebook, nb_path, start, end, language,
+                     get_template_file())
 
     # if we haven't already saved the header, save it here.
     if not notebook.header_saved:
@@ -343,7 +419,7 @@ def notebook(preprocessor, tag, markup):
                "this should be included in the theme. **\n")
 
         header = '\n'.join(CSS_WRAPPER.format(css_line)
-                           for css_line in resources['inlining']['css'])
+                           for css_line in css)
         header += JS_INCLUDE
 
         with open('_nb_header.html', 'w') as f:
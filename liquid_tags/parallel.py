@@ -0,0 +1,87 @@
+"""
+Parallel Rendering
+------------------
+Runs the expensive renderers of tags (graphviz, blockdiag, pygal, notebook
+conversion) on a process pool ahead of the markdown conversion, in two
+phases:
+
+1. When the article and page generators start, their markdown sources are
+   scanned for tags, and the renderings these tags need are dispatched to
+   the pool. The tags of each page are dispatched again, if needed, when
+   the page is preprocessed.
+2. When a tag is substituted, its renderer call returns the result computed
+   by the pool, waiting for it if needed.
+
+Enabled with ``LIQUID_TAGS_JOBS``: the number of processes, 0 for one per
+core. With the default of 1, renderers run in turn within the build.
+"""
+import io
+import logging
+import multiprocessing
+
+logger = logging.getLogger(__name__)
+
+# Extensions of the files read by the markdown reader of pelican
+MARKDOWN_EXTENSIONS = ('md', 'markdown', 'mkd', 'mdown')
+
+_pool = None
+
+# Pending or finished renderings, by renderer and arguments
+_results = {}
+
+
+def job_key(func, args):
+    return (func.__module__, func.__name__, args)
+
+
+def get_processes(configs):
+    """Return the number of processes to use, 1 when disabled."""
+    jobs = configs.getConfig('LIQUID_TAGS_JOBS')
+    if jobs == 0:
+        jobs = multiprocessing.cpu_count()
+    return max(jobs, 1)
+
+
+def schedule(jobs, processes):
+    """Dispatch (renderer, arguments) tuples to the pool.
+
+    Renderers must be module level functions, and arguments picklable.
+    """
+    global _pool
+    if processes <= 1:
+        return
+    for func, args in jobs:
+        key = job_key(func, args)
+        if key in _results:
+            continue
+        if _pool is None:
+            _pool = multiprocessing.Pool(processes)
+        _results[key] = _pool.apply_async(func, args)
+
+
+def call(func, *args):
+    """Return func(*args), as computed by the pool if it was dispatched."""
+    result = _results.get(job_key(func, args))
+    if result is not None:
+        return result.get()
+    return func(*args)
+
+
+def reset(*args):
+    """Stop the pool and forget the renderings, at the end of a build."""
+    global _pool
+    if _pool is not None:
+        _pool.terminate()
+        _pool.join()
+        _pool = None
+    _results.clear()
+
+
+def scan_sources(paths):
+    """Return the text of the source files, skipping unreadable ones."""
+    for path in paths:
+        try:
+            with io.open(path, encoding='utf-8') as f:
+                yield f.read()
+        except (IOError, OSError, UnicodeDecodeError) as e:
+            logger.debug('Could not scan %s for liquid tags: %s', path, e)
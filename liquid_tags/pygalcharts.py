@@ -89,17 +89,18 @@ Output
 
 """
 
-import base64
 import re
 from json import loads
+from .assets import image_src
 from .mdx_liquid_tags import LiquidTags
+from .parallel import call
 
 SYNTAX = '{% pygal (data) %}'
 DOT_BLOCK_RE = re.compile(r'^\s*\{\s*(?P<code>.*\})\s*\}$', re.MULTILINE | re.DOTALL)
 
 
-def run_pygal(data, options=[], format='svg'):
-    """ Runs pygal programs and returns image data
+def run_pygal(data, options=[], format='svg', data_uri=True):
+    """ Runs pygal programs and returns image data, as a data URI or SVG
     """
     import pygal
 
@@ -140,21 +141,36 @@ def run_pygal(data, options=[], format='svg'):
             values = data_set.get('values', None)
             chart.add(title, values)
         # now render
-        result = chart.render_data_uri()
+        result = chart.render_data_uri() if data_uri else chart.render()
     else:
         result = None
     return result
 
-@LiquidTags.register('pygal')
+def render_chart(markup):
+    """ Renders the chart described by the JSON markup of a tag """
+    return run_pygal(loads(markup), data_uri=False)
+
+
+def _jobs(preprocessor, markup):
+    """ Renderings of the tag, run ahead on the process pool """
+    if loads(markup) is None:
+        return []
+    return [(render_chart, (markup,))]
+
+
+@LiquidTags.register('pygal', cached=True, jobs=_jobs,
+                     settings=('LIQUID_TAGS_ASSET_DIR', 'SITEURL'))
 def pygal_parser(preprocessor, tag, markup):
     """ Simple pygal parser """
     # Find JSON payload
     data = loads(markup)
     if tag == 'pygal' and data is not None:
         # Run generation of chart
-        output = run_pygal(data)
+        output = call(render_chart, markup)
+        src = image_src(preprocessor, output, '.svg',
+                        'image/svg+xml;charset=utf-8')
         # Return embedded SVG image
-        return '<div class="pygal" style="text-align: center;"><embed type="image/svg+xml" src=%s style="max-width:1000px"/></div>' % output
+        return '<div class="pygal" style="text-align: center;"><embed type="image/svg+xml" src="%s" style="max-width:1000px"/></div>' % src
 
     else:
         raise ValueError('Error processing input. \nExpected syntax: {0}'.format(SYNTAX))
@@ -0,0 +1,256 @@
+"""
+Render Cache
+------------
+A content-addressed cache of the HTML produced by liquid-style tags, so that
+tags which run external programs (graphviz, blockdiag, nbconvert...) or query
+web APIs (flickr, giphy...) are only rendered again when their input changes.
+
+Entries are keyed by the tag, its markup, the digest of the files it reads
+and the settings it depends on. They are stored as JSON files in the
+``liquid_tags`` subdirectory of ``CACHE_PATH``, which is kept under
+``LIQUID_TAGS_CACHE_SIZE`` bytes by removing the least recently used ones.
+
+Tags may store HTML in the markdown stash: these fragments are recorded
+along with the output and stored again in the stash of the page when the
+entry is used, since stash placeholders only make sense within one page.
+Likewise, the images written to the output are recorded and registered again.
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+
+from .assets import get_asset, register_asset
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of the entries changes
+CACHE_VERSION = 2
+
+# Stands for the Nth fragment stored in the stash while rendering a tag
+STASH_MARK = u'\x02liquid_tags:{0}\x03'
+
+# One cache per directory, shared by the whole process
+_caches = {}
+
+
+def file_digest(path):
+    """Return the SHA-1 of the content of path, or None if it is missing."""
+    digest = hashlib.sha1()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                digest.update(chunk)
+    except (IOError, OSError):
+        return None
+    return digest.hexdigest()
+
+
+def cache_key(func, tag, markup, files, settings):
+    """Return the key of a rendering.
+
+    :param files: Paths read by the tag
+    :param settings: (name, value) tuples of the settings used by the tag
+    """
+    data = json.dumps([CACHE_VERSION, func.__module__, func.__name__, tag,
+                       markup, [(path, file_digest(path)) for path in files],
+                       [(name, repr(value)) for name, value in settings]])
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def get_cache(directory, max_size):
+    """Return the cache kept in directory, shared by all pages."""
+    cache = _caches.get(directory)
+    if cache is None:
+        cache = _caches[directory] = RenderCache(directory, max_size)
+    cache.max_size = max_size
+    return cache
+
+
+class RenderCache(object):
+    """Least recently used cache of renderings, bounded in bytes."""
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self._entries = None
+        self.size = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def _scan(self):
+        # Size and last use of every entry, read once per process
+        if self._entries is not None:
+            return
+        self._entries = {}
+        for dirpath, _, filenames in os.walk(self.directory):
+            for name in filenames:
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(dirpath, name))
+                except OSError:
+                    continue
+                self._entries[name[:-5]] = [stat.st_mtime, stat.st_size]
+                self.size += stat.st_size
+
+    def get(self, key):
+        """Return the entry stored for key, or None."""
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            # Mark the entry as recently used
+            os.utime(path, None)
+        except (IOError, OSError, ValueError):
+            return None
+        self._scan()
+        if key in self._entries:
+            self._entries[key][0] = os.path.getmtime(path)
+        return entry
+
+    def has(self, key):
+        """Return True if an entry is stored for key."""
+        return os.path.exists(self._path(key))
+
+    def put(self, key, entry):
+        """Store entry for key, evicting the least recently used ones."""
+        self._scan()
+        path = self._path(key)
+        data = json.dumps(entry)
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path + '.tmp', 'w') as f:
+                f.write(data)
+            os.rename(path + '.tmp', path)
+            stat = os.stat(path)
+        except (IOError, OSError) as e:
+            logger.warning('Could not cache liquid tag rendering: %s', e)
+            return
+        if key in self._entries:
+            self.size -= self._entries[key][1]
+        self._entries[key] = [stat.st_mtime, stat.st_size]
+        self.size += stat.st_size
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries beyond max_size."""
+        if self.size <= self.max_size:
+            return
+        for key, (_, size) in sorted(self._entries.items(),
+                                     key=lambda item: item[1][0]):
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            del self._entries[key]
+            self.size -= size
+            if self.size <= self.max_size:
+                break
+
+
+class _RecordingStash(object):
+    """Stand-in for the markdown stash, recording what tags store in it."""
+
+    def __init__(self):
+        self.fragments = []
+
+    def store(self, html, *args, **kwargs):
+        self.fragments.append([html, list(args), kwargs])
+        return STASH_MARK.format(len(self.fragments) - 1)
+
+
+class _RecordingConfigs(object):
+    """Extension configs of a page, with a recording stash."""
+
+    def __init__(self, configs, stash):
+        self._configs = configs
+        self.htmlStash = stash
+
+    def __getattr__(self, name):
+        return getattr(self._configs, name)
+
+
+class _RecordingPreprocessor(object):
+    """Preprocessor of a page, with a recording stash, recording the images
+    written to the output."""
+
+    def __init__(self, preprocessor, stash):
+        self._preprocessor = preprocessor
+        self.configs = _RecordingConfigs(preprocessor.configs, stash)
+        self.assets = []
+
+    def __getattr__(self, name):
+        return getattr(self._preprocessor, name)
+
+
+def render(func, preprocessor, tag, markup):
+    """Call a tag, returning an entry which can be cached and replayed."""
+    stash = _RecordingStash()
+    recording = _RecordingPreprocessor(preprocessor, stash)
+    output = func(recording, tag, markup)
+    assets = [[path, base64.b64encode(get_asset(path)).decode('ascii')]
+              for path in recording.assets]
+    return {'output': output, 'stash': stash.fragments, 'assets': assets}
+
+
+def replay(entry, preprocessor):
+    """Return the output of a rendering, storing its fragments in the stash
+    of the page."""
+    output = entry['output']
+    for path, data in entry['assets']:
+        register_asset(path, base64.b64decode(data))
+    if output is None:
+        return output
+    for i, (html, args, kwargs) in enumerate(entry['stash']):
+        placeholder = preprocessor.configs.htmlStash.store(
+            html, *args, **kwargs)
+        output = output.replace(STASH_MARK.format(i), placeholder)
+    return output
+
+
+def cached_tag(func, files=None, settings=()):
+    """Wrap a tag so that its renderings go through the render cache.
+
+    :param files: Function of (preprocessor, markup) returning the paths the
+        tag reads, or None when the rendering must not be cached
+    :param settings: Names of the configs the tag depends on
+    """
+    def locate(preprocessor, tag, markup):
+        # Return the cache and key of a rendering, or None if not cached
+        configs = preprocessor.configs
+        if not configs.getConfig('LIQUID_TAGS_CACHE'):
+            return None
+        paths = files(preprocessor, markup) if files else []
+        if paths is None:
+            return None
+        cache = get_cache(
+            os.path.join(configs.getConfig('CACHE_PATH'), 'liquid_tags'),
+            configs.getConfig('LIQUID_TAGS_CACHE_SIZE'))
+        key = cache_key(func, tag, markup, paths,
+                        [(name, configs.getConfig(name)) for name in settings])
+        return cache, key
+
+    def wrapper(preprocessor, tag, markup):
+        location = locate(preprocessor, tag, markup)
+        if location is None:
+            return func(preprocessor, tag, markup)
+        cache, key = location
+        entry = cache.get(key)
+        if entry is None:
+            entry = render(func, preprocessor, tag, markup)
+            cache.put(key, entry)
+        return replay(entry, preprocessor)
+
+    def is_cached(preprocessor, tag, markup):
+        """Return True if the rendering is in the cache."""
+        location = locate(preprocessor, tag, markup)
+        return location is not None and location[0].has(location[1])
+
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    wrapper.is_cached = is_cached
+    return wrapper
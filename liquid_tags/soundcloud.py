@@ -21,21 +21,25 @@ from .mdx_liquid_tags import LiquidTags
 import re
 import json
 try:
-    from urllib.request import urlopen
+    from urllib.parse import urlencode
 except ImportError:
-    from urllib import urlopen
+    from urllib import urlencode
+from .fetch import fetch
 
 
 SYNTAX = '{% soundcloud track_url %}'
 PARSE_SYNTAX = re.compile(r'(?P<track_url>https?://soundcloud.com/[\S]+)')
 
 
-def get_widget(track_url):
-    r = urlopen(
-        'http://soundcloud.com/oembed',
-        data='format=json&url={}'.format(track_url).encode('utf-8'))
+def widget_url(track_url):
+    return 'http://soundcloud.com/oembed?' + urlencode(
+        [('format', 'json'), ('url', track_url)])
 
-    return json.loads(r.read().decode('utf-8'))['html']
+
+def get_widget(track_url, configs=None):
+    r = fetch(widget_url(track_url), configs)
+
+    return json.loads(r.body.decode('utf-8'))['html']
 
 
 def match_it(markup):
@@ -47,11 +51,15 @@ def match_it(markup):
                          'Expected syntax: {}'.format(SYNTAX))
 
 
-@LiquidTags.register('soundcloud')
+def _urls(preprocessor, markup):
+    return [(widget_url(match_it(markup)['track_url']), False)]
+
+
+@LiquidTags.register('soundcloud', cached=True, urls=_urls)
 def soundcloud(preprocessor, tag, markup):
     track_url = match_it(markup)['track_url']
 
-    return get_widget(track_url)
+    return get_widget(track_url, preprocessor.configs)
 
 
 # ---------------------------------------------------
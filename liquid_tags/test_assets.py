@@ -0,0 +1,44 @@
+from . import assets, render_cache
+from .mdx_liquid_tags import _LiquidTagsPreprocessor
+from .testing import Configs
+import hashlib
+
+
+class FakePelican(object):
+    def __init__(self, output_path):
+        self.settings = {'OUTPUT_PATH': output_path}
+
+
+def test_inline_by_default():
+    preprocessor = _LiquidTagsPreprocessor(Configs())
+    assert assets.image_src(preprocessor, b'abc', '.png', 'image/png') == \
+        'data:image/png;base64,YWJj'
+
+
+def test_written_once_to_output(tmpdir):
+    assets._assets.clear()
+    preprocessor = _LiquidTagsPreprocessor(Configs(
+        LIQUID_TAGS_ASSET_DIR='images/tags', SITEURL='http://example.com/'))
+    src = assets.image_src(preprocessor, b'abc', '.png')
+    assert src == assets.image_src(preprocessor, b'abc', '.png')
+    name = hashlib.sha1(b'abc').hexdigest()[:20] + '.png'
+    assert src == 'http://example.com/images/tags/' + name
+
+    assets.write_assets(FakePelican(str(tmpdir)))
+    assert tmpdir.join('images', 'tags', name).read_binary() == b'abc'
+    assert len(tmpdir.join('images', 'tags').listdir()) == 1
+    assert assets._assets == {}
+
+
+def test_recorded_by_render_cache():
+    assets._assets.clear()
+    preprocessor = _LiquidTagsPreprocessor(Configs(
+        LIQUID_TAGS_ASSET_DIR='images'))
+
+    def tag(preprocessor, tag, markup):
+        return assets.image_src(preprocessor, markup.encode('utf-8'), '.svg')
+
+    entry = render_cache.render(tag, preprocessor, 'tag', 'abc')
+    assets._assets.clear()
+    assert render_cache.replay(entry, preprocessor) == entry['output']
+    assert list(assets._assets.values()) == [b'abc']
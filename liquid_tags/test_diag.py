@@ -0,0 +1,38 @@
+from . import diag
+from .mdx_liquid_tags import _LiquidTagsPreprocessor
+from .testing import Configs
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+import pytest
+
+pytest.importorskip('blockdiag')
+
+
+CODE = 'blockdiag { A -> B; }'
+
+
+def test_render_png_in_memory(tmpdir):
+    with tmpdir.as_cwd():
+        data = diag.render_diag(CODE, 'blockdiag', 'PNG')
+        assert not tmpdir.listdir()
+    assert data.startswith(b'\x89PNG')
+
+
+def test_diagrams_cached_by_source():
+    diag._diagrams.clear()
+    with patch('liquid_tags.diag.render_diag',
+               wraps=diag.render_diag) as render:
+        first = diag.diag(CODE, 'blockdiag')
+        assert diag.diag(CODE, 'blockdiag') is first
+        diag.diag(CODE.replace('B', 'C'), 'blockdiag')
+    assert render.call_count == 2
+
+
+def test_inline_svg():
+    preprocessor = _LiquidTagsPreprocessor(Configs())
+    with patch('liquid_tags.diag._draw_mode', 'SVG'):
+        html = diag.blockdiag_parser(preprocessor, 'blockdiag', CODE)
+    assert html.startswith('<span class="blockdiag" style="align: center;">'
+                           '<svg')
@@ -0,0 +1,84 @@
+from . import fetch
+from .testing import Configs
+try:
+    from unittest.mock import patch, MagicMock
+except ImportError:
+    from mock import patch, MagicMock
+try:
+    from urllib.error import HTTPError
+except ImportError:
+    from urllib2 import HTTPError
+import pytest
+
+
+def response(url, body, headers=None):
+    r = MagicMock()
+    r.read.return_value = body
+    r.geturl.return_value = url
+    r.info.return_value = headers or {}
+    return r
+
+
+@patch('liquid_tags.fetch.urlopen')
+def test_cached_for_ttl(mock_urlopen, tmpdir):
+    mock_urlopen.return_value = response('http://a/', b'body')
+    fetcher = fetch.Fetcher(str(tmpdir), ttl=3600)
+    assert fetcher.fetch('http://a/') == ('http://a/', b'body')
+    assert fetch.Fetcher(str(tmpdir), ttl=3600).fetch('http://a/').body \
+        == b'body'
+    assert mock_urlopen.call_count == 1
+
+
+@patch('liquid_tags.fetch.urlopen')
+def test_revalidated_with_etag(mock_urlopen, tmpdir):
+    mock_urlopen.return_value = response('http://a/', b'body',
+                                         {'ETag': '"v1"'})
+    fetcher = fetch.Fetcher(str(tmpdir), ttl=0)
+    fetcher.fetch('http://a/')
+
+    mock_urlopen.side_effect = HTTPError('http://a/', 304, 'Not Modified',
+                                         {}, None)
+    assert fetcher.fetch('http://a/').body == b'body'
+    request = mock_urlopen.call_args[0][0]
+    assert request.get_header('If-none-match') == '"v1"'
+
+
+@patch('liquid_tags.fetch.urlopen')
+def test_offline_and_fixtures(mock_urlopen, tmpdir):
+    cache_dir = str(tmpdir.join('cache'))
+    offline = fetch.Fetcher(cache_dir, ttl=0, offline=True)
+    with pytest.raises(RuntimeError):
+        offline.fetch('http://a/', head=True)
+
+    mock_urlopen.return_value = response('http://b/', b'')
+    fetch.Fetcher(cache_dir, ttl=0).fetch('http://a/', head=True)
+    assert mock_urlopen.call_count == 1
+
+    # Stale responses are served offline, and the cache makes fixtures
+    assert offline.fetch('http://a/', head=True).url == 'http://b/'
+    fixtures = fetch.Fetcher(fixtures=cache_dir)
+    assert fixtures.fetch('http://a/', head=True).url == 'http://b/'
+    assert mock_urlopen.call_count == 1
+
+
+def test_offline_reads_cache_without_ttl(tmpdir):
+    online = fetch.get_fetcher(Configs(CACHE_PATH=str(tmpdir)))
+    assert online.cache_dir is None
+    offline = fetch.get_fetcher(Configs(CACHE_PATH=str(tmpdir),
+                                        LIQUID_TAGS_OFFLINE=True))
+    assert offline.cache_dir == str(tmpdir.join('liquid_tags_http'))
+
+
+@patch('liquid_tags.fetch.urlopen')
+def test_prefetch(mock_urlopen):
+    mock_urlopen.side_effect = lambda request, timeout: response(
+        request.get_full_url(), request.get_full_url().encode('utf-8'))
+    fetcher = fetch.Fetcher()
+    fetcher.prefetch([('http://a/', False), ('http://b/', False)])
+    assert mock_urlopen.call_count == 2
+    assert fetcher.fetch('http://b/').body == b'http://b/'
+    assert fetcher.fetch('http://a/').body == b'http://a/'
+    assert mock_urlopen.call_count == 2
+    # Prefetched responses are only used once
+    fetcher.fetch('http://a/')
+    assert mock_urlopen.call_count == 3
@@ -59,7 +59,7 @@ def test_source_url(input, expected):
         input[0], input[1], input[2], input[3], input[4]) == expected
 
 
-@patch('liquid_tags.flickr.urlopen')
+@patch('liquid_tags.fetch.urlopen')
 def test_generage_html(mock_urlopen):
     # mock the return to deliver the flickr.json file instead
     with open(TEST_DATA_DIR + '/flickr.json', 'rb') as f:
@@ -21,7 +21,7 @@ TEST_DATA_DIR = os.path.join(PLUGIN_DIR, 'test_data')
       '<img src="http://media2.giphy.com/media/'
       'aMSJFS6oFX0fC/giphy.gif" alt="ive had some free time"></a>'))
 ])
-@patch('liquid_tags.giphy.urlopen')
+@patch('liquid_tags.fetch.urlopen')
 def test_create_html(mock_urlopen, input, expected):
     with open(TEST_DATA_DIR + '/giphy.json', 'rb') as f:
         mock_urlopen.return_value.read.return_value = f.read()
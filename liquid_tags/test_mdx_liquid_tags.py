@@ -0,0 +1,22 @@
+from .mdx_liquid_tags import _LiquidTagsPreprocessor
+from .testing import Configs
+
+
+class EchoPreprocessor(_LiquidTagsPreprocessor):
+    _tags = {'echo': lambda preprocessor, tag, markup: '<' + markup + '>'}
+    _urls = {}
+    _jobs = {}
+
+
+def test_substitutes_registered_tags():
+    preprocessor = EchoPreprocessor(Configs())
+    lines = ['a {% echo  one %} {% unknown two %}', '{%echo',
+             'three %}b', '{% echo %}']
+    assert preprocessor.run(lines) == [
+        'a <one> {% unknown two %}', '<three>b', '<>']
+
+
+def test_pages_without_tags_unchanged():
+    preprocessor = EchoPreprocessor(Configs())
+    lines = ['no tags', '{ % here %}', '{% unknown %}']
+    assert preprocessor.run(lines) is lines
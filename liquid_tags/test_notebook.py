@@ -1,4 +1,7 @@
+import os
 import re
+from shutil import rmtree
+from tempfile import mkdtemp
 
 from pelican.tests.support import unittest
 
@@ -88,5 +91,33 @@ class TestNotebookTagRegex(unittest.TestCase):
         self.assertEqual(language, u'julia')
 
 
+class TestNotebookCaches(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_path = mkdtemp(prefix='pelicantests.')
+        self.nb_path = os.path.join(self.temp_path, 'thing.ipynb')
+        self.write_notebook(1)
+
+    def tearDown(self):
+        rmtree(self.temp_path)
+
+    def write_notebook(self, mtime):
+        with open(self.nb_path, 'w') as f:
+            f.write('{"cells": [], "metadata": {}, '
+                    '"nbformat": 4, "nbformat_minor": 0}')
+        os.utime(self.nb_path, (mtime, mtime))
+
+    def test_notebook_parsed_once(self):
+        nb = notebook.read_notebook(self.nb_path)
+        self.assertIs(nb, notebook.read_notebook(self.nb_path))
+        self.write_notebook(2)
+        self.assertIsNot(nb, notebook.read_notebook(self.nb_path))
+
+    def test_exporter_shared(self):
+        exporter = notebook.get_exporter('basic', 'julia')
+        self.assertIs(exporter, notebook.get_exporter('basic', 'julia'))
+        self.assertIsNot(exporter, notebook.get_exporter('basic', None))
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
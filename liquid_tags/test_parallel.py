@@ -0,0 +1,45 @@
+from . import parallel
+from .mdx_liquid_tags import LiquidTags, _LiquidTagsPreprocessor
+from .testing import Configs
+import os
+import pytest
+
+
+def render_pid(markup):
+    return '{0}:{1}'.format(markup, os.getpid())
+
+
+@pytest.fixture
+def pidtag():
+    def jobs(preprocessor, markup):
+        return [(render_pid, (markup,))]
+
+    @LiquidTags.register('pidtest', jobs=jobs)
+    def pidtest(preprocessor, tag, markup):
+        return parallel.call(render_pid, markup)
+
+    yield
+    del _LiquidTagsPreprocessor._tags['pidtest']
+    del _LiquidTagsPreprocessor._jobs['pidtest']
+    parallel.reset()
+
+
+def run(**configs):
+    preprocessor = _LiquidTagsPreprocessor(Configs(**configs))
+    lines = preprocessor.run(['{% pidtest a %} {% pidtest b %}'])
+    return [tag.split(':') for tag in lines[0].split()]
+
+
+def test_serial_by_default(pidtag):
+    assert run() == [['a', str(os.getpid())], ['b', str(os.getpid())]]
+    assert not parallel._results
+
+
+def test_rendered_on_pool(pidtag):
+    (a, a_pid), (b, b_pid) = run(LIQUID_TAGS_JOBS=2)
+    assert (a, b) == ('a', 'b')
+    assert str(os.getpid()) not in (a_pid, b_pid)
+    assert len(parallel._results) == 2
+
+    parallel.reset()
+    assert parallel._pool is None and not parallel._results
@@ -0,0 +1,75 @@
+from . import render_cache
+from .mdx_liquid_tags import LiquidTags, _LiquidTagsPreprocessor
+from .testing import Configs
+import os
+import pytest
+
+
+@pytest.fixture
+def calls(tmpdir):
+    render_cache._caches.clear()
+    source = tmpdir.join('source.txt')
+    source.write('first')
+    calls = []
+
+    def files(preprocessor, markup):
+        return [str(source)]
+
+    @LiquidTags.register('cachetest', cached=True, files=files,
+                         settings=('CODE_DIR',))
+    def cachetest(preprocessor, tag, markup):
+        calls.append(markup)
+        stashed = preprocessor.configs.htmlStash.store('<b>', safe=True)
+        return '{0}{1}:{2}'.format(stashed, markup, source.read())
+
+    yield calls
+    del _LiquidTagsPreprocessor._tags['cachetest']
+
+
+def run(tmpdir, markup='x', **configs):
+    settings = dict(LIQUID_TAGS_CACHE=True, LIQUID_TAGS_CACHE_SIZE=10 ** 6,
+                    CACHE_PATH=str(tmpdir.join('cache')), CODE_DIR='code')
+    settings.update(configs)
+    preprocessor = _LiquidTagsPreprocessor(Configs(**settings))
+    output = preprocessor.run(['{% cachetest ' + markup + ' %}'])
+    return output, preprocessor.configs.htmlStash.stored
+
+
+def test_cache_hit_replays_stash(tmpdir, calls):
+    first = run(tmpdir)
+    # A new process starts with an empty in-memory cache
+    render_cache._caches.clear()
+    assert run(tmpdir) == first == (['placeholder0x:first'],
+                                    [('<b>', True)])
+    assert calls == ['x']
+
+
+def test_cache_key_inputs(tmpdir, calls):
+    run(tmpdir)
+    run(tmpdir, markup='y')
+    run(tmpdir, CODE_DIR='other')
+    tmpdir.join('source.txt').write('second')
+    assert run(tmpdir)[0] == ['placeholder0x:second']
+    assert calls == ['x', 'y', 'x', 'x']
+
+
+def test_cache_disabled(tmpdir, calls):
+    run(tmpdir, LIQUID_TAGS_CACHE=False)
+    run(tmpdir, LIQUID_TAGS_CACHE=False)
+    assert calls == ['x', 'x']
+    assert not tmpdir.join('cache').check()
+
+
+def test_eviction(tmpdir):
+    cache = render_cache.RenderCache(str(tmpdir), 300)
+    for i, key in enumerate(['aa1', 'bb2', 'cc3']):
+        cache.put(key, {'output': 'o' * 100, 'stash': []})
+        os.utime(cache._path(key), (i, i))
+        cache._entries[key][0] = i
+    assert cache.get('aa1') is None
+    assert cache.get('bb2') is not None
+    cache.put('dd4', {'output': 'o' * 100, 'stash': []})
+    # bb2 was used after cc3
+    assert cache.get('cc3') is None
+    assert cache.get('bb2') is not None
+    assert cache.size <= 300
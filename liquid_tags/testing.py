@@ -0,0 +1,19 @@
+from .mdx_liquid_tags import LT_CONFIG
+
+
+class Stash(object):
+    def __init__(self):
+        self.stored = []
+
+    def store(self, html, safe=False):
+        self.stored.append((html, safe))
+        return 'placeholder{0}'.format(len(self.stored) - 1)
+
+
+class Configs(object):
+    def __init__(self, **configs):
+        self.configs = configs
+        self.htmlStash = Stash()
+
+    def getConfig(self, key):
+        return self.configs.get(key, LT_CONFIG.get(key))
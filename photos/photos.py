@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import collections
 import datetime
+import hashlib
 import itertools
 import json
 import logging
@@ -9,7 +11,11 @@ import multiprocessing
 import os
 import pprint
 import re
+import shutil
 import sys
+import threading
+import time
+import traceback
 
 from pelican.generators import ArticlesGenerator
 from pelican.generators import PagesGenerator
@@ -27,6 +33,11 @@ try:
 except ImportError:
     logger.error('PIL/Pillow not found')
 
+try:
+    from markupsafe import Markup
+except ImportError:
+    from jinja2 import Markup
+
 try:
     import piexif
 except ImportError:
@@ -54,6 +65,8 @@ def initialized(pelican):
     DEFAULT_CONFIG.setdefault('PHOTO_WATERMARK_IMG', '')
     DEFAULT_CONFIG.setdefault('PHOTO_WATERMARK_IMG_SIZE', False)
     DEFAULT_CONFIG.setdefault('PHOTO_RESIZE_JOBS', 1)
+    DEFAULT_CONFIG.setdefault('PHOTO_RESIZE_CACHE', False)
+    DEFAULT_CONFIG.setdefault('PHOTO_FORMATS', ['jpeg'])
     DEFAULT_CONFIG.setdefault('PHOTO_EXIF_KEEP', False)
     DEFAULT_CONFIG.setdefault('PHOTO_EXIF_REMOVE_GPS', False)
     DEFAULT_CONFIG.setdefault('PHOTO_EXIF_AUTOROTATE', True)
@@ -64,6 +77,7 @@ def initialized(pelican):
 
     DEFAULT_CONFIG['queue_resize'] = {}
     DEFAULT_CONFIG['created_galleries'] = {}
+    DEFAULT_CONFIG['notes_cache'] = {}
     DEFAULT_CONFIG['plugin_dir'] = os.path.dirname(os.path.realpath(__file__))
 
     if pelican:
@@ -80,6 +94,8 @@ def initialized(pelican):
         pelican.settings.setdefault('PHOTO_WATERMARK_IMG', '')
         pelican.settings.setdefault('PHOTO_WATERMARK_IMG_SIZE', False)
         pelican.settings.setdefault('PHOTO_RESIZE_JOBS', 1)
+        pelican.settings.setdefault('PHOTO_RESIZE_CACHE', False)
+        pelican.settings.setdefault('PHOTO_FORMATS', ['jpeg'])
         pelican.settings.setdefault('PHOTO_EXIF_KEEP', False)
         pelican.settings.setdefault('PHOTO_EXIF_REMOVE_GPS', False)
         pelican.settings.setdefault('PHOTO_EXIF_AUTOROTATE', True)
@@ -87,9 +103,105 @@ def initialized(pelican):
         pelican.settings.setdefault('PHOTO_EXIF_COPYRIGHT_AUTHOR', pelican.settings['AUTHOR'])
         pelican.settings.setdefault('PHOTO_LIGHTBOX_GALLERY_ATTR', 'data-lightbox')
         pelican.settings.setdefault('PHOTO_LIGHTBOX_CAPTION_ATTR', 'data-title')
+        pelican.settings['PHOTO_FORMATS'] = available_formats(pelican.settings['PHOTO_FORMATS'])
+
+
+# Output formats: name -> (extension, PIL format, MIME type)
+OUTPUT_FORMATS = {
+    'jpeg': ('.jpg', 'JPEG', 'image/jpeg'),
+    'webp': ('.webp', 'WEBP', 'image/webp'),
+    'avif': ('.avif', 'AVIF', 'image/avif'),
+}
+
+
+def available_formats(formats):
+    """Returns the output formats Pillow can write, in order, falling back to JPEG."""
+    Image.init()
+    available = []
+    for fmt in formats:
+        if fmt not in OUTPUT_FORMATS:
+            logger.error('photos: Unknown output format {}'.format(fmt))
+        elif OUTPUT_FORMATS[fmt][1] not in Image.SAVE:
+            logger.warning('photos: Pillow cannot write {} files, skipping this format'.format(fmt))
+        elif fmt not in available:
+            available.append(fmt)
+    return available or ['jpeg']
+
+
+def format_path(path, fmt):
+    """Returns the path of a resized photo in an output format."""
+    return os.path.splitext(path)[0] + OUTPUT_FORMATS[fmt][0]
+
+
+def format_sources(path, settings):
+    """Returns the (MIME type, path) of a resized photo in each output format."""
+    return [(OUTPUT_FORMATS[fmt][2], format_path(path, fmt)) for fmt in settings['PHOTO_FORMATS']]
+
+
+def fallback_path(path, settings):
+    """Returns the path of a resized photo in the last, most compatible, output format."""
+    return format_path(path, settings['PHOTO_FORMATS'][-1])
+
+
+def source_tags(sources, siteurl=''):
+    """Returns the <source> elements of every source but the last, fallback, one."""
+    return ''.join('<source type="{}" srcset="{}">'.format(mime, os.path.join(siteurl, path))
+                   for mime, path in sources[:-1])
+
+
+def picture_html(sources, siteurl='', img_attrs=''):
+    """Returns a <picture> element offering every source, the last one being the <img> fallback."""
+    return '<picture>{}<img src="{}"{}></picture>'.format(
+        source_tags(sources, siteurl), os.path.join(siteurl, sources[-1][1]), img_attrs)
+
+
+class PhotoTuple(tuple):
+    """Photo information given to the templates.
+
+    It is the tuple templates have always used, whose photo and thumbnail
+    paths point to the fallback format, and it also provides the paths
+    in every format of PHOTO_FORMATS.
+    """
+
+    def __new__(cls, items, photo_sources=None, thumb_sources=None):
+        photo = tuple.__new__(cls, items)
+        photo.photo_sources = photo_sources or []
+        photo.thumb_sources = thumb_sources or []
+        return photo
+
+    def picture(self, kind='photo', siteurl='', alt=''):
+        """Returns a <picture> element for the photo or its thumbnail."""
+        sources = self.photo_sources if kind == 'photo' else self.thumb_sources
+        return Markup(picture_html(sources, siteurl, ' alt="{}"'.format(Markup.escape(alt))))
+
+
+def photo_tuple(items, photo, thumb, settings):
+    """Builds the PhotoTuple of items, whose second and third elements are
+    replaced by the fallback paths of photo and thumb."""
+    items = list(items)
+    items[1] = fallback_path(photo, settings)
+    items[2] = fallback_path(thumb, settings)
+    return PhotoTuple(items, format_sources(photo, settings), format_sources(thumb, settings))
+
+
+def file_mtime(filename):
+    try:
+        return os.path.getmtime(filename)
+    except OSError:
+        return None
 
 
 def read_notes(filename, msg=None):
+    """Parses a notes file (exif.txt, captions.txt, blacklist.txt).
+
+    Notes are cached for the build, and parsed again only when the
+    modification time of the file changes.
+    """
+    mtime = file_mtime(filename)
+    notes_cache = DEFAULT_CONFIG.setdefault('notes_cache', {})
+    if filename in notes_cache and notes_cache[filename][0] == mtime:
+        return notes_cache[filename][1]
+
     notes = {}
     try:
         with pelican_open(filename) as text:
@@ -109,6 +221,7 @@ def read_notes(filename, msg=None):
         if msg:
             logger.warning('{} at file {}'.format(msg, filename))
         logger.debug('read_notes issue: {} at file {}. Debug message:{}'.format(msg, filename, e))
+    notes_cache[filename] = (mtime, notes)
     return notes
 
 
@@ -148,12 +261,37 @@ def ReduceOpacity(im, opacity):
     return im
 
 
-def watermark_photo(image, settings):
+# Watermark resources of the current process, reused across resize jobs.
+watermark_fonts = {}
+watermark_images = {}
+watermark_layers = collections.OrderedDict()
+
+# Number of watermark layers (one per photo size) kept by each process.
+WATERMARK_LAYERS_CACHE_SIZE = 16
+
+
+def watermark_font(size):
+    if size not in watermark_fonts:
+        font_name = 'SourceCodePro-Bold.otf'
+        default_font = os.path.join(DEFAULT_CONFIG['plugin_dir'], font_name)
+        watermark_fonts[size] = ImageFont.FreeTypeFont(default_font, size)
+    return watermark_fonts[size]
+
+
+def watermark_image(filename):
+    if filename not in watermark_images:
+        mark_image = Image.open(filename)
+        mark_image.load()
+        watermark_images[filename] = mark_image
+    return watermark_images[filename].copy()
 
+
+def make_watermark_layer(size, settings):
+    """Returns the watermark of a photo of the given size, opacity included."""
     margin = [10, 10]
     opacity = 0.6
 
-    watermark_layer = Image.new("RGBA", image.size, (0, 0, 0, 0))
+    watermark_layer = Image.new("RGBA", size, (0, 0, 0, 0))
     draw_watermark = ImageDraw.Draw(watermark_layer)
     text_reducer = 32
     image_reducer = 8
@@ -162,15 +300,13 @@ def watermark_photo(image, settings):
     text_position = [0, 0]
 
     if settings['PHOTO_WATERMARK_TEXT']:
-        font_name = 'SourceCodePro-Bold.otf'
-        default_font = os.path.join(DEFAULT_CONFIG['plugin_dir'], font_name)
-        font = ImageFont.FreeTypeFont(default_font, watermark_layer.size[0] // text_reducer)
+        font = watermark_font(watermark_layer.size[0] // text_reducer)
         text_size = draw_watermark.textsize(settings['PHOTO_WATERMARK_TEXT'], font)
-        text_position = [image.size[i] - text_size[i] - margin[i] for i in [0, 1]]
+        text_position = [size[i] - text_size[i] - margin[i] for i in [0, 1]]
         draw_watermark.text(text_position, settings['PHOTO_WATERMARK_TEXT'], settings['PHOTO_WATERMARK_TEXT_COLOR'], font=font)
 
     if settings['PHOTO_WATERMARK_IMG']:
-        mark_image = Image.open(settings['PHOTO_WATERMARK_IMG'])
+        mark_image = watermark_image(settings['PHOTO_WATERMARK_IMG'])
         mark_image_size = [watermark_layer.size[0] // image_reducer for size in mark_size]
         mark_image_size = settings['PHOTO_WATERMARK_IMG_SIZE'] if settings['PHOTO_WATERMARK_IMG_SIZE'] else mark_image_size
         mark_image.thumbnail(mark_image_size, Image.ANTIALIAS)
@@ -182,8 +318,30 @@ def watermark_photo(image, settings):
 
         watermark_layer.paste(mark_image, mark_position, mark_image)
 
-    watermark_layer = ReduceOpacity(watermark_layer, opacity)
-    image.paste(watermark_layer, (0, 0), watermark_layer)
+    return ReduceOpacity(watermark_layer, opacity)
+
+
+def watermark_layer(size, settings):
+    """Returns the watermark of a photo of the given size, from the cache of
+    the current process when a photo of the same size was watermarked."""
+    key = (tuple(size),) + tuple(repr(settings[name]) for name in (
+        'PHOTO_WATERMARK_TEXT',
+        'PHOTO_WATERMARK_TEXT_COLOR',
+        'PHOTO_WATERMARK_IMG',
+        'PHOTO_WATERMARK_IMG_SIZE'))
+    if key in watermark_layers:
+        layer = watermark_layers.pop(key)
+    else:
+        layer = make_watermark_layer(size, settings)
+        if len(watermark_layers) >= WATERMARK_LAYERS_CACHE_SIZE:
+            watermark_layers.popitem(last=False)
+    watermark_layers[key] = layer
+    return layer
+
+
+def watermark_photo(image, settings):
+    layer = watermark_layer(image.size, settings)
+    image.paste(layer, (0, 0), layer)
 
     return image
 
@@ -253,23 +411,105 @@ def manipulate_exif(img, settings):
     return (img, piexif.dump(exif))
 
 
-def resize_worker(orig, resized, spec, settings):
+# Settings used by resize_worker. They change the pixels or the metadata of
+# resized photos, and thus are also part of the resize cache key.
+RESIZE_SETTINGS = (
+    'PHOTO_THUMB',
+    'PHOTO_ALPHA_BACKGROUND_COLOR',
+    'PHOTO_WATERMARK',
+    'PHOTO_WATERMARK_THUMB',
+    'PHOTO_WATERMARK_TEXT',
+    'PHOTO_WATERMARK_TEXT_COLOR',
+    'PHOTO_WATERMARK_IMG',
+    'PHOTO_WATERMARK_IMG_SIZE',
+    'PHOTO_EXIF_KEEP',
+    'PHOTO_EXIF_REMOVE_GPS',
+    'PHOTO_EXIF_AUTOROTATE',
+    'PHOTO_EXIF_COPYRIGHT',
+    'PHOTO_EXIF_COPYRIGHT_AUTHOR',
+)
+
+# Bump when the resize code changes its output for the same inputs.
+RESIZE_CACHE_VERSION = 2
+
+# Number of resize jobs queued per worker process.
+RESIZE_BACKLOG = 4
+
+
+def file_digest(path, digests):
+    """Returns the SHA-1 digest of a file.
+
+    Digests are memoized in the digests dict, keyed by path and validated
+    by size and modification time.
+    """
+    stat = os.stat(path)
+    known = digests.get(path)
+    if known and known[0] == stat.st_size and known[1] == stat.st_mtime:
+        return known[2]
 
-    logger.info('photos: make photo {} -> {}'.format(orig, resized))
-    im = Image.open(orig)
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    digests[path] = (stat.st_size, stat.st_mtime, digest.hexdigest())
+    return digests[path][2]
 
-    if ispiexif and settings['PHOTO_EXIF_KEEP'] and im.format == 'JPEG':  # Only works with JPEG exif for sure.
-        im, exif_copy = manipulate_exif(im, settings)
+
+def resize_cache_key(orig, spec, fmt, settings, digests):
+    """Returns the resize cache key of a photo: a digest of the original's
+    content, the resize spec, the output format and the settings in
+    RESIZE_SETTINGS."""
+    key = [RESIZE_CACHE_VERSION, file_digest(orig, digests), list(spec), fmt]
+    key.extend(settings.get(name) for name in RESIZE_SETTINGS)
+    if settings.get('PHOTO_WATERMARK') and settings.get('PHOTO_WATERMARK_IMG'):
+        key.append(file_digest(settings['PHOTO_WATERMARK_IMG'], digests))
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def resize_cache_dir(settings):
+    return os.path.join(settings.get('CACHE_PATH', 'cache'), 'photos')
+
+
+def load_digests(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, 'digests.json')) as f:
+            return dict((path, tuple(known)) for path, known in json.load(f).items())
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def save_digests(cache_dir, digests):
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        with open(os.path.join(cache_dir, 'digests.json'), 'w') as f:
+            json.dump(digests, f)
+    except (IOError, OSError) as e:
+        logger.warning('photos: Could not save the resize cache digests: {}'.format(e))
+
+
+def link_photo(cached, resized):
+    """Hard-links (or copies, if linking fails) a cached photo to its output path."""
+    if os.path.exists(resized):
+        if os.path.samefile(cached, resized):
+            return
+        os.remove(resized)
     else:
-        exif_copy = b''
+        directory = os.path.dirname(resized)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+    try:
+        os.link(cached, resized)
+    except (AttributeError, OSError):
+        shutil.copy2(cached, resized)
 
-    icc_profile = im.info.get("icc_profile", None)
-    im.thumbnail((spec[0], spec[1]), Image.ANTIALIAS)
-    directory = os.path.split(resized)[0]
 
-    if isalpha(im):
-        im = remove_alpha(im, settings['PHOTO_ALPHA_BACKGROUND_COLOR'])
+def contains(box, spec):
+    return spec[0] <= box[0] and spec[1] <= box[1]
+
 
+def save_photo(im, resized, spec, fmt, icc_profile, exif_copy, cached):
+    directory = os.path.split(resized)[0]
     if not os.path.exists(directory):
         try:
             os.makedirs(directory)
@@ -278,34 +518,182 @@ def resize_worker(orig, resized, spec, settings):
     else:
         logger.debug('Directory already exists at {}'.format(os.path.split(resized)[0]))
 
-    if settings['PHOTO_WATERMARK']:
-        isthumb = True if spec == settings['PHOTO_THUMB'] else False
-        if not isthumb or (isthumb and settings['PHOTO_WATERMARK_THUMB']):
-            im = watermark_photo(im, settings)
+    if cached:
+        # Save under a temporary name, so that concurrent jobs never see a partial file.
+        cache_directory = os.path.dirname(cached)
+        if not os.path.exists(cache_directory):
+            try:
+                os.makedirs(cache_directory)
+            except OSError:
+                pass
+        temporary = '{}.{}.tmp'.format(cached, os.getpid())
+        im.save(temporary, OUTPUT_FORMATS[fmt][1], quality=spec[2], icc_profile=icc_profile, exif=exif_copy)
+        os.rename(temporary, cached)
+        link_photo(cached, resized)
+    else:
+        im.save(resized, OUTPUT_FORMATS[fmt][1], quality=spec[2], icc_profile=icc_profile, exif=exif_copy)
 
-    im.save(resized, 'JPEG', quality=spec[2], icc_profile=icc_profile, exif=exif_copy)
 
+def resize_worker(orig, outputs, settings):
+    """Makes every output of an original photo.
 
-def resize_photos(generator, writer):
-    if generator.settings['PHOTO_RESIZE_JOBS'] == -1:
-        debug = True
-        generator.settings['PHOTO_RESIZE_JOBS'] = 1
+    outputs is a list of (resized, spec, saves) tuples, saves being the
+    (format, path, cached) of each file to write for this size. The
+    original is decoded and rotated once, and each size is derived from the
+    smallest already resized image that is large enough, from largest to
+    smallest, then saved in every format.
+    """
+    logger.info('photos: make photo {} -> {}'.format(orig, ', '.join(output[0] for output in outputs)))
+    im = Image.open(orig)
+
+    # Let the JPEG decoder downscale by a power of two, as long as the
+    # result stays larger than the largest output in both directions.
+    largest = max(max(spec[0], spec[1]) for _, spec, _ in outputs)
+    im.draft(im.mode, (largest, largest))
+
+    if ispiexif and settings['PHOTO_EXIF_KEEP'] and im.format == 'JPEG':  # Only works with JPEG exif for sure.
+        im, exif_copy = manipulate_exif(im, settings)
     else:
-        debug = False
+        exif_copy = b''
+
+    icc_profile = im.info.get("icc_profile", None)
+    resized_images = []
+
+    for resized, spec, saves in sorted(outputs, key=lambda output: output[1][0] * output[1][1], reverse=True):
+        bases = [image for box, image in resized_images if contains(box, spec)]
+        resized_im = (bases[-1] if bases else im).copy()
+        resized_im.thumbnail((spec[0], spec[1]), Image.ANTIALIAS)
+        resized_images.append((spec, resized_im))
+
+        if isalpha(resized_im):
+            resized_im = remove_alpha(resized_im, settings['PHOTO_ALPHA_BACKGROUND_COLOR'])
+
+        if settings['PHOTO_WATERMARK']:
+            isthumb = True if spec == settings['PHOTO_THUMB'] else False
+            if not isthumb or (isthumb and settings['PHOTO_WATERMARK_THUMB']):
+                # Smaller sizes are derived from the unmarked image
+                resized_im = watermark_photo(resized_im.copy(), settings)
 
-    pool = multiprocessing.Pool(generator.settings['PHOTO_RESIZE_JOBS'])
+        for fmt, path, cached in saves:
+            save_photo(resized_im, path, spec, fmt, icc_profile, exif_copy, cached)
+
+
+def resize_job(job):
+    """Runs the resize job of an original photo in a worker process.
+
+    Exceptions are caught and returned, so that one broken photo neither
+    stops the pool nor gets lost.
+    """
+    orig, outputs, settings = job
+    start = time.time()
+    try:
+        resize_worker(orig, outputs, settings)
+    except Exception:
+        return (orig, outputs, time.time() - start, traceback.format_exc())
+    return (orig, outputs, time.time() - start, None)
+
+
+def bounded(jobs, semaphore, stopped):
+    """Yields jobs, waiting for a free slot in the backlog before each one,
+    until stopped is set."""
+    for job in jobs:
+        semaphore.acquire()
+        if stopped.is_set():
+            return
+        yield job
+
+
+def resize_photos(generator, writer):
+    jobs_count = generator.settings['PHOTO_RESIZE_JOBS']
+    debug = jobs_count == -1
+    if jobs_count == 0:
+        jobs_count = multiprocessing.cpu_count()
     logger.debug('Debug Status: {}'.format(debug))
+
+    if generator.settings['PHOTO_RESIZE_CACHE']:
+        cache_dir = resize_cache_dir(generator.settings)
+        digests = load_digests(cache_dir)
+    else:
+        cache_dir = None
+
+    # Workers only get the settings they use, not the whole Pelican settings.
+    settings = dict((name, generator.settings[name]) for name in RESIZE_SETTINGS)
+
+    # Outputs are grouped by original, so that each original is decoded once.
+    jobs = {}
     for resized, what in DEFAULT_CONFIG['queue_resize'].items():
         resized = os.path.join(generator.output_path, resized)
         orig, spec = what
-        if (not os.path.isfile(resized) or os.path.getmtime(orig) > os.path.getmtime(resized)):
-            if debug:
-                resize_worker(orig, resized, spec, generator.settings)
+        saves = []
+        for fmt in generator.settings['PHOTO_FORMATS']:
+            path = format_path(resized, fmt)
+            cached = None
+            if cache_dir:
+                key = resize_cache_key(orig, spec, fmt, settings, digests)
+                cached = os.path.join(cache_dir, key[:2], key + OUTPUT_FORMATS[fmt][0])
+                if os.path.isfile(cached):
+                    logger.debug('photos: Cached photo {} -> {}'.format(orig, path))
+                    link_photo(cached, path)
+                    continue
+            elif os.path.isfile(path) and os.path.getmtime(orig) <= os.path.getmtime(path):
+                continue
+            saves.append((fmt, path, cached))
+        if saves:
+            jobs.setdefault(orig, []).append((resized, spec, saves))
+
+    if cache_dir:
+        save_digests(cache_dir, digests)
+
+    if not jobs:
+        return
+
+    jobs = [(orig, outputs, settings) for orig, outputs in sorted(jobs.items())]
+    logger.info('photos: Resizing {} photos'.format(len(jobs)))
+    start = time.time()
+    failures = []
+    step = max(1, len(jobs) // 10)
+
+    if debug:
+        results = (resize_job(job) for job in jobs)
+        pool = None
+    else:
+        # The pool pulls jobs from the generator as fast as it can: the semaphore
+        # keeps at most RESIZE_BACKLOG jobs per process queued at any time.
+        pool = multiprocessing.Pool(jobs_count)
+        semaphore = threading.Semaphore(jobs_count * RESIZE_BACKLOG)
+        stopped = threading.Event()
+        results = pool.imap_unordered(resize_job, bounded(jobs, semaphore, stopped))
+
+    try:
+        for done, (orig, outputs, duration, error) in enumerate(results, 1):
+            if pool:
+                semaphore.release()
+            if error:
+                logger.debug('photos: Failed {}:\n{}'.format(orig, error))
+                failures.append((orig, error))
             else:
-                pool.apply_async(resize_worker, (orig, resized, spec, generator.settings))
+                logger.debug('photos: Made {} sizes of {} in {:.2f}s'.format(len(outputs), orig, duration))
+            if done % step == 0 or done == len(jobs):
+                logger.info('photos: Resized {}/{} photos in {:.1f}s'.format(done, len(jobs), time.time() - start))
+    except BaseException:
+        if pool:
+            # The task handler may wait for a slot in bounded(): wake it up so
+            # that it stops feeding jobs and terminate() can join it.
+            stopped.set()
+            semaphore.release()
+            pool.terminate()
+            pool.join()
+        raise
+    else:
+        if pool:
+            pool.close()
+            pool.join()
 
-    pool.close()
-    pool.join()
+    if failures:
+        logger.error('photos: {} of {} photos could not be resized:\n{}'.format(
+            len(failures), len(jobs),
+            '\n'.join('{}: {}'.format(orig, error.strip().splitlines()[-1])
+                      for orig, error in failures)))
 
 
 def detect_content(content):
@@ -331,10 +719,10 @@ def detect_content(content):
                 photo_prefix = os.path.splitext(value)[0].lower()
 
                 if what == 'photo':
-                    photo_article = photo_prefix + 'a.jpg'
+                    photo_article = os.path.join('photos', photo_prefix + 'a.jpg')
                     enqueue_resize(
                         path,
-                        os.path.join('photos', photo_article),
+                        photo_article,
                         settings['PHOTO_ARTICLE']
                     )
 
@@ -345,23 +733,31 @@ def detect_content(content):
                         m.group('src'),
                         '=',
                         m.group('quote'),
-                        os.path.join(settings['SITEURL'], 'photos', photo_article),
+                        os.path.join(settings['SITEURL'], fallback_path(photo_article, settings)),
                         m.group('quote'),
                         m.group('attrs_after'),
                     ))
 
+                    if tag == 'img' and len(settings['PHOTO_FORMATS']) > 1:
+                        output = ''.join((
+                            '<picture>',
+                            source_tags(format_sources(photo_article, settings), settings['SITEURL']),
+                            output,
+                            '</picture>',
+                        ))
+
                 elif what == 'lightbox' and tag == 'img':
-                    photo_gallery = photo_prefix + '.jpg'
+                    photo_gallery = os.path.join('photos', photo_prefix + '.jpg')
                     enqueue_resize(
                         path,
-                        os.path.join('photos', photo_gallery),
+                        photo_gallery,
                         settings['PHOTO_GALLERY']
                     )
 
-                    photo_thumb = photo_prefix + 't.jpg'
+                    photo_thumb = os.path.join('photos', photo_prefix + 't.jpg')
                     enqueue_resize(
                         path,
-                        os.path.join('photos', photo_thumb),
+                        photo_thumb,
                         settings['PHOTO_THUMB']
                     )
 
@@ -389,16 +785,20 @@ def detect_content(content):
                     output = ''.join((
                         '<a href=',
                         m.group('quote'),
-                        os.path.join(settings['SITEURL'], 'photos', photo_gallery),
+                        os.path.join(settings['SITEURL'], fallback_path(photo_gallery, settings)),
                         m.group('quote'),
                         lightbox_attrs,
-                        '><img',
+                        '>',
+                        '<picture>' if len(settings['PHOTO_FORMATS']) > 1 else '',
+                        source_tags(format_sources(photo_thumb, settings), settings['SITEURL']),
+                        '<img',
                         m.group('attrs_before'),
                         'src=',
                         m.group('quote'),
-                        os.path.join(settings['SITEURL'], 'photos', photo_thumb),
+                        os.path.join(settings['SITEURL'], fallback_path(photo_thumb, settings)),
                         m.group('quote'),
                         m.group('attrs_after'),
+                        '</picture>' if len(settings['PHOTO_FORMATS']) > 1 else '',
                         '</a>'
                     ))
 
@@ -456,10 +856,6 @@ def process_gallery(generator, content, location):
 
     for gallery in galleries:
 
-        if gallery['location'] in DEFAULT_CONFIG['created_galleries']:
-            content.photo_gallery.append((gallery['location'], DEFAULT_CONFIG['created_galleries'][gallery]))
-            continue
-
         if gallery['type'] == '{photo}':
             dir_gallery = os.path.join(os.path.expanduser(generator.settings['PHOTO_LIBRARY']), gallery['location'])
             rel_gallery = gallery['location']
@@ -468,6 +864,15 @@ def process_gallery(generator, content, location):
             dir_gallery = os.path.join(base_path, gallery['location'])
             rel_gallery = os.path.join(content.relative_dir, gallery['location'])
 
+        # Galleries referenced by several articles are only scanned once, unless
+        # the folder or its notes changed (e.g. during autoreload).
+        signature = tuple(file_mtime(os.path.join(dir_gallery, name))
+                          for name in ('', 'exif.txt', 'captions.txt', 'blacklist.txt'))
+        created = DEFAULT_CONFIG['created_galleries'].get(dir_gallery)
+        if created and created[0] == signature:
+            content.photo_gallery.append((gallery['title'], created[1]))
+            continue
+
         if os.path.isdir(dir_gallery):
             logger.info('photos: Gallery detected: {}'.format(rel_gallery))
             dir_photo = os.path.join('photos', rel_gallery.lower())
@@ -488,12 +893,11 @@ def process_gallery(generator, content, location):
                     continue
                 photo = os.path.splitext(pic)[0].lower() + '.jpg'
                 thumb = os.path.splitext(pic)[0].lower() + 't.jpg'
-                content_gallery.append((
-                    pic,
+                content_gallery.append(photo_tuple(
+                    (pic, photo, thumb, exifs.get(pic, ''), captions.get(pic, '')),
                     os.path.join(dir_photo, photo),
                     os.path.join(dir_thumb, thumb),
-                    exifs.get(pic, ''),
-                    captions.get(pic, '')))
+                    generator.settings))
 
                 enqueue_resize(
                     os.path.join(dir_gallery, pic),
@@ -505,8 +909,8 @@ def process_gallery(generator, content, location):
                     generator.settings['PHOTO_THUMB'])
 
             content.photo_gallery.append((title, content_gallery))
-            logger.debug('Gallery Data: '.format(pprint.pformat(content.photo_gallery)))
-            DEFAULT_CONFIG['created_galleries']['gallery'] = content_gallery
+            logger.debug('Gallery Data: {}'.format(pprint.pformat(content.photo_gallery)))
+            DEFAULT_CONFIG['created_galleries'][dir_gallery] = (signature, content_gallery)
         else:
             logger.error('photos: Gallery does not exist: {} at {}'.format(gallery['location'], dir_gallery))
 
@@ -540,10 +944,11 @@ def process_image(generator, content, image):
     if os.path.isfile(path):
         photo = os.path.splitext(image)[0].lower() + 'a.jpg'
         thumb = os.path.splitext(image)[0].lower() + 't.jpg'
-        content.photo_image = (
-            os.path.basename(image).lower(),
+        content.photo_image = photo_tuple(
+            (os.path.basename(image).lower(), photo, thumb),
             os.path.join('photos', photo),
-            os.path.join('photos', thumb))
+            os.path.join('photos', thumb),
+            generator.settings)
         enqueue_resize(
             path,
             os.path.join('photos', photo),
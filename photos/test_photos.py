@@ -2,10 +2,12 @@
 from __future__ import unicode_literals
 
 import os
+import pickle
+import threading
 from pelican.generators import ArticlesGenerator
 from pelican.tests.support import unittest, get_settings
 from tempfile import mkdtemp
-from shutil import rmtree
+from shutil import copyfile, rmtree
 import photos
 
 CUR_DIR = os.path.dirname(__file__)
@@ -118,5 +120,255 @@ class TestPhotos(unittest.TestCase):
                 ('./test_data/agallery/night.png', (192, 144, 60)))]
         self.assertEqual(sorted(expected), sorted(photos.queue_resize.items()))
 
+
+class FakeGenerator(object):
+
+    def __init__(self, settings, output_path):
+        self.settings = settings
+        self.output_path = output_path
+
+
+class TestResizeCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_path = mkdtemp(prefix='pelicantests.')
+        self.settings = get_settings(filenames={})
+        self.settings['AUTHOR'] = 'Author'
+        self.settings['CACHE_PATH'] = os.path.join(self.temp_path, 'cache')
+        self.settings['PHOTO_RESIZE_JOBS'] = -1
+        self.settings['PHOTO_RESIZE_CACHE'] = True
+        photos.initialized(FakeGenerator(self.settings, None))
+        self.orig = os.path.join(CUR_DIR, 'test_data', 'agallery', 'best.jpg')
+        photos.DEFAULT_CONFIG['queue_resize'] = {}
+        photos.enqueue_resize(self.orig, os.path.join('photos', 'bestt.jpg'),
+                              self.settings['PHOTO_THUMB'])
+
+    def tearDown(self):
+        photos.DEFAULT_CONFIG['queue_resize'] = {}
+        rmtree(self.temp_path)
+
+    def resize(self, output):
+        generator = FakeGenerator(self.settings,
+                                  os.path.join(self.temp_path, output))
+        photos.resize_photos(generator, None)
+        return os.path.join(generator.output_path, 'photos', 'bestt.jpg')
+
+    def test_cache_key(self):
+        digests = {}
+        spec = self.settings['PHOTO_THUMB']
+        key = photos.resize_cache_key(self.orig, spec, 'jpeg', self.settings, digests)
+        self.assertIn(self.orig, digests)
+        self.assertEqual(key, photos.resize_cache_key(
+            self.orig, spec, 'jpeg', self.settings, digests))
+        self.assertNotEqual(key, photos.resize_cache_key(
+            self.orig, (100, 100, 60), 'jpeg', self.settings, digests))
+        self.assertNotEqual(key, photos.resize_cache_key(
+            self.orig, spec, 'webp', self.settings, digests))
+        self.settings['PHOTO_WATERMARK'] = True
+        self.assertNotEqual(key, photos.resize_cache_key(
+            self.orig, spec, 'jpeg', self.settings, digests))
+
+    def test_outputs_are_linked_from_cache(self):
+        first = self.resize('output1')
+        self.assertTrue(os.path.isfile(first))
+        cached = os.listdir(photos.resize_cache_dir(self.settings))
+        self.assertIn('digests.json', cached)
+
+        second = self.resize('output2')
+        with open(first, 'rb') as f1, open(second, 'rb') as f2:
+            self.assertEqual(f1.read(), f2.read())
+        self.assertEqual(cached, os.listdir(
+            photos.resize_cache_dir(self.settings)))
+
+    def test_failures_are_reported(self):
+        broken = os.path.join(self.temp_path, 'broken.jpg')
+        with open(broken, 'wb') as f:
+            f.write(b'not a photo')
+        photos.enqueue_resize(broken, os.path.join('photos', 'brokent.jpg'),
+                              self.settings['PHOTO_THUMB'])
+        self.settings['PHOTO_RESIZE_CACHE'] = False
+        with self.assertLogs(photos.logger, 'ERROR') as logs:
+            thumb = self.resize('output')
+        self.assertTrue(os.path.isfile(thumb))
+        self.assertIn('1 of 2 photos could not be resized', logs.output[0])
+        self.assertIn(broken, logs.output[0])
+
+    def test_resize_pool(self):
+        self.settings['PHOTO_RESIZE_JOBS'] = 2
+        photos.enqueue_resize(self.orig, os.path.join('photos', 'best.jpg'),
+                              self.settings['PHOTO_GALLERY'])
+        thumb = self.resize('output')
+        self.assertTrue(os.path.isfile(thumb))
+        self.assertTrue(os.path.isfile(
+            os.path.join(os.path.dirname(thumb), 'best.jpg')))
+
+    def test_resize_pool_interrupted(self):
+        self.settings['PHOTO_RESIZE_JOBS'] = 1
+        self.settings['PHOTO_RESIZE_CACHE'] = False
+        for i in range(6):
+            orig = os.path.join(self.temp_path, '{}.jpg'.format(i))
+            copyfile(self.orig, orig)
+            photos.enqueue_resize(orig, os.path.join('photos', '{}t.jpg'.format(i)),
+                                  self.settings['PHOTO_THUMB'])
+
+        def interrupt(msg, *args, **kwargs):
+            if msg.startswith('photos: Made'):
+                raise KeyboardInterrupt
+        backlog = photos.RESIZE_BACKLOG
+        photos.RESIZE_BACKLOG = 1
+        photos.logger.debug = interrupt
+        raised = []
+
+        def resize():
+            try:
+                self.resize('output')
+            except KeyboardInterrupt:
+                raised.append(True)
+        try:
+            # The task handler waits for a slot when the loop is left
+            thread = threading.Thread(target=resize)
+            thread.daemon = True
+            thread.start()
+            thread.join(30)
+        finally:
+            photos.RESIZE_BACKLOG = backlog
+            del photos.logger.debug
+        self.assertFalse(thread.is_alive())
+        self.assertEqual([True], raised)
+
+    def test_resize_worker_makes_every_size(self):
+        from PIL import Image
+        settings = dict((name, self.settings[name])
+                        for name in photos.RESIZE_SETTINGS)
+        specs = [(192, 144, 60), (1024, 768, 80), (760, 506, 80)]
+        outputs = []
+        for i, spec in enumerate(specs):
+            resized = os.path.join(self.temp_path, '{}.jpg'.format(i))
+            outputs.append((resized, spec, [
+                (fmt, photos.format_path(resized, fmt), None)
+                for fmt in ('jpeg', 'webp')]))
+        photos.resize_worker(self.orig, outputs, settings)
+        original = Image.open(self.orig)
+        for resized, spec, saves in outputs:
+            expected = original.copy()
+            expected.thumbnail(spec[:2])
+            for fmt, path, _ in saves:
+                im = Image.open(path)
+                self.assertEqual(im.format, photos.OUTPUT_FORMATS[fmt][1])
+                self.assertEqual(im.size, expected.size)
+
+    def test_thumbnail_not_watermarked(self):
+        from PIL import Image
+        self.settings['PHOTO_WATERMARK'] = True
+        self.settings['PHOTO_WATERMARK_THUMB'] = False
+        self.settings['PHOTO_WATERMARK_TEXT'] = 'Watermark'
+        settings = dict((name, self.settings[name])
+                        for name in photos.RESIZE_SETTINGS)
+        orig = os.path.join(self.temp_path, 'black.png')
+        Image.new('RGB', (2000, 1500)).save(orig)
+        outputs = []
+        for name, spec in (('gallery', self.settings['PHOTO_GALLERY']),
+                           ('thumb', self.settings['PHOTO_THUMB'])):
+            resized = os.path.join(self.temp_path, name + '.jpg')
+            outputs.append((resized, spec, [('jpeg', resized, None)]))
+        photos.resize_worker(orig, outputs, settings)
+        gallery = Image.open(outputs[0][0]).convert('L')
+        thumb = Image.open(outputs[1][0]).convert('L')
+        self.assertGreater(gallery.getextrema()[1], 64)
+        self.assertLess(thumb.getextrema()[1], 16)
+
+    def test_watermark_layers_are_reused(self):
+        from PIL import Image
+        self.settings['PHOTO_WATERMARK_TEXT'] = 'Watermark'
+        photos.watermark_layers.clear()
+        first = photos.watermark_photo(Image.new('RGB', (400, 300)),
+                                       self.settings)
+        second = photos.watermark_photo(Image.new('RGB', (400, 300)),
+                                        self.settings)
+        self.assertEqual(first.tobytes(), second.tobytes())
+        self.assertNotEqual(Image.new('RGB', (400, 300)).tobytes(),
+                            first.tobytes())
+        self.assertEqual(1, len(photos.watermark_layers))
+        photos.watermark_photo(Image.new('RGB', (300, 400)), self.settings)
+        self.assertEqual(2, len(photos.watermark_layers))
+
+
+class FakeContent(object):
+    pass
+
+
+class TestGalleryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_path = mkdtemp(prefix='pelicantests.')
+        self.settings = get_settings(filenames={})
+        self.settings['AUTHOR'] = 'Author'
+        self.settings['PHOTO_LIBRARY'] = os.path.join(CUR_DIR, 'test_data')
+        photos.initialized(FakeGenerator(self.settings, None))
+        self.generator = FakeGenerator(self.settings, self.temp_path)
+
+    def tearDown(self):
+        photos.DEFAULT_CONFIG['queue_resize'] = {}
+        rmtree(self.temp_path)
+
+    def test_notes_are_parsed_once(self):
+        notes = os.path.join(self.temp_path, 'captions.txt')
+        with open(notes, 'w') as f:
+            f.write('best.jpg: Best\n')
+        first = photos.read_notes(notes)
+        self.assertEqual({'best.jpg': 'Best'}, first)
+        self.assertIs(first, photos.read_notes(notes))
+
+        with open(notes, 'w') as f:
+            f.write('best.jpg: Better\n')
+        mtime = os.path.getmtime(notes) + 1
+        os.utime(notes, (mtime, mtime))
+        self.assertEqual({'best.jpg': 'Better'}, photos.read_notes(notes))
+
+    def test_galleries_are_scanned_once(self):
+        first, second = FakeContent(), FakeContent()
+        photos.process_gallery(self.generator, first, '{photo}agallery')
+        photos.process_gallery(self.generator, second,
+                               '{photo}agallery{Another title}')
+        self.assertEqual(1, len(photos.DEFAULT_CONFIG['created_galleries']))
+        self.assertEqual('Another title', second.photo_gallery[0][0])
+        self.assertIs(first.photo_gallery[0][1], second.photo_gallery[0][1])
+        self.assertEqual('Caption-best', first.photo_gallery[0][1][0][4])
+
+
+class TestPhotoFormats(unittest.TestCase):
+
+    settings = {'PHOTO_FORMATS': ['webp', 'jpeg']}
+
+    def test_available_formats(self):
+        self.assertEqual(['jpeg'], photos.available_formats([]))
+        self.assertEqual(['webp', 'jpeg'],
+                         photos.available_formats(['webp', 'gif', 'jpeg']))
+
+    def test_photo_tuple(self):
+        photo = photos.photo_tuple(
+            ('best.jpg', 'best.jpg', 'bestt.jpg', 'EXIF', 'Caption'),
+            'photos/best.jpg', 'photos/bestt.jpg', self.settings)
+        self.assertEqual(('best.jpg', 'photos/best.jpg', 'photos/bestt.jpg',
+                          'EXIF', 'Caption'), photo)
+        self.assertEqual([('image/webp', 'photos/bestt.webp'),
+                          ('image/jpeg', 'photos/bestt.jpg')],
+                         photo.thumb_sources)
+        self.assertEqual(
+            '<picture>'
+            '<source type="image/webp" srcset="http://x/photos/best.webp">'
+            '<img src="http://x/photos/best.jpg" alt="a &amp; b">'
+            '</picture>',
+            photo.picture('photo', 'http://x', 'a & b'))
+
+    def test_photo_tuple_pickles(self):
+        photo = photos.photo_tuple(('best.jpg', 'best.jpg', 'bestt.jpg'),
+                                   'photos/best.jpg', 'photos/bestt.jpg',
+                                   self.settings)
+        unpickled = pickle.loads(pickle.dumps(photo))
+        self.assertEqual(photo, unpickled)
+        self.assertEqual(photo.photo_sources, unpickled.photo_sources)
+
+
 if __name__ == '__main__':
     unittest.main()
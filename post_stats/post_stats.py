@@ -14,58 +14,134 @@ fk: Flesch-kincaid Grade Level
 """
 
 from pelican import signals
-from bs4 import BeautifulSoup
-import re
-from collections import Counter
+import hashlib
+import json
+import logging
+import os
+try:
+    from content_dom import find_dom, source_html
+except ImportError:
+    # Without the content_dom plugin, there is no shared tree
+    find_dom = source_html = None
 
 from .readability import *
+from .tokenizer import extract_text, tokenize
+from .word_counts import make_word_counts
+
+logger = logging.getLogger(__name__)
+
+# Version of the statistics kept in the cache file
+CACHE_VERSION = 2
+
+# Statistics by digest of the HTML of the content and word counts mode,
+# kept for autoreload builds, and between builds when POST_STATS_CACHE is set
+_stats = {}
+_used = set()
+_cache = {'file': None}
+
+
+def stats_cache_file(settings):
+    """File keeping the statistics between builds, if enabled"""
+    if not settings.get('POST_STATS_CACHE', False):
+        return None
+    return os.path.join(settings['CACHE_PATH'], 'post_stats.json')
+
+
+def load_cache(pelican):
+    filename = stats_cache_file(pelican.settings)
+    if filename is None or filename == _cache['file']:
+        return
+    _cache['file'] = filename
+    try:
+        with open(filename) as cache_file:
+            data = json.load(cache_file)
+    except (IOError, OSError, ValueError):
+        return
+    if data.get('version') == CACHE_VERSION:
+        _stats.update(data['stats'])
+
+
+def save_cache(pelican):
+    # Forget the contents which were not part of this build
+    for key in set(_stats) - _used:
+        del _stats[key]
+    _used.clear()
+
+    filename = stats_cache_file(pelican.settings)
+    if filename is None:
+        return
+    directory = os.path.dirname(filename)
+    try:
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(filename, 'w') as cache_file:
+            json.dump({'version': CACHE_VERSION, 'stats': _stats}, cache_file,
+                      default=lambda counts: dict(counts.items()))
+    except (IOError, OSError) as e:
+        logger.warning('Could not save the post stats cache %s: %s',
+                       filename, e)
+
+
+def compute_stats(text, word_counts=True):
+    """Return the statistics of the readable text of a content, with word
+    counts as given by the POST_STATS_WORD_COUNTS mode word_counts"""
+    stats = {}
+
+    # How fast do average people read?
+    WPM = 250
+
+    # Count the words, sentences and syllables in a single pass
+    word_count, readability_stats = tokenize(text)
+
+    # Return the stats, keeping as few word counts as asked
+    stats['wc'] = sum(word_count.values())
+    word_count = make_word_counts(word_count, word_counts)
+    if word_count is not None:
+        stats['word_counts'] = word_count
 
+    # Calulate how long it'll take to read, rounding up
+    stats['read_mins'] = (stats['wc'] + WPM - 1) // WPM
+    if stats['read_mins'] == 0:
+        stats['read_mins'] = 1
 
-def calculate_stats(instance):
-
-    if instance._content is not None:
-        stats = {}
-        content = instance._content
-
-        # How fast do average people read?
-        WPM = 250
-
-        # Use BeautifulSoup to get readable/visible text
-        raw_text = BeautifulSoup(content, 'html.parser').getText()
-
-        # Process the text to remove entities
-        entities = r'\&\#?.+?;'
-        raw_text = raw_text.replace('&nbsp;', ' ')
-        raw_text = re.sub(entities, '', raw_text)
-
-        # Flesch-kincaid readbility stats counts sentances,
-        # so save before removing punctuation
-        tmp = raw_text
-
-        # Process the text to remove punctuation
-        drop = u'.,?!@#$%^&*()_+-=\|/[]{}`~:;\'\"‘’—…“”'
-        raw_text = raw_text.translate(dict((ord(c), u'') for c in drop))
+    # Calculate Flesch-kincaid readbility stats
+    stats['fi'] = "{:.2f}".format(flesch_index(readability_stats))
+    stats['fk'] = "{:.2f}".format(flesch_kincaid_level(readability_stats))
 
-        # Count the words in the text
-        words = raw_text.lower().split()
-        word_count = Counter(words)
+    return stats
 
-        # Return the stats
-        stats['word_counts'] = word_count
-        stats['wc'] = sum(word_count.values())
 
-        # Calulate how long it'll take to read, rounding up
-        stats['read_mins'] = (stats['wc'] + WPM - 1) // WPM
-        if stats['read_mins'] == 0:
-            stats['read_mins'] = 1
-
-        # Calculate Flesch-kincaid readbility stats
-        readability_stats = stcs, words, sbls = text_stats(tmp, stats['wc'])
-        stats['fi'] = "{:.2f}".format(flesch_index(readability_stats))
-        stats['fk'] = "{:.2f}".format(flesch_kincaid_level(readability_stats))
+def calculate_stats(instance):
 
-        instance.stats = stats
+    if source_html is None:
+        html = instance._content
+    else:
+        html = source_html(instance)
+
+    if html is not None:
+        mode = instance.settings.get('POST_STATS_WORD_COUNTS', True)
+        key = '{0} {1}'.format(
+            hashlib.sha1(html.encode('utf-8')).hexdigest(), mode)
+        stats = _stats.get(key)
+        if stats is None:
+            # Use the tree shared by the plugins if there is one, else
+            # stream the readable/visible text out of the HTML
+            soup = find_dom(instance) if find_dom is not None else None
+            if soup is not None:
+                text = soup.getText()
+            else:
+                text = extract_text(html)
+            stats = _stats[key] = compute_stats(text, mode)
+        elif type(stats.get('word_counts')) is dict:
+            # loaded from the cache file
+            stats['word_counts'] = make_word_counts(stats['word_counts'],
+                                                    mode)
+        _used.add(key)
+
+        instance.stats = dict(stats)
 
 
 def register():
+    signals.initialized.connect(load_cache)
     signals.content_object_init.connect(calculate_stats)
+    signals.finalized.connect(save_cache)
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import unittest
+from collections import Counter
+
+from bs4 import BeautifulSoup
+from pelican.contents import Article
+from pelican.settings import DEFAULT_CONFIG
+
+import post_stats
+from post_stats import post_stats as plugin
+from post_stats.readability import text_stats
+from post_stats.tokenizer import extract_text, tokenize
+from post_stats.word_counts import WordCounts
+
+TEST_CONTENT = '''<h1>Post statistics</h1>
+<p>Counting words &amp; sentences: is it easy? Yes! It is&nbsp;quite
+easy&hellip; &ldquo;Quoted&rdquo; words, e.g. these, count too.</p>
+<script>var skipped = "not text";</script>
+<pre><code>code_block(1, 2) + more_code</code></pre>
+<ul><li>Déjà vu</li><li>numbers 1, 22 and 333</li></ul>
+'''
+
+SAMPLES = [
+    '', ' ', 'word', ' leading and trailing ', 'a. b', ' . a', 'a . ',
+    'One sentence. Another one!  Third?: fourth;', 'Ünïcode wörds — here',
+    'entities &amp; &foo; gone', 'x. y. z.', '123 456. 789',
+]
+
+
+def legacy_stats(raw_text):
+    # The implementation replaced by the tokenizer
+    raw_text = raw_text.replace('&nbsp;', ' ')
+    raw_text = re.sub(r'\&\#?.+?;', '', raw_text)
+    tmp = raw_text
+    drop = '.,?!@#$%^&*()_+-=\\|/[]{}`~:;\'"‘’—…“”'
+    raw_text = raw_text.translate(dict((ord(c), '') for c in drop))
+    word_count = Counter(raw_text.lower().split())
+    return word_count, text_stats(tmp, sum(word_count.values()))
+
+
+class TestTokenizer(unittest.TestCase):
+
+    def test_same_counts_as_legacy(self):
+        for text in SAMPLES + [BeautifulSoup(TEST_CONTENT,
+                                             'html.parser').getText()]:
+            self.assertEqual(tokenize(text), legacy_stats(text), text)
+
+    def test_extract_text(self):
+        text = extract_text(TEST_CONTENT)
+        self.assertNotIn('skipped', text)
+        self.assertIn('words & sentences', text)
+        self.assertEqual(
+            tokenize(text),
+            tokenize(BeautifulSoup(TEST_CONTENT, 'html.parser').getText()))
+
+
+class TestPostStats(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_path = tempfile.mkdtemp()
+        plugin._stats.clear()
+        plugin._used.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_path)
+        plugin._stats.clear()
+        plugin._used.clear()
+
+    def make_article(self, **settings):
+        article = Article(TEST_CONTENT, metadata={'title': 'Stats'},
+                          settings=dict(DEFAULT_CONFIG, **settings))
+        post_stats.calculate_stats(article)
+        return article
+
+    def test_stats(self):
+        stats = self.make_article().stats
+        words, readability = legacy_stats(
+            BeautifulSoup(TEST_CONTENT, 'html.parser').getText())
+        self.assertEqual(stats['word_counts'], words)
+        self.assertEqual(stats['wc'], sum(words.values()))
+        self.assertEqual(stats['read_mins'], 1)
+        self.assertEqual(stats['fk'], '{:.2f}'.format(
+            plugin.flesch_kincaid_level(readability)))
+
+    def test_cached_by_digest(self):
+        first = self.make_article().stats
+        self.assertEqual(len(plugin._stats), 1)
+        second = self.make_article().stats
+        self.assertEqual(first, second)
+        self.assertIs(first['word_counts'], second['word_counts'])
+
+    def test_saved_between_builds(self):
+        class Pelican(object):
+            settings = {'POST_STATS_CACHE': True,
+                        'CACHE_PATH': self.cache_path}
+        stats = self.make_article().stats
+        plugin.save_cache(Pelican)
+        self.assertTrue(os.path.exists(
+            os.path.join(self.cache_path, 'post_stats.json')))
+
+        plugin._stats.clear()
+        plugin._cache['file'] = None
+        plugin.load_cache(Pelican)
+        self.assertEqual(len(plugin._stats), 1)
+        self.assertEqual(self.make_article().stats, stats)
+
+    def test_word_counts_modes(self):
+        full = self.make_article().stats
+        compact = self.make_article(POST_STATS_WORD_COUNTS='compact').stats
+        self.assertIsInstance(compact['word_counts'], WordCounts)
+        self.assertEqual(dict(compact['word_counts']), dict(full['word_counts']))
+        self.assertEqual(compact['wc'], full['wc'])
+
+        top = self.make_article(POST_STATS_WORD_COUNTS=2).stats
+        self.assertEqual(top['word_counts'],
+                         Counter(dict(full['word_counts'].most_common(2))))
+        self.assertEqual(top['fi'], full['fi'])
+
+        none = self.make_article(POST_STATS_WORD_COUNTS=False).stats
+        self.assertNotIn('word_counts', none)
+        self.assertEqual(none['read_mins'], full['read_mins'])
+
+    def test_compact_saved_between_builds(self):
+        class Pelican(object):
+            settings = {'POST_STATS_CACHE': True,
+                        'CACHE_PATH': self.cache_path}
+        stats = self.make_article(POST_STATS_WORD_COUNTS='compact').stats
+        plugin.save_cache(Pelican)
+        plugin._stats.clear()
+        plugin._cache['file'] = None
+        plugin.load_cache(Pelican)
+        loaded = self.make_article(POST_STATS_WORD_COUNTS='compact').stats
+        self.assertIsInstance(loaded['word_counts'], WordCounts)
+        self.assertEqual(loaded, stats)
+
+    def test_unused_stats_forgotten(self):
+        class Pelican(object):
+            settings = {}
+        self.make_article()
+        plugin.save_cache(Pelican)
+        self.assertEqual(len(plugin._stats), 1)
+        plugin.save_cache(Pelican)
+        self.assertEqual(len(plugin._stats), 0)
+
+
+class TestWordCounts(unittest.TestCase):
+
+    def test_counter_interface(self):
+        counter = Counter('the cat and the hat and the bat'.split())
+        counts = WordCounts(counter)
+        self.assertEqual(counts, counter)
+        self.assertEqual(len(counts), 5)
+        self.assertEqual(counts['the'], 3)
+        self.assertEqual(counts['dog'], 0)
+        self.assertEqual(counts.get('dog', -1), -1)
+        self.assertIn('cat', counts)
+        self.assertNotIn('dog', counts)
+        self.assertEqual(counts.most_common(2), [('the', 3), ('and', 2)])
+        self.assertEqual(sorted(counts.most_common()),
+                         sorted(counter.most_common()))
+        self.assertEqual(sum(counts.values()), 8)
+
+    def test_shared_vocabulary(self):
+        first = WordCounts({'shared': 1, 'first': 2})
+        second = WordCounts({'shared': 3})
+        self.assertIs(next(iter(first)), next(iter(second)))
+
+    def test_pickle(self):
+        counts = WordCounts({'a': 1, 'b': 2})
+        self.assertEqual(pickle.loads(pickle.dumps(counts)), counts)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Extracts the text of HTML in a single pass, without building a tree, and
+counts its words, sentences and syllables together.
+
+The counts are those of the original pipeline (BeautifulSoup's getText,
+then regular expressions over the whole text, see readability.text_stats),
+quirks included, so that the statistics of existing posts do not change.
+"""
+
+from __future__ import unicode_literals
+import re
+from collections import Counter
+from string import ascii_letters
+
+from six import unichr
+from six.moves.html_entities import name2codepoint
+from six.moves.html_parser import HTMLParser
+
+from .readability import syllables
+
+# Elements whose content is not text, as for BeautifulSoup's getText
+SKIPPED_TAGS = ('script', 'style', 'template')
+
+ENTITIES = re.compile(r'\&\#?.+?;')
+
+# Characters dropped from the words
+DROP = dict((ord(c), None)
+            for c in '.,?!@#$%^&*()_+-=\\|/[]{}`~:;\'"‘’—…“”')
+
+# Characters ending sentences
+TERMINATORS = '.!?:;'
+
+# Syllables of the words seen so far
+SYLLABLES_CACHE_SIZE = 100000
+_syllables = {}
+
+
+class TextExtractor(HTMLParser):
+    """Collects the text of HTML, as it is fed"""
+
+    def __init__(self):
+        try:
+            HTMLParser.__init__(self, convert_charrefs=True)
+        except TypeError:
+            # Python 2, see handle_entityref and handle_charref
+            HTMLParser.__init__(self)
+        self.parts = []
+        self.skipped = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skipped += 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self.skipped:
+            self.skipped -= 1
+
+    def handle_data(self, data):
+        if not self.skipped:
+            self.parts.append(data)
+
+    def handle_entityref(self, name):
+        if name in name2codepoint:
+            self.handle_data(unichr(name2codepoint[name]))
+        else:
+            self.handle_data('&%s;' % name)
+
+    def handle_charref(self, name):
+        try:
+            if name[:1] in 'xX':
+                self.handle_data(unichr(int(name[1:], 16)))
+            else:
+                self.handle_data(unichr(int(name)))
+        except (ValueError, OverflowError):
+            self.handle_data('&#%s;' % name)
+
+    def unknown_decl(self, data):
+        if data.startswith('CDATA['):
+            self.handle_data(data[6:])
+
+    def get_text(self):
+        return ''.join(self.parts)
+
+
+def extract_text(html):
+    """Return the readable text of HTML"""
+    extractor = TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return extractor.get_text()
+
+
+class _ReadabilityTable(dict):
+    # Translation keeping the ASCII letters and the whitespace, turning the
+    # terminators into dots and dropping anything else, filled on demand
+    def __missing__(self, codepoint):
+        char = unichr(codepoint)
+        if char in TERMINATORS:
+            value = '.'
+        elif char in ascii_letters or char.isspace():
+            value = char
+        else:
+            value = None
+        self[codepoint] = value
+        return value
+
+
+_READABILITY = _ReadabilityTable()
+
+
+def count_syllables(word):
+    count = _syllables.get(word)
+    if count is None:
+        if len(_syllables) >= SYLLABLES_CACHE_SIZE:
+            _syllables.clear()
+        count = _syllables[word] = syllables(word)
+    return count
+
+
+def sentence_stats(text):
+    """Return the sentence, word and syllable counts of readability.text_stats"""
+    segments = text.translate(_READABILITY).split('.')
+    last = len(segments) - 1
+    sentences = words = sbls = 0
+    for i, segment in enumerate(segments):
+        tokens = segment.split()
+        # text_stats splits sentences on single spaces, which gives a blank
+        # word at the start of the text and at its end when they are
+        # whitespace, unless the whitespace goes with a terminator
+        blanks = 0
+        if tokens or not last:
+            if i == 0 and segment[:1].isspace():
+                blanks += 1
+            if i == last and segment[-1:].isspace():
+                blanks += 1
+        if len(tokens) + blanks >= 2:
+            sentences += 1
+            words += len(tokens) + blanks
+            # a blank word counts for one syllable
+            sbls += blanks + sum(count_syllables(t) for t in tokens)
+    return sentences, words, sbls
+
+
+def tokenize(text):
+    """Return the word counts of text, and its (sentence, word, syllable)
+    counts for the readability stats"""
+    text = text.replace('&nbsp;', ' ')
+    if '&' in text:
+        text = ENTITIES.sub('', text)
+    word_counts = Counter(text.translate(DROP).lower().split())
+    stcs, words, sbls = sentence_stats(text)
+    wc = sum(word_counts.values())
+    return word_counts, (stcs, wc or words, sbls)
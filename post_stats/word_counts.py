@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Compact representations of the word counts of posts, chosen with the
+POST_STATS_WORD_COUNTS setting.
+"""
+
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from heapq import nlargest
+from operator import itemgetter
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+
+class WordCounts(Mapping):
+    """Read-only Counter of the words of a post, held in two arrays: the
+    ids of the words in a vocabulary shared by all the posts, sorted, and
+    their counts"""
+    __slots__ = ('_ids', '_counts')
+
+    # Words by id, and ids by word
+    _vocabulary = []
+    _index = {}
+
+    def __init__(self, counts=()):
+        if not isinstance(counts, Mapping):
+            counts = Counter(counts)
+        items = sorted((self._intern(word), count)
+                       for word, count in counts.items())
+        self._ids = array('I', (i for i, count in items))
+        self._counts = array('I', (count for i, count in items))
+
+    @classmethod
+    def _intern(cls, word):
+        i = cls._index.get(word)
+        if i is None:
+            i = cls._index[word] = len(cls._vocabulary)
+            cls._vocabulary.append(word)
+        return i
+
+    def _position(self, word):
+        i = self._index.get(word)
+        if i is not None:
+            position = bisect_left(self._ids, i)
+            if position < len(self._ids) and self._ids[position] == i:
+                return position
+        return None
+
+    def __getitem__(self, word):
+        # Like a Counter, 0 for missing words
+        position = self._position(word)
+        return 0 if position is None else self._counts[position]
+
+    def __contains__(self, word):
+        return self._position(word) is not None
+
+    def get(self, word, default=None):
+        position = self._position(word)
+        return default if position is None else self._counts[position]
+
+    def __iter__(self):
+        vocabulary = self._vocabulary
+        return (vocabulary[i] for i in self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def most_common(self, n=None):
+        """List the n most common words and their counts, like a Counter"""
+        items = zip(self, self._counts)
+        if n is None:
+            return sorted(items, key=itemgetter(1), reverse=True)
+        return nlargest(n, items, key=itemgetter(1))
+
+    def __reduce__(self):
+        # Pickled by words, as ids are only valid in this process
+        return (self.__class__, (dict(self.items()),))
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, dict(self.most_common()))
+
+
+def make_word_counts(counts, mode=True):
+    """Return the word counts kept on posts for a POST_STATS_WORD_COUNTS
+    mode: True for a Counter, 'compact' for a WordCounts, a number n for
+    a Counter of the n most common words, or False for none"""
+    if not isinstance(counts, Counter):
+        counts = Counter(counts)
+    if mode is True:
+        return counts
+    if mode == 'compact':
+        return WordCounts(counts)
+    if mode is False:
+        return None
+    return Counter(dict(counts.most_common(mode)))
@@ -36,9 +36,20 @@ import sys
 from pelican import signals, generators
 
 try:
-    from bs4 import BeautifulSoup
+    from content_dom import get_dom, parse_html
 except ImportError as e:
-    BeautifulSoup = None
+    try:
+        from bs4 import BeautifulSoup
+    except ImportError as e:
+        parse_html = None
+    else:
+        # Without the content_dom plugin, the content is parsed here
+        def parse_html(html, settings=None):
+            return BeautifulSoup(html, 'html.parser')
+
+        def get_dom(content, modify=True):
+            html = content._content
+            return None if html is None else parse_html(html)
 
 try:
     from . pelican_mathjax_markdown_extension import PelicanMathJaxExtension
@@ -68,7 +79,7 @@ def process_settings(pelicanobj):
     mathjax_settings['responsive'] = 'false'  # Tries to make displayed math responsive
     mathjax_settings['responsive_break'] = '768'  # The break point at which it math is responsively aligned (in pixels)
     mathjax_settings['mathjax_font'] = 'default'  # forces mathjax to use the specified font.
-    mathjax_settings['process_summary'] = BeautifulSoup is not None  # will fix up summaries if math is cut off. Requires beautiful soup
+    mathjax_settings['process_summary'] = parse_html is not None  # will fix up summaries if math is cut off. Requires beautiful soup
     mathjax_settings['force_tls'] = 'false'  # will force mathjax to be served by https - if set as False, it will only use https if site is served using https
     mathjax_settings['message_style'] = 'normal'  # This value controls the verbosity of the messages in the lower left-hand corner. Set it to "none" to eliminate all messages
 
@@ -149,7 +160,7 @@ def process_settings(pelicanobj):
             mathjax_settings[key] = 'true' if value else 'false'
 
         if key == 'process_summary' and isinstance(value, bool):
-            if value and BeautifulSoup is None:
+            if value and parse_html is None:
                 print("BeautifulSoup4 is needed for summaries to be processed by render_math\nPlease install it")
                 value = False
 
@@ -203,13 +214,13 @@ def process_summary(article):
     mathjax script so that math will be rendered"""
 
     summary = article.summary
-    summary_parsed = BeautifulSoup(summary, 'html.parser')
+    summary_parsed = parse_html(summary, article.settings)
     math = summary_parsed.find_all(class_='math')
 
     if len(math) > 0:
         last_math_text = math[-1].get_text()
         if len(last_math_text) > 3 and last_math_text[-3:] == '...':
-            content_parsed = BeautifulSoup(article._content, 'html.parser')
+            content_parsed = get_dom(article, modify=False)
             full_text = content_parsed.find_all(class_='math')[len(math)-1].get_text()
             math[-1].string = "%s ..." % full_text
             summary = summary_parsed.decode()
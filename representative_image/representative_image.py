@@ -2,18 +2,29 @@ import six
 from pelican import signals
 from pelican.contents import Article, Draft, Page
 from pelican.generators import ArticlesGenerator
-from bs4 import BeautifulSoup
+try:
+    from content_dom import get_dom, parse_html
+except ImportError:
+    from bs4 import BeautifulSoup
+
+    # Without the content_dom plugin, the content is parsed here
+    def parse_html(html, settings=None):
+        return BeautifulSoup(html, 'html.parser')
+
+    def get_dom(content, modify=True):
+        html = content._content
+        return None if html is None else parse_html(html)
 
 
 def images_extraction(instance):
     representativeImage = None
-    if type(instance) in (Article, Draft, Page):
+    if isinstance(instance, (Article, Draft, Page)):
         if 'image' in instance.metadata:
             representativeImage = instance.metadata['image']
 
         # Process Summary:
         # If summary contains images, extract one to be the representativeImage and remove images from summary
-        soup = BeautifulSoup(instance.summary, 'html.parser')
+        soup = parse_html(instance.summary, instance.settings)
         images = soup.find_all('img')
         for i in images:
             if not representativeImage:
@@ -25,8 +36,8 @@ def images_extraction(instance):
 
         # If there are no image in summary, look for it in the content body
         if not representativeImage:
-            soup = BeautifulSoup(instance._content, 'html.parser')
-            imageTag = soup.find('img')
+            soup = get_dom(instance, modify=False)
+            imageTag = soup.find('img') if soup is not None else None
             if imageTag:
                 representativeImage = imageTag['src']
 
@@ -6,7 +6,14 @@ This plugin adds share URL to article. These links are textual which means no
 online tracking of your readers.
 """
 
-from bs4 import BeautifulSoup
+try:
+    from content_dom import parse_html
+except ImportError:
+    from bs4 import BeautifulSoup
+
+    # Without the content_dom plugin, fragments are parsed here
+    def parse_html(html, settings=None):
+        return BeautifulSoup(html, 'html.parser')
 try:
     from urllib.parse import quote
 except ImportError:
@@ -16,10 +23,10 @@ from pelican.generators import ArticlesGenerator, PagesGenerator
 
 
 def article_title(content):
-    main_title = BeautifulSoup(content.title, 'html.parser').get_text().strip()
+    main_title = parse_html(content.title, content.settings).get_text().strip()
     sub_title = ''
     if hasattr(content, 'subtitle'):
-        sub_title = ' ' + BeautifulSoup(content.subtitle, 'html.parser').get_text().strip()
+        sub_title = ' ' + parse_html(content.subtitle, content.settings).get_text().strip()
     return quote(('%s%s' % (main_title, sub_title)).encode('utf-8'))
 
 
@@ -29,7 +36,7 @@ def article_url(content):
 
 
 def article_summary(content):
-    return quote(BeautifulSoup(content.summary, 'html.parser').get_text().strip().encode('utf-8'))
+    return quote(parse_html(content.summary, content.settings).get_text().strip().encode('utf-8'))
 
 
 def share_post(content):
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Inverted index
+==============
+
+Instead of one JSON file holding the text of every page, which browsers
+download and scan whole, writes an index prebuilt at generation time:
+
+- ``index.json``, a small manifest;
+- ``terms/<prefix>.json``, the posting lists of the terms starting with
+  ``prefix``: ``{term: [page id, weight, page id, weight, ...]}``;
+- ``pages/<n>.json``, the title, url, tags and a snippet of the text of
+  consecutive pages, the page ids being their positions.
+
+A search only fetches the manifest, the shards of its terms and the pages of
+its results, whatever the size of the site. ``tipuesearch_index.js``, copied
+alongside, implements it.
+"""
+
+from __future__ import unicode_literals
+
+import json
+import os
+import re
+import shutil
+from codecs import open
+from collections import Counter, defaultdict
+
+INDEX_VERSION = 1
+
+# Terms are the lowercase runs of letters, digits and underscores
+TERM = re.compile(r'\w+', re.UNICODE)
+
+# Weight of an occurrence in the title, against one in the text
+TITLE_WEIGHT = 10
+
+CLIENT = os.path.join(os.path.dirname(__file__), 'tipuesearch_index.js')
+
+
+def terms(text):
+    """Return the terms of a text, as the client splits queries"""
+    return TERM.findall(text.replace('&#94;', '^').lower())
+
+
+def snippet(text, words):
+    """Return the first words of a text"""
+    parts = text.split(None, words)
+    if len(parts) > words:
+        return ' '.join(parts[:words]) + ' ...'
+    return ' '.join(parts)
+
+
+def build_index(nodes, prefix_length=2, snippet_words=30):
+    """Return the pages and the shards of the index of the nodes of
+    Tipue_Search_JSON_Generator"""
+    pages = []
+    postings = defaultdict(list)
+    for page_id, node in enumerate(nodes):
+        title = node['title'] or ''
+        weights = Counter(terms(node['text']))
+        for term in terms(title):
+            weights[term] += TITLE_WEIGHT
+        for term, weight in weights.items():
+            postings[term].extend((page_id, weight))
+        pages.append({'title': title,
+                      'url': node['url'],
+                      'tags': node['tags'],
+                      'text': snippet(node['text'], snippet_words)})
+
+    shards = defaultdict(dict)
+    for term, posting in postings.items():
+        shards[term[:prefix_length]][term] = posting
+    return pages, shards
+
+
+def _dump(data, path):
+    with open(path, 'w', encoding='utf-8') as fd:
+        json.dump(data, fd, separators=(',', ':'), ensure_ascii=False,
+                  sort_keys=True)
+
+
+def write_index(path, nodes, prefix_length=2, snippet_words=30,
+                pages_per_file=500):
+    """Write the index of the nodes in the directory path"""
+    pages, shards = build_index(nodes, prefix_length, snippet_words)
+
+    # Remove the shards of a previous build
+    for name in ('terms', 'pages'):
+        directory = os.path.join(path, name)
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.makedirs(directory)
+
+    for prefix, shard in shards.items():
+        _dump(shard, os.path.join(path, 'terms', prefix + '.json'))
+    for start in range(0, len(pages), pages_per_file):
+        _dump(pages[start:start + pages_per_file],
+              os.path.join(path, 'pages',
+                           '{0}.json'.format(start // pages_per_file)))
+    _dump({'version': INDEX_VERSION,
+           'prefix_length': prefix_length,
+           'shards': sorted(shards),
+           'pages': len(pages),
+           'pages_per_file': pages_per_file},
+          os.path.join(path, 'index.json'))
+    shutil.copy(CLIENT, path)
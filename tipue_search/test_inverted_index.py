@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from tipue_search.inverted_index import build_index, snippet, terms, write_index
+
+NODES = [
+    {'title': 'Lorem ipsum', 'url': '/lorem.html', 'tags': 'Latin',
+     'text': 'Lorem ipsum dolor sit amet, lorem x&#94;2 ipsum.'},
+    {'title': 'Déjà vu', 'url': '/deja.html', 'tags': '',
+     'text': 'Already seen: lorem again, and déjà vu.'},
+    {'title': None, 'url': '/template.html', 'tags': '',
+     'text': 'Dolor'},
+]
+
+
+def search(path, query):
+    """What tipuesearch_index.js finds, read from the files"""
+    def load(*names):
+        with io.open(os.path.join(path, *names), encoding='utf-8') as f:
+            return json.load(f)
+    manifest = load('index.json')
+    scores = None
+    for word in terms(query):
+        prefix = word[:manifest['prefix_length']]
+        if prefix not in manifest['shards']:
+            return []
+        posting = load('terms', prefix + '.json').get(word, [])
+        found = dict(zip(posting[::2], posting[1::2]))
+        if scores is None:
+            scores = found
+        else:
+            scores = dict((page, score + found[page])
+                          for page, score in scores.items() if page in found)
+    results = []
+    for page in sorted(scores, key=scores.get, reverse=True):
+        pages = load('pages', '%d.json' % (page // manifest['pages_per_file']))
+        results.append(pages[page % manifest['pages_per_file']]['url'])
+    return results
+
+
+class TestInvertedIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_terms(self):
+        self.assertEqual(terms('Déjà vu, x&#94;2 ipsum_dolor'),
+                         ['déjà', 'vu', 'x', '2', 'ipsum_dolor'])
+
+    def test_snippet(self):
+        self.assertEqual(snippet('one two  three', 2), 'one two ...')
+        self.assertEqual(snippet('one two', 2), 'one two')
+
+    def test_build_index(self):
+        pages, shards = build_index(NODES, prefix_length=2)
+        self.assertEqual([page['url'] for page in pages],
+                         ['/lorem.html', '/deja.html', '/template.html'])
+        self.assertEqual(pages[2]['title'], '')
+        # title occurrences weigh more than text ones
+        self.assertEqual(shards['lo']['lorem'], [0, 12, 1, 1])
+        self.assertEqual(shards['dé']['déjà'], [1, 11])
+        self.assertEqual(shards['x'], {'x': [0, 1]})
+
+    def test_search(self):
+        write_index(self.path, NODES, prefix_length=1, pages_per_file=2)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.path, 'pages'))),
+                         ['0.json', '1.json'])
+        self.assertTrue(os.path.exists(
+            os.path.join(self.path, 'tipuesearch_index.js')))
+        self.assertEqual(search(self.path, 'Lorem'),
+                         ['/lorem.html', '/deja.html'])
+        self.assertEqual(search(self.path, 'lorem DÉJÀ'), ['/deja.html'])
+        self.assertEqual(sorted(search(self.path, 'dolor')),
+                         ['/lorem.html', '/template.html'])
+        self.assertEqual(search(self.path, 'missing'), [])
+
+    def test_previous_shards_removed(self):
+        write_index(self.path, NODES, prefix_length=1)
+        write_index(self.path, NODES[2:], prefix_length=1)
+        self.assertEqual(os.listdir(os.path.join(self.path, 'terms')),
+                         ['d.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
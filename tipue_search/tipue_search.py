@@ -13,7 +13,15 @@ from __future__ import unicode_literals
 
 import os.path
 import json
-from bs4 import BeautifulSoup
+from .inverted_index import write_index
+try:
+    from content_dom import parse_html
+except ImportError:
+    from bs4 import BeautifulSoup
+
+    # Without the content_dom plugin, fragments are parsed here
+    def parse_html(html, settings=None):
+        return BeautifulSoup(html, 'html.parser')
 from codecs import open
 try:
     from urlparse import urljoin
@@ -29,6 +37,7 @@ class Tipue_Search_JSON_Generator(object):
 
         self.output_path = output_path
         self.context = context
+        self.settings = settings
         self.siteurl = settings.get('SITEURL')
         self.tpages = settings.get('TEMPLATE_PAGES')
         self.output_path = output_path
@@ -40,10 +49,10 @@ class Tipue_Search_JSON_Generator(object):
         if getattr(page, 'status', 'published') != 'published':
             return
 
-        soup_title = BeautifulSoup(page.title.replace('&nbsp;', ' '), 'html.parser')
+        soup_title = parse_html(page.title.replace('&nbsp;', ' '), self.settings)
         page_title = soup_title.get_text(' ', strip=True).replace('“', '"').replace('”', '"').replace('’', "'").replace('^', '&#94;')
 
-        soup_text = BeautifulSoup(page.content, 'html.parser')
+        soup_text = parse_html(page.content, self.settings)
         page_text = soup_text.get_text(' ', strip=True).replace('“', '"').replace('”', '"').replace('’', "'").replace('¶', ' ').replace('^', '&#94;')
         page_text = ' '.join(page_text.split())
 
@@ -65,7 +74,7 @@ class Tipue_Search_JSON_Generator(object):
     def create_tpage_node(self, srclink):
 
         srcfile = open(os.path.join(self.output_path, self.tpages[srclink]), encoding='utf-8')
-        soup = BeautifulSoup(srcfile, 'html.parser')
+        soup = parse_html(srcfile, self.settings)
         page_text = soup.get_text()
 
         # What happens if there is not a title.
@@ -88,8 +97,6 @@ class Tipue_Search_JSON_Generator(object):
 
 
     def generate_output(self, writer):
-        path = os.path.join(self.output_path, 'tipuesearch_content.json')
-
         pages = self.context['pages'] + self.context['articles']
 
         for article in self.context['articles']:
@@ -100,6 +107,16 @@ class Tipue_Search_JSON_Generator(object):
 
         for page in pages:
             self.create_json_node(page)
+
+        if self.settings.get('TIPUE_SEARCH_INDEX', False):
+            write_index(os.path.join(self.output_path, 'tipuesearch'),
+                        self.json_nodes,
+                        self.settings.get('TIPUE_SEARCH_PREFIX_LENGTH', 2),
+                        self.settings.get('TIPUE_SEARCH_SNIPPET_WORDS', 30),
+                        self.settings.get('TIPUE_SEARCH_PAGES_PER_FILE', 500))
+            return
+
+        path = os.path.join(self.output_path, 'tipuesearch_content.json')
         root_node = {'pages': self.json_nodes}
 
         with open(path, 'w', encoding='utf-8') as fd:
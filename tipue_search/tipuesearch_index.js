@@ -0,0 +1,88 @@
+/*
+ * Client of the inverted index written by the tipue_search plugin when
+ * TIPUE_SEARCH_INDEX is set. A search fetches the manifest, the shards of
+ * the terms of the query and the pages of the results only.
+ *
+ *     tipuesearchIndex.search('some words', '/tipuesearch/')
+ *         .then(function (results) {
+ *             // [{title, url, tags, text, score}, ...], best first,
+ *             // of the pages having all the words
+ *         });
+ */
+var tipuesearchIndex = (function () {
+    'use strict';
+
+    var requests = {};
+
+    function fetchJSON(url) {
+        if (!requests[url]) {
+            requests[url] = fetch(url).then(function (response) {
+                if (!response.ok) {
+                    throw new Error(url + ': ' + response.status);
+                }
+                return response.json();
+            });
+        }
+        return requests[url];
+    }
+
+    // As the plugin splits the text of the pages
+    function terms(query) {
+        return query.toLowerCase().match(/[\p{L}\p{N}_]+/gu) || [];
+    }
+
+    function search(query, base) {
+        base = base || 'tipuesearch/';
+        return fetchJSON(base + 'index.json').then(function (manifest) {
+            var words = terms(query);
+            var prefixes = words.map(function (word) {
+                return word.slice(0, manifest.prefix_length);
+            });
+            if (!words.length || prefixes.some(function (prefix) {
+                return manifest.shards.indexOf(prefix) < 0;
+            })) {
+                // some word is in no page
+                return [];
+            }
+            return Promise.all(prefixes.map(function (prefix) {
+                return fetchJSON(base + 'terms/' +
+                                 encodeURIComponent(prefix) + '.json');
+            })).then(function (shards) {
+                var scores = null;
+                words.forEach(function (word, i) {
+                    var posting = shards[i][word] || [];
+                    var found = {};
+                    for (var j = 0; j < posting.length; j += 2) {
+                        found[posting[j]] = posting[j + 1];
+                    }
+                    if (scores === null) {
+                        scores = found;
+                        return;
+                    }
+                    Object.keys(scores).forEach(function (id) {
+                        if (id in found) {
+                            scores[id] += found[id];
+                        } else {
+                            delete scores[id];
+                        }
+                    });
+                });
+                var ids = Object.keys(scores).sort(function (a, b) {
+                    return scores[b] - scores[a];
+                });
+                return Promise.all(ids.map(function (id) {
+                    var file = Math.floor(id / manifest.pages_per_file);
+                    return fetchJSON(base + 'pages/' + file + '.json')
+                        .then(function (pages) {
+                            var page = pages[id % manifest.pages_per_file];
+                            return {title: page.title, url: page.url,
+                                    tags: page.tags, text: page.text,
+                                    score: scores[id]};
+                        });
+                }));
+            });
+        });
+    }
+
+    return {search: search, terms: terms};
+})();